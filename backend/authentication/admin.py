@@ -1,7 +1,150 @@
+import json
+
 from django.contrib import admin
-from .models import User, EmailVerificationToken, PasswordResetToken
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ChangeList
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+from .models import User, EmailVerificationToken, PasswordResetToken, EmailOutbox
+
+# Counts the planner estimates below this are made exact, which is cheap there
+EXACT_COUNT_LIMIT = 10000
+
+# Query parameter carrying the primary key the next page starts below
+AFTER_VAR = 'after'
+
+
+def estimated_count(queryset):
+    """
+    The PostgreSQL planner's row estimate for queryset, from table
+    statistics instead of a scan; None on other databases.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    queryset = queryset.order_by()
+    sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']['Plan Rows']
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that takes large counts from the planner instead of COUNT(*)"""
+
+    count_is_estimate = False
+
+    @cached_property
+    def count(self):
+        estimate = estimated_count(self.object_list)
+        if estimate is not None and estimate >= EXACT_COUNT_LIMIT:
+            self.count_is_estimate = True
+            return estimate
+        return super().count
+
+
+class KeysetChangeList(ChangeList):
+    """
+    Changelist whose pages continue below the last primary key shown
+    ("show more") instead of using OFFSET, which reads and discards every
+    row before the page.
+    """
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(AFTER_VAR, None)
+        return lookup_params
+
+    def get_ordering(self, request, queryset):
+        # Pages are cut at a primary key, so they must be in primary key
+        # order whatever the o= parameter asks for
+        return ['-pk']
+
+    def get_query_string(self, new_params=None, remove=None):
+        # Filter, search and sort links start from the first page again
+        if not new_params or AFTER_VAR not in new_params:
+            remove = [AFTER_VAR, *(remove or [])]
+        return super().get_query_string(new_params, remove)
+
+    def get_results(self, request):
+        paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        queryset = self.queryset
+        if AFTER_VAR in request.GET:
+            try:
+                queryset = queryset.filter(pk__lt=int(request.GET[AFTER_VAR]))
+            except ValueError as exc:
+                raise IncorrectLookupParameters from exc
+        # One extra row tells whether there is a next page
+        results = list(queryset[:self.list_per_page + 1])
+
+        self.result_count = paginator.count
+        self.count_is_estimate = paginator.count_is_estimate
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.full_result_count = None
+        self.result_list = results[:self.list_per_page]
+        self.can_show_all = False
+        self.multi_page = len(results) > self.list_per_page
+        self.paginator = paginator
+        self.next_page_url = (
+            self.get_query_string({AFTER_VAR: self.result_list[-1].pk})
+            if self.multi_page else None
+        )
+        self.first_page_url = (
+            self.get_query_string(remove=[AFTER_VAR]) if AFTER_VAR in request.GET else None
+        )
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    """
+    Changelists that render in constant time at any table size: estimated
+    counts and keyset pages, newest first. Sorting by other columns is off,
+    as it would sort the whole table for each page.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    ordering = ('-pk',)
+    sortable_by = ()
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+
+@admin.register(User)
+class UserAdmin(ScalableAdmin):
+    list_display = (
+        'email', 'username', 'is_email_verified', 'is_active', 'is_staff', 'date_joined'
+    )
+    list_filter = ('is_staff', 'is_active', 'is_email_verified')
+    # Prefix search, served by the UPPER(email) pattern index on PostgreSQL
+    search_fields = ('^email',)
+
+
+class TokenAdmin(ScalableAdmin):
+    list_display = ('__str__', 'user', 'created_at', 'expires_at')
+    # __str__ shows the user's email
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+    search_fields = ('^user__email',)
+
+
+@admin.register(EmailVerificationToken)
+class EmailVerificationTokenAdmin(TokenAdmin):
+    pass
+
+
+@admin.register(PasswordResetToken)
+class PasswordResetTokenAdmin(TokenAdmin):
+    list_display = (*TokenAdmin.list_display, 'is_used')
+
 
-# Register your models here.
-admin.site.register(User)
-admin.site.register(EmailVerificationToken)
-admin.site.register(PasswordResetToken)
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(ScalableAdmin):
+    list_display = ('recipient', 'kind', 'status', 'attempts', 'available_at', 'sent_at')
+    list_filter = ('status', 'kind')
@@ -0,0 +1,311 @@
+"""
+Native async implementations of the hot authentication endpoints.
+
+They return the same payloads as the DRF views in views.py but run on the
+event loop when the project is served through asgi.py, instead of being
+pushed through a sync_to_async thread hop per request. Password hashing is
+awaited on the hashing service's pool. Work that has to stay in one
+transaction (registration, password resets) or that only exists as sync
+code (the cache-backed throttles, simplejwt's outstanding and blacklist
+bookkeeping) runs in a single thread hop.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotAuthenticated, Throttled
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .authentication import aauthenticate, aload_user
+from .db_router import read_from_primary
+from .conditional import (
+    add_validators,
+    conditional_response,
+    has_preconditions,
+    save_if_unchanged,
+)
+from .hashing import hashing_service
+from . import link_tokens
+from .outbox import queue_password_reset_email, queue_verification_email
+from .throttling import FORGOT_PASSWORD_THROTTLES, LOGIN_THROTTLES, REGISTER_THROTTLES
+from .serializers import (
+    UserRegistrationSerializer,
+    LoginCredentialsSerializer,
+    EmailVerificationSerializer,
+    PasswordResetRequestSerializer,
+    PasswordResetConfirmSerializer,
+    UserProfileSerializer
+)
+from .tokens import ProfileRefreshToken
+from .views import PROFILE_CHANGED_RESPONSE, RESET_RESPONSES, VERIFICATION_RESPONSES
+
+User = get_user_model()
+
+PARSERS = (JSONParser, FormParser, MultiPartParser)
+
+
+def _error_response(exc):
+    """Render an APIException the way DRF's exception handler does"""
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    response = JsonResponse(data, status=exc.status_code, safe=False)
+    if exc.status_code == status.HTTP_401_UNAUTHORIZED:
+        response['WWW-Authenticate'] = f'{jwt_settings.AUTH_HEADER_TYPES[0]} realm="api"'
+    if getattr(exc, 'wait', None):
+        response['Retry-After'] = f'{exc.wait:.0f}'
+    return response
+
+
+def _throttle_waits(request, throttles):
+    """Waits of the throttles that refuse request; they read and write the cache"""
+    waits = []
+    for throttle_class in throttles:
+        throttle = throttle_class()
+        if not throttle.allow_request(request, None):
+            waits.append(throttle.wait())
+    return waits
+
+
+def async_api_view(methods, authenticated=False, throttles=()):
+    """
+    Async counterpart of @api_view for the views in this module.
+
+    Rejects other methods, parses the body into request.data, applies the
+    throttles before the view runs and, for authenticated views, sets
+    request.user and request.auth from the JWT.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return JsonResponse(
+                    {'detail': f'Method "{request.method}" not allowed.'},
+                    status=status.HTTP_405_METHOD_NOT_ALLOWED
+                )
+            try:
+                if authenticated:
+                    result = await aauthenticate(request)
+                    if result is None:
+                        raise NotAuthenticated()
+                    request.user, request.auth = result
+                request.data = Request(
+                    request, parsers=[parser() for parser in PARSERS]
+                ).data
+                waits = (
+                    await sync_to_async(_throttle_waits)(request, throttles) if throttles else []
+                )
+                if waits:
+                    raise Throttled(max(waits))
+                return await view(request, *args, **kwargs)
+            except APIException as exc:
+                return _error_response(exc)
+
+        # Token authenticated like the DRF views, so no CSRF cookie is involved
+        return csrf_exempt(wrapper)
+    return decorator
+
+
+def _invalid_credentials():
+    return JsonResponse(
+        {api_settings.NON_FIELD_ERRORS_KEY: ['Invalid credentials']},
+        status=status.HTTP_400_BAD_REQUEST
+    )
+
+
+def _create_user(validated_data, encoded_password):
+    """Create the user, its verification token and the queued email together"""
+    with transaction.atomic():
+        user = User(
+            email=User.objects.normalize_email(validated_data['email']),
+            first_name=validated_data.get('first_name', ''),
+            last_name=validated_data.get('last_name', ''),
+            password=encoded_password,
+        )
+        user.save()
+
+        verification_token = link_tokens.issue_verification_token(user)
+
+        display_name = user.first_name or user.email.split('@')[0]
+        queue_verification_email(
+            user.email,
+            verification_token,
+            display_name
+        )
+    return user
+
+
+def _reissue_reset_token(user):
+    """Replace user's reset token and queue its email together"""
+    with transaction.atomic():
+        token = link_tokens.reissue_reset_token(user)
+        if token is not None:
+            display_name = user.first_name or user.email.split('@')[0]
+            queue_password_reset_email(user.email, token, display_name)
+
+
+def _blacklist(refresh_token):
+    ProfileRefreshToken(refresh_token).blacklist()
+
+
+@async_api_view(['POST'], throttles=REGISTER_THROTTLES)
+async def register(request):
+    """User registration endpoint"""
+    serializer = UserRegistrationSerializer(data=request.data)
+    # Validation checks that the email is still free
+    if not await sync_to_async(serializer.is_valid)():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    encoded_password = await hashing_service.amake_password(
+        serializer.validated_data['password']
+    )
+    user = await sync_to_async(_create_user)(serializer.validated_data, encoded_password)
+
+    return JsonResponse({
+        'message': (
+            'User registered successfully. '
+            'Please check your email to verify your account.'
+        ),
+        'user_id': user.id,
+        'email_sent': 'queued'
+    }, status=status.HTTP_201_CREATED)
+
+
+@async_api_view(['POST'], throttles=LOGIN_THROTTLES)
+async def login(request):
+    """User login endpoint"""
+    serializer = LoginCredentialsSerializer(data=request.data)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    email = serializer.validated_data['email']
+    password = serializer.validated_data['password']
+
+    # A password reset moments ago may not have reached the replicas
+    read_from_primary()
+    user = await User.objects.filter(email=email).afirst()
+    if user is None:
+        # Hash anyway so unknown emails take as long as wrong passwords
+        await hashing_service.amake_password(password)
+        return _invalid_credentials()
+
+    is_correct, must_update = await hashing_service.averify_password(
+        password, user.password
+    )
+    if not is_correct or not user.is_active:
+        return _invalid_credentials()
+    if must_update:
+        user.password = await hashing_service.amake_password(password)
+        await user.asave(update_fields=['password'])
+
+    # Generate JWT tokens carrying the profile claims
+    refresh = await sync_to_async(ProfileRefreshToken.for_user)(user)
+
+    return JsonResponse({
+        'access_token': str(refresh.access_token),
+        'refresh_token': str(refresh),
+        'user': UserProfileSerializer(user).data
+    }, status=status.HTTP_200_OK)
+
+
+@async_api_view(['POST'])
+async def verify_email(request):
+    """Email verification endpoint"""
+    serializer = EmailVerificationSerializer(data=request.data)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    # Stored tokens are deleted in the transaction that verifies the user,
+    # so the whole check runs in one thread hop
+    result = await sync_to_async(link_tokens.verify_email)(
+        serializer.validated_data['token']
+    )
+    body, status_code = VERIFICATION_RESPONSES[result]
+    return JsonResponse(body, status=status_code)
+
+
+@async_api_view(['POST'], throttles=FORGOT_PASSWORD_THROTTLES)
+async def forgot_password(request):
+    """Request password reset"""
+    serializer = PasswordResetRequestSerializer(data=request.data)
+    # Validation loads the user
+    if not await sync_to_async(serializer.is_valid)():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    await sync_to_async(_reissue_reset_token)(serializer.validated_data['user'])
+    return JsonResponse({
+        'message': 'Password reset email queued successfully',
+        'email_sent': 'queued'
+    }, status=status.HTTP_200_OK)
+
+
+@async_api_view(['POST'])
+async def reset_password(request):
+    """Reset password with token"""
+    serializer = PasswordResetConfirmSerializer(data=request.data)
+    if not serializer.is_valid():
+        error_string = "; ".join(
+            f"{field}: {', '.join(errors)}" for field, errors in serializer.errors.items()
+        )
+        return JsonResponse({'error': error_string}, status=status.HTTP_400_BAD_REQUEST)
+
+    # The token is claimed in the transaction that sets the password
+    result = await sync_to_async(link_tokens.reset_password)(
+        serializer.validated_data['token'], serializer.validated_data['password']
+    )
+    body, status_code = RESET_RESPONSES[result]
+    return JsonResponse(body, status=status_code)
+
+
+@async_api_view(['GET'], authenticated=True)
+async def profile(request):
+    """Get user profile"""
+    not_modified = conditional_response(request, request.user)
+    if not_modified is not None:
+        return not_modified
+    response = JsonResponse(UserProfileSerializer(request.user).data, status=status.HTTP_200_OK)
+    return add_validators(response, request.user)
+
+
+@async_api_view(['PUT'], authenticated=True)
+async def update_profile(request):
+    """Update user profile"""
+    user = await aload_user(request.user)
+    precondition_failed = conditional_response(request, user)
+    if precondition_failed is not None:
+        return precondition_failed
+    serializer = UserProfileSerializer(user, data=request.data, partial=True)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    if not has_preconditions(request):
+        for field, value in serializer.validated_data.items():
+            setattr(user, field, value)
+        await user.asave(update_fields=[*serializer.validated_data, 'updated_at'])
+    elif not await sync_to_async(save_if_unchanged)(user, serializer.validated_data):
+        return JsonResponse(
+            PROFILE_CHANGED_RESPONSE, status=status.HTTP_412_PRECONDITION_FAILED
+        )
+
+    response = JsonResponse(UserProfileSerializer(user).data, status=status.HTTP_200_OK)
+    return add_validators(response, user)
+
+
+@async_api_view(['POST'], authenticated=True)
+async def logout(request):
+    """Logout user by blacklisting refresh token"""
+    refresh_token = request.data.get('refresh_token')
+    try:
+        if refresh_token:
+            await sync_to_async(_blacklist)(refresh_token)
+    except Exception:
+        return JsonResponse({
+            'error': 'Invalid token'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    return JsonResponse({
+        'message': 'Logged out successfully'
+    }, status=status.HTTP_200_OK)
@@ -0,0 +1,132 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.module_loading import import_string
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import (
+    JWTAuthentication,
+    JWTStatelessUserAuthentication,
+)
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .tokens import PROFILE_FIELDS, has_profile_claims
+from .user_cache import user_cache
+
+User = get_user_model()
+
+
+class ProfileClaimsAuthentication(JWTStatelessUserAuthentication):
+    """
+    JWT authentication that builds request.user from the token's profile
+    claims without a database query.
+
+    Tokens issued before the claims were embedded fall back to the regular
+    database lookup. The user object is a ProfileTokenUser, so views that
+    write to the user must load it with load_user first.
+    """
+
+    def get_user(self, validated_token):
+        if not has_profile_claims(validated_token):
+            return JWTAuthentication.get_user(self, validated_token)
+        user = super().get_user(validated_token)
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        return user
+
+
+def _check_user(user, validated_token):
+    """The checks JWTAuthentication.get_user makes on the user it loaded"""
+    if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+        raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+    if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+        api_settings.REVOKE_TOKEN_CLAIM
+    ) != get_md5_hash_password(user.password):
+        raise AuthenticationFailed(
+            _("The user's password has been changed."), code='password_changed'
+        )
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWT authentication that loads request.user through the user cache."""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as exc:
+            raise InvalidToken(_('Token contained no recognizable user identification')) from exc
+
+        try:
+            user = user_cache.get(user_id)
+        except User.DoesNotExist as exc:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found') from exc
+
+        _check_user(user, validated_token)
+        return user
+
+
+def load_user(user, fields=PROFILE_FIELDS):
+    """
+    Return a User model instance for request.user.
+
+    Database-backed users are returned as they are; token users are loaded
+    with only the given columns, which is also all a later save() writes.
+    """
+    if isinstance(user, User):
+        return user
+    return User.objects.only(*fields).get(pk=user.pk)
+
+
+async def aload_user(user, fields=PROFILE_FIELDS):
+    """load_user for async views"""
+    if isinstance(user, User):
+        return user
+    return await User.objects.only(*fields).aget(pk=user.pk)
+
+
+async def _aget_user(validated_token):
+    """JWTAuthentication.get_user on the async ORM"""
+    try:
+        user_id = validated_token[api_settings.USER_ID_CLAIM]
+    except KeyError as exc:
+        raise InvalidToken(_('Token contained no recognizable user identification')) from exc
+
+    try:
+        user = await User.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+    except User.DoesNotExist as exc:
+        raise AuthenticationFailed(_('User not found'), code='user_not_found') from exc
+
+    _check_user(user, validated_token)
+    return user
+
+
+async def aauthenticate(request):
+    """
+    Authenticate a plain Django request from an async view with the
+    configured JWT_AUTHENTICATION_CLASS.
+
+    Returns (user, validated_token), or None when no token was sent, and
+    raises the same exceptions as the DRF authentication classes. Claims-only
+    users never touch the database; the user cache is sync-only and runs in
+    a thread.
+    """
+    authenticator = import_string(settings.JWT_AUTHENTICATION_CLASS)()
+    header = authenticator.get_header(request)
+    if header is None:
+        return None
+    raw_token = authenticator.get_raw_token(header)
+    if raw_token is None:
+        return None
+
+    validated_token = authenticator.get_validated_token(raw_token)
+    if isinstance(authenticator, ProfileClaimsAuthentication) and has_profile_claims(
+        validated_token
+    ):
+        user = authenticator.get_user(validated_token)
+    elif isinstance(authenticator, CachedJWTAuthentication):
+        user = await sync_to_async(authenticator.get_user)(validated_token)
+    else:
+        user = await _aget_user(validated_token)
+    return user, validated_token
@@ -0,0 +1,183 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, close_old_connections
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+logger = logging.getLogger(__name__)
+
+# Rows blacklisted this long before the previous sync are read again, so
+# transactions that commit out of order are never skipped.
+SYNC_OVERLAP = timedelta(seconds=60)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings sized for a target false-positive rate."""
+
+    def __init__(self, capacity, fp_rate):
+        self.capacity = max(1, capacity)
+        self.fp_rate = fp_rate
+        self.size = max(8, math.ceil(-self.capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / self.capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+        self._lock = threading.Lock()
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        # Kirsch-Mitzenmacher double hashing: k positions from two hashes
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+    def add(self, key):
+        positions = self._positions(key)
+        with self._lock:
+            if all(self._bits[p >> 3] & (1 << (p & 7)) for p in positions):
+                return
+            for position in positions:
+                self._bits[position >> 3] |= 1 << (position & 7)
+            self.count += 1
+
+    def __contains__(self, key):
+        bits = self._bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+    @property
+    def memory_bytes(self):
+        return len(self._bits)
+
+    def estimated_fp_rate(self):
+        """False-positive rate expected at the current number of keys"""
+        return (1 - math.exp(-self.hash_count * self.count / self.size)) ** self.hash_count
+
+
+class BlacklistFilter:
+    """
+    Per-process Bloom filter of blacklisted refresh-token JTIs.
+
+    A JTI the filter does not contain is definitely not blacklisted, so the
+    blacklist query can be skipped; anything else falls through to the
+    database. A background thread pulls newly blacklisted rows every
+    sync_interval seconds and rebuilds the filter from scratch every
+    rebuild_interval seconds so expired tokens stop occupying it. A token
+    blacklisted by another process is therefore only recognised here after
+    the next sync; keep sync_interval short.
+    """
+
+    def __init__(self, capacity=None, fp_rate=None, sync_interval=None, rebuild_interval=None):
+        self.capacity = capacity or settings.BLACKLIST_FILTER_CAPACITY
+        self.fp_rate = fp_rate or settings.BLACKLIST_FILTER_FP_RATE
+        self.sync_interval = sync_interval or settings.BLACKLIST_FILTER_SYNC_INTERVAL
+        self.rebuild_interval = rebuild_interval or settings.BLACKLIST_FILTER_REBUILD_INTERVAL
+        self._bloom = None
+        self._synced_at = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self.skipped = 0
+        self.fallthroughs = 0
+        self.false_positives = 0
+
+    @property
+    def ready(self):
+        return self._bloom is not None
+
+    def might_contain(self, jti):
+        """False only when jti is definitely not blacklisted"""
+        bloom = self._bloom
+        if bloom is None or jti in bloom:
+            self.fallthroughs += 1
+            return True
+        self.skipped += 1
+        return False
+
+    def record_false_positive(self):
+        self.false_positives += 1
+
+    def add(self, jti):
+        bloom = self._bloom
+        if bloom is not None:
+            bloom.add(jti)
+
+    def _load(self, bloom, since=None):
+        # Always the primary: replica lag would let revoked tokens through
+        rows = BlacklistedToken.objects.using(DEFAULT_DB_ALIAS).filter(
+            token__expires_at__gt=timezone.now()
+        )
+        if since is not None:
+            rows = rows.filter(blacklisted_at__gte=since - SYNC_OVERLAP)
+        for jti in rows.values_list('token__jti', flat=True).iterator(chunk_size=10000):
+            bloom.add(jti)
+
+    def rebuild(self):
+        """Replace the filter with one built from the blacklist table"""
+        started_at = timezone.now()
+        live = BlacklistedToken.objects.using(DEFAULT_DB_ALIAS).filter(
+            token__expires_at__gt=started_at
+        ).count()
+        bloom = BloomFilter(max(self.capacity, int(live * 1.25)), self.fp_rate)
+        self._load(bloom)
+        with self._lock:
+            self._bloom = bloom
+            self._synced_at = started_at
+        # Pick up anything blacklisted while the new filter was being built
+        self.sync()
+
+    def sync(self):
+        """Add rows blacklisted since the previous sync"""
+        bloom, since = self._bloom, self._synced_at
+        if bloom is None:
+            return
+        started_at = timezone.now()
+        self._load(bloom, since=since)
+        with self._lock:
+            if self._bloom is bloom:
+                self._synced_at = started_at
+
+    def start(self):
+        """Start the background sync thread once per process"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run, name='blacklist-filter', daemon=True
+            )
+        self._thread.start()
+
+    def _run(self):
+        next_rebuild = 0
+        while True:
+            close_old_connections()
+            try:
+                if time.monotonic() >= next_rebuild:
+                    self.rebuild()
+                    next_rebuild = time.monotonic() + self.rebuild_interval
+                else:
+                    self.sync()
+            except Exception as exc:
+                logger.error("Failed to refresh the token blacklist filter: %s", exc)
+            time.sleep(self.sync_interval)
+
+    def stats(self):
+        bloom = self._bloom
+        return {
+            'ready': bloom is not None,
+            'entries': bloom.count if bloom else 0,
+            'capacity': bloom.capacity if bloom else self.capacity,
+            'memory_bytes': bloom.memory_bytes if bloom else 0,
+            'hash_count': bloom.hash_count if bloom else 0,
+            'target_fp_rate': self.fp_rate,
+            'estimated_fp_rate': bloom.estimated_fp_rate() if bloom else 0.0,
+            'skipped_lookups': self.skipped,
+            'db_lookups': self.fallthroughs,
+            'false_positives': self.false_positives,
+        }
+
+
+blacklist_filter = BlacklistFilter()
@@ -0,0 +1,82 @@
+"""
+Conditional requests on the profile, validated by User.updated_at.
+
+Every profile response carries an ETag and a Last-Modified derived from the
+user's updated_at, which changes on each save. A GET with a matching
+If-None-Match or If-Modified-Since is answered 304 before the profile is
+serialized; with JWT_STATELESS_AUTH or JWT_USER_CACHE the validators come
+from the token claims or the cached user, so nothing is read from the
+database either. A PUT with If-Match or If-Unmodified-Since only saves when
+the profile is unchanged since the client read it, and is answered 412
+otherwise.
+"""
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .models import User, user_updated
+
+PRECONDITION_HEADERS = ('HTTP_IF_MATCH', 'HTTP_IF_UNMODIFIED_SINCE')
+
+
+def profile_etag(user):
+    """Strong ETag of the user's profile, as the quoted header value"""
+    updated_at = user.updated_at
+    return quote_etag(f'{user.pk}-{int(updated_at.timestamp() * 1_000_000)}')
+
+
+def profile_last_modified(user):
+    """updated_at as a timestamp, truncated to the seconds of HTTP dates"""
+    return int(user.updated_at.timestamp())
+
+
+def conditional_response(request, user):
+    """
+    304 or 412 response for the conditional headers of request, or None when
+    the request should be carried out
+    """
+    if user.updated_at is None:
+        return None
+    response = get_conditional_response(
+        request,
+        etag=profile_etag(user),
+        last_modified=profile_last_modified(user),
+    )
+    if response is not None:
+        add_validators(response, user)
+    return response
+
+
+def add_validators(response, user):
+    """Set the ETag and Last-Modified of user's profile on response"""
+    if user.updated_at is not None:
+        response['ETag'] = profile_etag(user)
+        response['Last-Modified'] = http_date(profile_last_modified(user))
+    # The profile depends on the token; caches may keep it but must revalidate
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ['Authorization'])
+    return response
+
+
+def has_preconditions(request):
+    return any(header in request.META for header in PRECONDITION_HEADERS)
+
+
+def save_if_unchanged(user, data):
+    """
+    Write data to user's row only if updated_at still has the value user was
+    loaded with; returns False when another request saved the user first.
+
+    The check and the write are one UPDATE statement, so two requests sending
+    the same If-Match cannot both pass it.
+    """
+    now = timezone.now()
+    if not User.objects.filter(pk=user.pk, updated_at=user.updated_at).update(
+        **data, updated_at=now
+    ):
+        return False
+    for field, value in data.items():
+        setattr(user, field, value)
+    user.updated_at = now
+    user_updated(user.pk)
+    return True
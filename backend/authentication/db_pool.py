@@ -0,0 +1,75 @@
+import threading
+from collections import Counter
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class ConnectionCounter:
+    """Database connections opened by this process, per alias."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._opened = Counter()
+
+    def record(self, alias):
+        with self._lock:
+            self._opened[alias] += 1
+
+    def opened(self, alias):
+        with self._lock:
+            return self._opened[alias]
+
+
+connection_counter = ConnectionCounter()
+
+
+def pool_stats(alias=DEFAULT_DB_ALIAS):
+    """
+    Connection reuse statistics of this process for the given database.
+
+    With the psycopg pool the figures come from the pool itself: connections
+    in use and idle, requests waiting for one and the mean time a checkout
+    waited. In the other modes connections_opened, which counts every
+    connection Django opens (pool checkouts included), stays flat while
+    connections are being reused.
+    """
+    connection = connections[alias]
+    pool = getattr(connection, 'pool', None)
+    if pool is not None:
+        mode = 'pool'
+    elif connection.settings_dict.get('CONN_MAX_AGE'):
+        mode = 'persistent'
+    else:
+        mode = 'off'
+
+    stats = {
+        'vendor': connection.vendor,
+        'mode': mode,
+        'health_checks': connection.settings_dict.get('CONN_HEALTH_CHECKS', False),
+        'connections_opened': connection_counter.opened(alias),
+    }
+    if mode == 'persistent':
+        stats['conn_max_age'] = connection.settings_dict['CONN_MAX_AGE']
+    if pool is None:
+        return stats
+
+    raw = pool.get_stats()
+    checkouts = raw.get('requests_num', 0)
+    connects = raw.get('connections_num', 0)
+    stats.update({
+        'min_size': raw.get('pool_min'),
+        'max_size': raw.get('pool_max'),
+        'size': raw.get('pool_size', 0),
+        'in_use': raw.get('pool_size', 0) - raw.get('pool_available', 0),
+        'idle': raw.get('pool_available', 0),
+        'waiting': raw.get('requests_waiting', 0),
+        'checkouts': checkouts,
+        'checkouts_queued': raw.get('requests_queued', 0),
+        'checkout_errors': raw.get('requests_errors', 0),
+        'avg_checkout_ms': raw.get('requests_wait_ms', 0) / checkouts if checkouts else 0.0,
+        'pool_connections_opened': connects,
+        'avg_connect_ms': raw.get('connections_ms', 0) / connects if connects else 0.0,
+        'connections_lost': raw.get('connections_lost', 0),
+        'max_lifetime': connection.settings_dict['OPTIONS']['pool'].get('max_lifetime'),
+    })
+    return stats
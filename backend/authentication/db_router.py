@@ -0,0 +1,182 @@
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import TokenBackendError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.state import token_backend
+
+PIN_KEY_PREFIX = 'db:pin'
+
+
+class _Pinning:
+    """Where the current request reads from, and which users it wrote"""
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+        self.user_ids = set()
+
+
+_pinning = ContextVar('db_pinning', default=None)
+
+
+def _state():
+    state = _pinning.get()
+    if state is None:
+        # Outside a request (commands, workers) pinning lasts for the context
+        state = _Pinning()
+        _pinning.set(state)
+    return state
+
+
+def pin_to_primary(user_id=None):
+    """
+    Send the remaining reads of this request to the primary, and those of
+    user_id's requests for the next DB_REPLICA_PIN_SECONDS as well.
+    """
+    state = _state()
+    state.pinned = state.wrote = True
+    if user_id is not None:
+        state.user_ids.add(user_id)
+
+
+def read_from_primary():
+    """
+    Send the remaining reads of this request to the primary without pinning
+    anybody for later requests: for reads that decide whether to let a
+    client in, which must see a password or status changed moments ago.
+    """
+    _state().pinned = True
+
+
+def is_pinned():
+    state = _pinning.get()
+    return state is not None and state.pinned
+
+
+# Apps whose every read decides whether a token is still valid; a lagging
+# replica would accept refresh tokens that were just blacklisted
+PRIMARY_APP_LABELS = {'token_blacklist'}
+
+
+class PrimaryReplicaRouter:
+    """
+    Sends writes to the primary and reads to a random replica.
+
+    A request reads from the primary once it has written anything, inside
+    transactions on the primary, and for DB_REPLICA_PIN_SECONDS after the
+    same user wrote (see ReplicaPinningMiddleware), so nobody reads back
+    data older than their own changes. Token blacklist reads and those
+    after read_from_primary() always use the primary. Without
+    DB_REPLICA_ALIASES everything goes to the default database.
+    """
+
+    def __init__(self, replicas=None):
+        self.replicas = list(settings.DB_REPLICA_ALIASES if replicas is None else replicas)
+
+    def db_for_read(self, model, **_hints):
+        if (
+            not self.replicas
+            or model._meta.app_label in PRIMARY_APP_LABELS
+            or is_pinned()
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return random.choice(self.replicas)
+
+    def db_for_write(self, model, **hints):
+        instance = hints.get('instance')
+        if model._meta.label == settings.AUTH_USER_MODEL and instance is not None:
+            pin_to_primary(instance.pk)
+        else:
+            pin_to_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, _obj1, _obj2, **_hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+
+def _pin_key(user_id):
+    return f'{PIN_KEY_PREFIX}:{user_id}'
+
+
+def _token_user_id(request):
+    """
+    The user id claimed by the request's access token, without verifying it.
+
+    Only used to decide where reads go: a forged token can at most send its
+    bearer's reads to the primary.
+    """
+    authenticator = JWTAuthentication()
+    header = authenticator.get_header(request)
+    raw_token = authenticator.get_raw_token(header) if header is not None else None
+    if raw_token is None:
+        return None
+    try:
+        payload = token_backend.decode(raw_token, verify=False)
+    except TokenBackendError:
+        return None
+    return payload.get(api_settings.USER_ID_CLAIM)
+
+
+class ReplicaPinningMiddleware:
+    """
+    Scopes read-your-writes pinning to a request.
+
+    Requests by a user who wrote within DB_REPLICA_PIN_SECONDS start pinned
+    to the primary; users written by a request, and its token user if it
+    wrote at all, are pinned in the shared cache when it ends. Not loaded
+    without replicas.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DB_REPLICA_ALIASES:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _written(self, state, user_id):
+        # Reading alone must not extend an existing pin
+        if not state.wrote:
+            return {}
+        user_ids = state.user_ids | ({user_id} if user_id is not None else set())
+        return {_pin_key(pk): True for pk in user_ids}
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        user_id = _token_user_id(request)
+        state = _Pinning(user_id is not None and bool(cache.get(_pin_key(user_id))))
+        token = _pinning.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _pinning.reset(token)
+        written = self._written(state, user_id)
+        if written:
+            cache.set_many(written, timeout=settings.DB_REPLICA_PIN_SECONDS)
+        return response
+
+    async def __acall__(self, request):
+        user_id = _token_user_id(request)
+        state = _Pinning(user_id is not None and bool(await cache.aget(_pin_key(user_id))))
+        token = _pinning.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _pinning.reset(token)
+        written = self._written(state, user_id)
+        if written:
+            await cache.aset_many(written, timeout=settings.DB_REPLICA_PIN_SECONDS)
+        return response
@@ -0,0 +1,114 @@
+import logging
+import smtplib
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.mail import get_connection
+
+logger = logging.getLogger(__name__)
+
+
+def is_transient(exc):
+    """Whether a send failure is worth retrying on a fresh connection"""
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return 400 <= exc.smtp_code < 500
+    if isinstance(exc, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(exc, smtplib.SMTPException):
+        return False
+    return isinstance(exc, OSError)
+
+
+class SMTPConnectionPool:
+    """
+    Bounded pool of open, authenticated mail connections.
+
+    Connections are opened lazily, reused for every message sent through the
+    pool and only closed when the pool is closed or a connection breaks, so
+    the TCP/STARTTLS/AUTH handshake is paid once per connection rather than
+    once per message. Concurrency towards a single recipient domain is capped
+    separately so one provider is never hit with the whole pool at once.
+    """
+
+    def __init__(self, size=None, per_domain_limit=None, max_retries=2, **backend_kwargs):
+        self.size = size or settings.EMAIL_POOL_SIZE
+        self.per_domain_limit = per_domain_limit or settings.EMAIL_POOL_PER_DOMAIN_LIMIT
+        self.max_retries = max_retries
+        self._backend_kwargs = backend_kwargs
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._idle = []
+        self._lock = threading.Lock()
+        self._domain_slots = defaultdict(
+            lambda: threading.BoundedSemaphore(self.per_domain_limit)
+        )
+        self.connections_opened = 0
+
+    def _open(self):
+        connection = get_connection(fail_silently=False, **self._backend_kwargs)
+        connection.open()
+        with self._lock:
+            self.connections_opened += 1
+        return connection
+
+    @staticmethod
+    def _discard(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    @contextmanager
+    def _domain_slot(self, domain):
+        with self._lock:
+            slot = self._domain_slots[domain]
+        with slot:
+            yield
+
+    def _take(self):
+        with self._lock:
+            connection = self._idle.pop() if self._idle else None
+        return connection or self._open()
+
+    def send(self, message):
+        """
+        Send one EmailMessage over a pooled connection.
+
+        Transient failures (dropped connections, 4xx replies, socket errors)
+        are retried on a freshly opened connection up to max_retries times;
+        anything else is raised to the caller.
+        """
+        domain = message.to[0].rsplit('@', 1)[-1].lower()
+        with self._domain_slot(domain), self._slots:
+            connection = None
+            try:
+                for attempt in range(self.max_retries + 1):
+                    try:
+                        if connection is None:
+                            connection = self._take()
+                        connection.send_messages([message])
+                        return
+                    except Exception as exc:
+                        if not is_transient(exc):
+                            raise
+                        if connection is not None:
+                            self._discard(connection)
+                            connection = None
+                        if attempt == self.max_retries:
+                            raise
+                        logger.warning(
+                            "Transient mail error for %s, reconnecting: %s",
+                            message.to[0], exc
+                        )
+            finally:
+                if connection is not None:
+                    with self._lock:
+                        self._idle.append(connection)
+
+    def close(self):
+        """Close every idle connection"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            self._discard(connection)
@@ -0,0 +1,62 @@
+import re
+import secrets
+from functools import lru_cache
+
+from django.template.loader import render_to_string
+from django.utils.html import conditional_escape, strip_tags
+
+from .metrics import EMAIL_RENDER_SECONDS
+
+
+class CompiledEmailTemplate:
+    """
+    An email template rendered once with placeholder markers.
+
+    The template is rendered through Django a single time with a unique
+    marker in place of every variable, and strip_tags runs once on that
+    output to produce the plaintext variant. Both results are split on the
+    markers, so rendering a message only joins literal segments with the
+    escaped values. This matches render_to_string + strip_tags as long as the
+    template only interpolates its variables (no tags branching on them).
+    """
+
+    def __init__(self, template_name, variables):
+        self.template_name = template_name
+        self.variables = tuple(variables)
+        self._render_seconds = EMAIL_RENDER_SECONDS.labels(template_name)
+        nonce = secrets.token_hex(8)
+        markers = {name: f'__email_var_{nonce}_{name}__' for name in self.variables}
+        pattern = re.compile(
+            '(' + '|'.join(re.escape(marker) for marker in markers.values()) + ')'
+        )
+        names = {marker: name for name, marker in markers.items()}
+
+        html = render_to_string(template_name, markers)
+        self._html_parts = self._split(pattern, names, html)
+        self._text_parts = self._split(pattern, names, strip_tags(html))
+
+    @staticmethod
+    def _split(pattern, names, rendered):
+        parts = pattern.split(rendered)
+        # re.split with a capturing group puts the markers at odd indices
+        for i in range(1, len(parts), 2):
+            parts[i] = names[parts[i]]
+        return parts
+
+    @staticmethod
+    def _join(parts, values):
+        return ''.join(
+            values[part] if i % 2 else part for i, part in enumerate(parts)
+        )
+
+    def render(self, context):
+        """Return the (html, plaintext) pair for the given context"""
+        with self._render_seconds.time():
+            values = {name: str(conditional_escape(context[name])) for name in self.variables}
+            return self._join(self._html_parts, values), self._join(self._text_parts, values)
+
+
+@lru_cache(maxsize=None)
+def get_email_template(template_name, variables):
+    """Compile a template once per process; variables is a tuple of names"""
+    return CompiledEmailTemplate(template_name, variables)
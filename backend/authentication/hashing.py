@@ -0,0 +1,131 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .metrics import PASSWORD_HASHING_SECONDS
+
+
+class HashingUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many sign-ins in progress, please try again shortly.'
+    default_code = 'hashing_unavailable'
+
+
+def _init_worker():
+    """Configure Django in a freshly spawned hashing process"""
+    import django  # pylint: disable=import-outside-toplevel
+    django.setup()
+
+
+class PasswordHashingService:
+    """
+    Runs password hashing and verification off the request thread.
+
+    Work goes to a pool of worker processes when PASSWORD_HASHING_POOL is
+    enabled and to a thread pool otherwise (hashlib releases the GIL, so
+    threads still hash in parallel). At most max_pending hashes may be
+    queued or running per process; beyond that HashingUnavailable is raised,
+    which DRF renders as a 503, instead of letting latency grow unbounded.
+    """
+
+    def __init__(self, workers=None, max_pending=None, use_processes=None):
+        self.workers = workers or settings.PASSWORD_HASHING_WORKERS
+        self.max_pending = (
+            max_pending if max_pending is not None else settings.PASSWORD_HASHING_MAX_PENDING
+        )
+        self.use_processes = (
+            use_processes if use_processes is not None else settings.PASSWORD_HASHING_POOL
+        )
+        self._executor = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                if self.use_processes:
+                    # Spawned, not forked: the web process runs threads and
+                    # holds database connections a fork would copy
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context('spawn'),
+                        initializer=_init_worker,
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix='password-hashing'
+                    )
+            return self._executor
+
+    def _done(self, _future):
+        with self._lock:
+            self.pending -= 1
+            self.completed += 1
+
+    def submit(self, func, *args):
+        """Queue func(*args) on the pool, raising HashingUnavailable when it is full"""
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise HashingUnavailable()
+            self.pending += 1
+        try:
+            future = self._get_executor().submit(func, *args)
+        except BaseException:
+            with self._lock:
+                self.pending -= 1
+            raise
+        future.add_done_callback(self._done)
+        return future
+
+    def make_password(self, password):
+        if password is None:
+            # Unusable passwords involve no hashing
+            return hashers.make_password(None)
+        with PASSWORD_HASHING_SECONDS.labels('make').time():
+            return self.submit(hashers.make_password, password).result()
+
+    def verify_password(self, password, encoded):
+        """verify_password on the pool; returns (is_correct, must_update)"""
+        with PASSWORD_HASHING_SECONDS.labels('verify').time():
+            return self.submit(hashers.verify_password, password, encoded).result()
+
+    async def amake_password(self, password):
+        if password is None:
+            return hashers.make_password(None)
+        with PASSWORD_HASHING_SECONDS.labels('make').time():
+            return await asyncio.wrap_future(self.submit(hashers.make_password, password))
+
+    async def averify_password(self, password, encoded):
+        with PASSWORD_HASHING_SECONDS.labels('verify').time():
+            return await asyncio.wrap_future(
+                self.submit(hashers.verify_password, password, encoded)
+            )
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'mode': 'processes' if self.use_processes else 'threads',
+                'workers': self.workers,
+                'max_pending': self.max_pending,
+                'pending': self.pending,
+                'completed': self.completed,
+                'rejected': self.rejected,
+            }
+
+
+hashing_service = PasswordHashingService()
@@ -0,0 +1,165 @@
+"""
+Tokens carried by the email verification and password reset links.
+
+By default a token is a random UUID stored as an EmailVerificationToken or
+PasswordResetToken row. With SIGNED_AUTH_TOKENS it is signed instead: the
+user id and a fingerprint of the user fields the link is about to change,
+timestamped and HMAC-signed with SECRET_KEY. Issuing one writes no row and
+checking one reads only the user. Following the link changes the
+fingerprinted fields, which invalidates the token without recording that
+it was used.
+"""
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from .hashing import hashing_service
+from .models import EmailVerificationToken, PasswordResetToken, User, user_updated
+
+VERIFY_EMAIL = 'verify_email'
+RESET_PASSWORD = 'reset_password'
+
+# The user fields a signed token of each purpose is bound to
+FINGERPRINT_FIELDS = {
+    VERIFY_EMAIL: ('email', 'is_email_verified'),
+    RESET_PASSWORD: ('email', 'password'),
+}
+
+LIFETIMES = {
+    VERIFY_EMAIL: EmailVerificationToken.LIFETIME,
+    RESET_PASSWORD: PasswordResetToken.LIFETIME,
+}
+
+
+def fingerprint(purpose, values):
+    """Keyed digest of the fingerprinted field values, in FINGERPRINT_FIELDS order"""
+    value = '\x00'.join(str(value) for value in values)
+    return salted_hmac(f'{__name__}.{purpose}', value).hexdigest()[:32]
+
+
+def make_signed_token(user, purpose):
+    values = [getattr(user, name) for name in FINGERPRINT_FIELDS[purpose]]
+    return signing.dumps([user.pk, fingerprint(purpose, values)], salt=f'{__name__}.{purpose}')
+
+
+def _load_signed_token(token, purpose):
+    """
+    (user_id, fingerprint) of a signed token, or raises
+    signing.SignatureExpired or signing.BadSignature
+    """
+    user_id, digest = signing.loads(
+        token, salt=f'{__name__}.{purpose}', max_age=LIFETIMES[purpose]
+    )
+    return user_id, digest
+
+
+def issue_verification_token(user):
+    """Token for the verification email sent on signup"""
+    if settings.SIGNED_AUTH_TOKENS:
+        return make_signed_token(user, VERIFY_EMAIL)
+    return str(EmailVerificationToken.objects.create(user=user).token)
+
+
+def issue_verification_tokens(users):
+    """issue_verification_token for many users, with one INSERT when they are stored"""
+    if settings.SIGNED_AUTH_TOKENS:
+        return [make_signed_token(user, VERIFY_EMAIL) for user in users]
+    # bulk_create skips save(), which fills in the expiry
+    expires_at = timezone.now() + EmailVerificationToken.LIFETIME
+    tokens = EmailVerificationToken.objects.bulk_create(
+        EmailVerificationToken(user=user, expires_at=expires_at) for user in users
+    )
+    return [str(token.token) for token in tokens]
+
+
+def reissue_verification_token(user):
+    """
+    Token for a resent verification email, or None when the stored token
+    sent moments ago is kept (see EmailVerificationToken.reissue)
+    """
+    if settings.SIGNED_AUTH_TOKENS:
+        return make_signed_token(user, VERIFY_EMAIL)
+    token = EmailVerificationToken.reissue(user)
+    return str(token) if token is not None else None
+
+
+def reissue_reset_token(user):
+    """
+    Token for a password reset email, or None when the stored token sent
+    moments ago is kept (see PasswordResetToken.reissue)
+    """
+    if settings.SIGNED_AUTH_TOKENS:
+        return make_signed_token(user, RESET_PASSWORD)
+    token = PasswordResetToken.reissue(user)
+    return str(token) if token is not None else None
+
+
+def verify_email(token):
+    """
+    Verify the email address token was issued for; returns one of the
+    EmailVerificationToken.consume results.
+    """
+    if not settings.SIGNED_AUTH_TOKENS:
+        return EmailVerificationToken.consume(token)
+    return _verify_email_signed(token)
+
+
+def _verify_email_signed(token):
+    try:
+        user_id, digest = _load_signed_token(token, VERIFY_EMAIL)
+    except signing.SignatureExpired:
+        return EmailVerificationToken.EXPIRED
+    except signing.BadSignature:
+        return EmailVerificationToken.INVALID
+
+    user = User.objects.filter(pk=user_id).only('email', 'is_email_verified').first()
+    # Tokens are only issued to unverified users, so a verified user's
+    # token still matches the fingerprint it was issued with
+    if user is None or not constant_time_compare(
+        digest, fingerprint(VERIFY_EMAIL, [user.email, False])
+    ):
+        return EmailVerificationToken.INVALID
+    if user.is_email_verified:
+        return EmailVerificationToken.ALREADY_VERIFIED
+    # Conditional on the fingerprinted state, so a concurrent request for
+    # the same token finds nothing left to update
+    if not User.objects.filter(pk=user_id, email=user.email, is_email_verified=False).update(
+        is_email_verified=True, updated_at=timezone.now()
+    ):
+        return EmailVerificationToken.ALREADY_VERIFIED
+    user_updated(user_id)
+    return EmailVerificationToken.VERIFIED
+
+
+def reset_password(token, raw_password):
+    """
+    Set the password of the user token was issued for; returns one of the
+    PasswordResetToken.set_password results.
+    """
+    if not settings.SIGNED_AUTH_TOKENS:
+        return PasswordResetToken.set_password(token, raw_password)
+    return _reset_password_signed(token, raw_password)
+
+
+def _reset_password_signed(token, raw_password):
+    try:
+        user_id, digest = _load_signed_token(token, RESET_PASSWORD)
+    except signing.SignatureExpired:
+        return PasswordResetToken.EXPIRED
+    except signing.BadSignature:
+        return PasswordResetToken.INVALID
+
+    user = User.objects.filter(pk=user_id).only('email', 'password').first()
+    if user is None or not constant_time_compare(
+        digest, fingerprint(RESET_PASSWORD, [user.email, user.password])
+    ):
+        return PasswordResetToken.INVALID
+    # The new hash changes the fingerprint, which retires the token; only
+    # one of several concurrent requests still matches the old hash
+    if not User.objects.filter(pk=user_id, email=user.email, password=user.password).update(
+        password=hashing_service.make_password(raw_password), updated_at=timezone.now()
+    ):
+        return PasswordResetToken.INVALID
+    user_updated(user_id)
+    return PasswordResetToken.RESET
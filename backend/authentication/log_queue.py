@@ -0,0 +1,197 @@
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+import time
+from datetime import datetime, timezone
+
+from .metrics import LOG_RECORDS_DROPPED
+
+_STOP = object()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for log shippers"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'module': record.module,
+            'process': record.process,
+            'thread': record.thread,
+        }
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry['stack_info'] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+
+class SampledInfoFilter(logging.Filter):
+    """
+    Thins out records below WARNING: at most per_second records of each
+    message per second, and of those a sample_rate fraction. Warnings and
+    errors always pass.
+
+    Counts are kept without a lock, so a burst across threads may let a
+    few extra records through.
+    """
+
+    def __init__(self, per_second=0, sample_rate=1.0):
+        super().__init__()
+        self.per_second = per_second
+        self.sample_rate = sample_rate
+        self._second = 0
+        self._counts = {}
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        if self.per_second:
+            second = int(time.monotonic())
+            if second != self._second:
+                self._second = second
+                self._counts = {}
+            # The unformatted message, so one call site counts as one message
+            key = (record.name, record.msg)
+            count = self._counts.get(key, 0) + 1
+            self._counts[key] = count
+            if count > self.per_second:
+                LOG_RECORDS_DROPPED.labels('rate_limited').inc()
+                return False
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            LOG_RECORDS_DROPPED.labels('sampled').inc()
+            return False
+        return True
+
+
+class QueuedFileHandler(logging.handlers.QueueHandler):
+    """
+    Appends records to a file from a background thread.
+
+    Logging threads only put the record on a bounded queue. When the queue
+    is full the record is dropped rather than waited for. Drops are counted
+    in auth_log_records_dropped_total and noted in the file with the next
+    batch. The writer takes up to batch_size records at a time, formats
+    them and flushes the file once per batch.
+    """
+
+    def __init__(self, filename, maxsize=10000, batch_size=256, encoding='utf-8'):
+        super().__init__(queue.Queue(maxsize))
+        self.filename = os.path.abspath(filename)
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.encoding = encoding
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self.lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                # Forked: the parent's queue and writer did not come along
+                self.queue = queue.Queue(self.maxsize)
+            self._thread = threading.Thread(
+                target=self._run, args=(self.queue,), name='log-writer', daemon=True
+            )
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def prepare(self, record):
+        # Merge the arguments now, while they hold this moment's values;
+        # formatting is left to the writer thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+            LOG_RECORDS_DROPPED.labels('queue_full').inc()
+
+    def emit(self, record):
+        self._ensure_started()
+        try:
+            self.enqueue(self.prepare(record))
+        except Exception:  # pylint: disable=broad-exception-caught
+            self.handleError(record)
+
+    def _take_dropped(self):
+        with self._dropped_lock:
+            dropped, self.dropped = self.dropped, 0
+        return dropped
+
+    def _run(self, records):
+        with open(self.filename, 'a', encoding=self.encoding) as stream:
+            while True:
+                batch = [records.get()]
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(records.get_nowait())
+                    except queue.Empty:
+                        break
+                self._write(stream, [record for record in batch if record is not _STOP])
+                for _ in batch:
+                    records.task_done()
+                if _STOP in batch:
+                    return
+
+    def _write(self, stream, batch):
+        lines = []
+        dropped = self._take_dropped()
+        if dropped:
+            lines.append(self.format(logging.makeLogRecord({
+                'name': __name__,
+                'levelno': logging.WARNING,
+                'levelname': 'WARNING',
+                'msg': f'Dropped {dropped} log records, the log queue was full',
+            })))
+        for record in batch:
+            try:
+                lines.append(self.format(record))
+            except Exception:  # pylint: disable=broad-exception-caught
+                self.handleError(record)
+        if not lines:
+            return
+        try:
+            stream.write('\n'.join(lines) + '\n')
+            stream.flush()
+        except OSError:
+            self.handleError(batch[-1] if batch else None)
+
+    def flush(self):
+        """Wait until the writer has written every queued record"""
+        thread = self._thread
+        if thread is None or self._pid != os.getpid():
+            return
+        with self.queue.all_tasks_done:
+            while self.queue.unfinished_tasks and thread.is_alive():
+                self.queue.all_tasks_done.wait(0.1)
+
+    def close(self):
+        thread = self._thread
+        if thread is not None and self._pid == os.getpid() and thread.is_alive():
+            try:
+                self.queue.put(_STOP, timeout=1)
+            except queue.Full:
+                pass
+            thread.join(timeout=5)
+        self._thread = None
+        self._pid = None
+        super().close()
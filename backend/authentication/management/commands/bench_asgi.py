@@ -0,0 +1,222 @@
+import asyncio
+import json
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from django.urls import path
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+from authentication import async_views, link_tokens, views
+from authentication.models import EmailOutbox, User
+from authentication.tokens import ProfileRefreshToken
+
+BENCH_DOMAIN = 'bench-asgi.invalid'
+BENCH_EMAIL = f'user@{BENCH_DOMAIN}'
+BENCH_PASSWORD = 'bench-asgi-password'
+STACKS = ('sync', 'async')
+FLOWS = (
+    'register', 'login', 'verify_email', 'forgot_password', 'reset_password', 'profile'
+)
+STACK_VIEWS = {'sync': views, 'async': async_views}
+
+# Both stacks side by side; installed as ROOT_URLCONF while the benchmark runs
+urlpatterns = [
+    path(f'{stack}/{flow}/', getattr(module, flow))
+    for stack, module in STACK_VIEWS.items()
+    for flow in FLOWS
+]
+
+
+async def asgi_request(application, method, url, body, headers):
+    """Drive one request through the ASGI application; returns (status, body)"""
+    host = next((h for h in settings.ALLOWED_HOSTS if h != '*'), 'localhost')
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': url,
+        'raw_path': url.encode(),
+        'query_string': b'',
+        'root_path': '',
+        'headers': [
+            (b'host', host.encode()),
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+            *headers,
+        ],
+        'client': ('127.0.0.1', 0),
+        'server': (host, 80),
+    }
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    response = {'body': b''}
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        # The client never disconnects; Django cancels this once it responds
+        return await asyncio.Future()
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+        elif message['type'] == 'http.response.body':
+            response['body'] += message.get('body', b'')
+
+    await application(scope, receive, send)
+    return response.get('status'), response['body']
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the sync DRF views against the native async views through '
+        'the ASGI application, in process and at equal concurrency, and report '
+        'requests per second and p50/p99 latency per flow.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Requests per flow and stack'
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=16,
+            help='Requests in flight at once'
+        )
+        parser.add_argument(
+            '--flows', default=','.join(FLOWS),
+            help=f'Comma-separated flows to run ({", ".join(FLOWS)})'
+        )
+
+    def handle(self, *args, **options):
+        flows = options['flows'].split(',')
+        unknown = set(flows) - set(FLOWS)
+        if unknown:
+            raise CommandError(f'Unknown flows: {", ".join(sorted(unknown))}')
+
+        self._cleanup()
+        user = User.objects.create_user(
+            email=BENCH_EMAIL, password=BENCH_PASSWORD, is_email_verified=True
+        )
+        access_token = str(ProfileRefreshToken.for_user(user).access_token)
+        # All requests come from one client; measure the views, not the throttles
+        rest_framework = {
+            **settings.REST_FRAMEWORK,
+            'DEFAULT_THROTTLE_RATES': dict.fromkeys(
+                settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']
+            ),
+        }
+        try:
+            requests = {
+                (flow, stack): self._requests(flow, options['requests'], access_token)
+                for flow in flows
+                for stack in STACKS
+            }
+            with override_settings(ROOT_URLCONF=__name__, REST_FRAMEWORK=rest_framework):
+                results = asyncio.run(self._run(requests, options))
+        finally:
+            self._cleanup()
+
+        self.stdout.write(
+            f"{'flow':>15} {'stack':>6} {'req/s':>10} {'p50 ms':>10} {'p99 ms':>10}"
+        )
+        for (flow, stack), (rps, p50, p99) in results.items():
+            self.stdout.write(f"{flow:>15} {stack:>6} {rps:>10.1f} {p50:>10.2f} {p99:>10.2f}")
+        for flow in flows:
+            speedup = results[(flow, 'async')][0] / results[(flow, 'sync')][0]
+            self.stdout.write(f'{flow}: async serves {speedup:.2f}x the requests per second')
+
+    @staticmethod
+    def _cleanup():
+        users = User.objects.filter(email__endswith=f'@{BENCH_DOMAIN}')
+        OutstandingToken.objects.filter(user__in=users).delete()
+        EmailOutbox.objects.filter(recipient__endswith=f'@{BENCH_DOMAIN}').delete()
+        users.delete()
+
+    @staticmethod
+    def _requests(flow, count, access_token):
+        """One (method, body, headers) per request; each gets fresh data"""
+        if flow == 'register':
+            run = time.time_ns()
+            return [
+                ('POST', json.dumps({
+                    'email': f'register-{run}-{i}@{BENCH_DOMAIN}',
+                    'password': BENCH_PASSWORD,
+                    'password_confirm': BENCH_PASSWORD,
+                }).encode(), [])
+                for i in range(count)
+            ]
+        if flow == 'login':
+            body = json.dumps({'email': BENCH_EMAIL, 'password': BENCH_PASSWORD}).encode()
+            return [('POST', body, [])] * count
+        if flow == 'forgot_password':
+            # Repeats keep the fresh token, which is the common case
+            return [('POST', json.dumps({'email': BENCH_EMAIL}).encode(), [])] * count
+        if flow == 'profile':
+            bearer = [(b'authorization', f'Bearer {access_token}'.encode())]
+            return [('GET', b'', bearer)] * count
+
+        # A user holds one token of each kind, so each request gets a user.
+        # bulk_create skips save(), which fills in the username.
+        run = time.time_ns()
+        users = User.objects.bulk_create(
+            User(
+                email=f'{flow}-{run}-{i}@{BENCH_DOMAIN}',
+                username=f'{flow}-{run}-{i}',
+                password=make_password(None),
+            )
+            for i in range(count)
+        )
+        if flow == 'verify_email':
+            return [
+                ('POST', json.dumps({'token': token}).encode(), [])
+                for token in link_tokens.issue_verification_tokens(users)
+            ]
+        return [
+            ('POST', json.dumps({
+                'token': link_tokens.reissue_reset_token(user),
+                'password': BENCH_PASSWORD,
+                'password_confirm': BENCH_PASSWORD,
+            }).encode(), [])
+            for user in users
+        ]
+
+    async def _run(self, requests, options):
+        application = get_asgi_application()
+        results = {}
+        for (flow, stack), flow_requests in requests.items():
+            results[(flow, stack)] = await self._measure(
+                application, f'/{stack}/{flow}/', flow_requests, options
+            )
+        return results
+
+    async def _measure(self, application, url, requests, options):
+        total = len(requests)
+        timings = []
+        remaining = iter(requests)
+
+        async def worker():
+            for method, body, headers in remaining:
+                start = time.perf_counter()
+                status_code, content = await asgi_request(
+                    application, method, url, body, headers
+                )
+                timings.append((time.perf_counter() - start) * 1000)
+                if not 200 <= status_code < 300:
+                    raise CommandError(
+                        f'{method} {url} returned {status_code}: {content[:200]!r}'
+                    )
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(options['concurrency'])))
+        elapsed = time.perf_counter() - start
+
+        timings.sort()
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        return total / elapsed, statistics.median(timings), p99
@@ -0,0 +1,351 @@
+import asyncio
+import io
+import json
+import platform
+import sys
+import threading
+import time
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+from authentication.link_tokens import issue_verification_tokens
+from authentication.models import EmailOutbox, User
+from authentication.tokens import ProfileRefreshToken
+
+from .bench_asgi import asgi_request
+
+BENCH_DOMAIN = 'bench-auth.invalid'
+BENCH_PASSWORD = 'bench-auth-password'
+FLOWS = ('register', 'login', 'refresh', 'profile', 'verify_email', 'logout')
+SERVERS = ('wsgi', 'asgi')
+# Figures compared against the baseline, and whether higher is better
+COMPARED = (('throughput', True), ('p50_ms', False), ('p95_ms', False))
+
+
+def percentile(timings, fraction):
+    """Nearest-rank percentile of already sorted timings"""
+    return timings[min(len(timings) - 1, int(len(timings) * fraction))]
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """
+    Describe every figure of results that is worse than the baseline by
+    more than tolerance (a fraction); flows missing from either are skipped.
+    """
+    regressions = []
+    for flow, current in results['flows'].items():
+        previous = baseline.get('flows', {}).get(flow)
+        if previous is None:
+            continue
+        for figure, higher_is_better in COMPARED:
+            now, then = current[figure], previous[figure]
+            worse = now < then * (1 - tolerance) if higher_is_better else (
+                now > then * (1 + tolerance)
+            )
+            if worse:
+                regressions.append(f'{flow} {figure}: {now:.2f} vs {then:.2f} in the baseline')
+    return regressions
+
+
+def _wsgi_request(application, method, url, body, headers):
+    """Drive one request through the WSGI application; returns (status, body)"""
+    host = next((h for h in settings.ALLOWED_HOSTS if h != '*'), 'localhost')
+    environ = {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': url,
+        'QUERY_STRING': '',
+        'SERVER_NAME': host,
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'REMOTE_ADDR': '127.0.0.1',
+        'HTTP_HOST': host,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.url_scheme': 'http',
+        'wsgi.version': (1, 0),
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in headers:
+        environ['HTTP_' + name.decode().upper().replace('-', '_')] = value.decode()
+
+    response = {}
+
+    def start_response(status, _headers, _exc_info=None):
+        response['status'] = int(status.split(' ', 1)[0])
+
+    chunks = application(environ, start_response)
+    try:
+        content = b''.join(chunks)
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+    return response['status'], content
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-test the authentication flows through the in-process WSGI or ASGI '
+        'application at a given concurrency. Reports throughput and p50/p95/p99 '
+        'latency per flow, optionally writes them as JSON, and exits non-zero '
+        'when a flow regressed against a baseline file.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--flows', default=','.join(FLOWS),
+            help=f'Comma-separated flows to run ({", ".join(FLOWS)})'
+        )
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Requests per flow'
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=8,
+            help='Requests in flight at once'
+        )
+        parser.add_argument(
+            '--server', choices=SERVERS, default='wsgi',
+            help='Application to drive the requests through'
+        )
+        parser.add_argument(
+            '--output',
+            help='Write the results to this JSON file'
+        )
+        parser.add_argument(
+            '--baseline',
+            help='JSON results of an earlier run to compare against'
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=10.0,
+            help='Percentage a figure may be worse than the baseline'
+        )
+
+    def handle(self, *args, **options):
+        flows = options['flows'].split(',')
+        unknown = set(flows) - set(FLOWS)
+        if unknown:
+            raise CommandError(f'Unknown flows: {", ".join(sorted(unknown))}')
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--requests and --concurrency must be positive')
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline'], encoding='utf-8') as baseline_file:
+                    baseline = json.load(baseline_file)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f'Cannot read the baseline: {exc}') from exc
+
+        # All requests come from one client; measure the views, not the throttles
+        rest_framework = {
+            **settings.REST_FRAMEWORK,
+            'DEFAULT_THROTTLE_RATES': dict.fromkeys(
+                settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']
+            ),
+        }
+        self._cleanup()
+        try:
+            with override_settings(REST_FRAMEWORK=rest_framework):
+                flow_results = {
+                    flow: self._measure(self._requests(flow, options['requests']), options)
+                    for flow in flows
+                }
+        finally:
+            self._cleanup()
+
+        results = {
+            'meta': {
+                'server': options['server'],
+                'requests': options['requests'],
+                'concurrency': options['concurrency'],
+                'database': connections['default'].vendor,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'recorded_at': timezone.now().isoformat(),
+            },
+            'flows': flow_results,
+        }
+        self._print(results)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output_file:
+                json.dump(results, output_file, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if baseline is not None:
+            regressions = compare_to_baseline(results, baseline, options['tolerance'] / 100)
+            if regressions:
+                raise CommandError(
+                    'Regressions against the baseline:\n' + '\n'.join(regressions)
+                )
+            self.stdout.write(self.style.SUCCESS(
+                f"No flow is more than {options['tolerance']:g}% worse than the baseline"
+            ))
+
+    @staticmethod
+    def _cleanup():
+        users = User.objects.filter(email__endswith=f'@{BENCH_DOMAIN}')
+        OutstandingToken.objects.filter(user__in=users).delete()
+        EmailOutbox.objects.filter(recipient__endswith=f'@{BENCH_DOMAIN}').delete()
+        users.delete()
+
+    def _requests(self, flow, count):
+        """One (method, url, body, headers) per request; each gets fresh data"""
+        if flow == 'register':
+            run = time.time_ns()
+            return [
+                ('POST', reverse('authentication:register'), {
+                    'email': f'register-{run}-{i}@{BENCH_DOMAIN}',
+                    'password': BENCH_PASSWORD,
+                    'password_confirm': BENCH_PASSWORD,
+                }, [])
+                for i in range(count)
+            ]
+
+        user = User.objects.create_user(
+            email=f'{flow}-{time.time_ns()}@{BENCH_DOMAIN}',
+            password=BENCH_PASSWORD,
+            is_email_verified=True,
+        )
+        refresh = ProfileRefreshToken.for_user(user)
+        bearer = [(b'authorization', f'Bearer {refresh.access_token}'.encode())]
+        if flow == 'login':
+            body = {'email': user.email, 'password': BENCH_PASSWORD}
+            return [('POST', reverse('authentication:login'), body, [])] * count
+        if flow == 'profile':
+            return [('GET', reverse('authentication:profile'), None, bearer)] * count
+        if flow == 'refresh':
+            # Rotation blacklists each refresh token once it has been used
+            return [
+                ('POST', reverse('token_refresh'),
+                 {'refresh': str(ProfileRefreshToken.for_user(user))}, [])
+                for _ in range(count)
+            ]
+        if flow == 'logout':
+            return [
+                ('POST', reverse('authentication:logout'),
+                 {'refresh_token': str(ProfileRefreshToken.for_user(user))}, bearer)
+                for _ in range(count)
+            ]
+        # A user holds one verification token, so each request gets a user.
+        # bulk_create skips save(), which fills in the username.
+        run = time.time_ns()
+        users = User.objects.bulk_create(
+            User(
+                email=f'verify-{run}-{i}@{BENCH_DOMAIN}',
+                username=f'verify-{run}-{i}',
+                password=make_password(None),
+            )
+            for i in range(count)
+        )
+        return [
+            ('POST', reverse('authentication:verify_email'), {'token': token}, [])
+            for token in issue_verification_tokens(users)
+        ]
+
+    def _measure(self, requests, options):
+        requests = [
+            (method, url, json.dumps(body).encode() if body is not None else b'', headers)
+            for method, url, body, headers in requests
+        ]
+        if options['server'] == 'asgi':
+            timings, elapsed = asyncio.run(self._run_asgi(requests, options['concurrency']))
+        else:
+            timings, elapsed = self._run_wsgi(requests, options['concurrency'])
+
+        timings.sort()
+        return {
+            'requests': len(timings),
+            'throughput': len(timings) / elapsed,
+            'p50_ms': percentile(timings, 0.50),
+            'p95_ms': percentile(timings, 0.95),
+            'p99_ms': percentile(timings, 0.99),
+        }
+
+    @staticmethod
+    def _check(request, status_code, content):
+        method, url = request[0], request[1]
+        if not 200 <= status_code < 300:
+            raise CommandError(f'{method} {url} returned {status_code}: {content[:200]!r}')
+
+    def _run_wsgi(self, requests, concurrency):
+        application = get_wsgi_application()
+        timings = []
+        errors = []
+        remaining = iter(requests)
+        lock = threading.Lock()
+
+        def worker():
+            try:
+                while True:
+                    with lock:
+                        request = next(remaining, None)
+                    if request is None:
+                        return
+                    start = time.perf_counter()
+                    status_code, content = _wsgi_request(application, *request)
+                    timings.append((time.perf_counter() - start) * 1000)
+                    self._check(request, status_code, content)
+            except CommandError as exc:
+                errors.append(exc)
+            finally:
+                if threading.current_thread() is not threading.main_thread():
+                    connections.close_all()
+
+        start = time.perf_counter()
+        if concurrency == 1:
+            # In the calling thread, which also keeps its database connection
+            worker()
+        else:
+            threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        elapsed = time.perf_counter() - start
+        if errors:
+            raise errors[0]
+        return timings, elapsed
+
+    async def _run_asgi(self, requests, concurrency):
+        application = get_asgi_application()
+        timings = []
+        remaining = iter(requests)
+
+        async def worker():
+            for request in remaining:
+                start = time.perf_counter()
+                status_code, content = await asgi_request(application, *request)
+                timings.append((time.perf_counter() - start) * 1000)
+                self._check(request, status_code, content)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return timings, time.perf_counter() - start
+
+    def _print(self, results):
+        meta = results['meta']
+        self.stdout.write(
+            f"{meta['server'].upper()}, concurrency {meta['concurrency']}, "
+            f"{meta['requests']} requests per flow, {meta['database']}"
+        )
+        self.stdout.write(
+            f"{'flow':>14} {'req/s':>10} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}"
+        )
+        for flow, figures in results['flows'].items():
+            self.stdout.write(
+                f"{flow:>14} {figures['throughput']:>10.1f} {figures['p50_ms']:>10.2f} "
+                f"{figures['p95_ms']:>10.2f} {figures['p99_ms']:>10.2f}"
+            )
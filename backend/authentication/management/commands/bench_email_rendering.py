@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.utils.html import strip_tags
+
+from authentication.email_templates import CompiledEmailTemplate
+
+TEMPLATES = (
+    ('authentication/verification_email.html', 'verification_url'),
+    ('authentication/password_reset_email.html', 'reset_url'),
+)
+
+
+class Command(BaseCommand):
+    help = 'Compare render_to_string + strip_tags with precompiled email templates.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--renders', type=int, default=5000,
+            help='Renders per template and strategy'
+        )
+
+    def handle(self, *args, **options):
+        renders = options['renders']
+        self.stdout.write(f"{'template':>40} {'strategy':>12} {'renders/sec':>12}")
+
+        for template_name, url_variable in TEMPLATES:
+            contexts = [
+                {'user_name': f'User {i}', url_variable: f'http://localhost:3000/?token={i}'}
+                for i in range(renders)
+            ]
+
+            def django_render(context, template_name=template_name):
+                html = render_to_string(template_name, context)
+                return html, strip_tags(html)
+
+            compiled = CompiledEmailTemplate(template_name, ('user_name', url_variable))
+
+            rates = []
+            for label, render in (('django', django_render), ('compiled', compiled.render)):
+                start = time.perf_counter()
+                for context in contexts:
+                    render(context)
+                rate = renders / (time.perf_counter() - start)
+                rates.append(rate)
+                self.stdout.write(f'{template_name:>40} {label:>12} {rate:>12.0f}')
+            self.stdout.write(f'{"":>40} {"speedup":>12} {rates[1] / rates[0]:>11.1f}x')
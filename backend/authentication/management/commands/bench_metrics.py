@@ -0,0 +1,89 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from authentication.metrics import MetricsRegistry
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the cost of one metrics observation, single-threaded and '
+        'with several threads observing the same series at once.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--observations', type=int, default=1000000,
+            help='Observations per thread and operation'
+        )
+        parser.add_argument(
+            '--threads', type=int, default=4,
+            help='Threads observing concurrently in the contended run'
+        )
+        parser.add_argument(
+            '--budget-us', type=float, default=3.0,
+            help='Fail when an operation costs more than this many microseconds'
+        )
+
+    def handle(self, *args, **options):
+        if options['observations'] < 1 or options['threads'] < 1:
+            raise CommandError('--observations and --threads must be positive')
+
+        # A registry of its own, so the live metrics are left untouched
+        registry = MetricsRegistry(directory='')
+        histogram = registry.histogram('bench_seconds', 'Benchmark histogram', ('view',))
+        counter = registry.counter('bench_total', 'Benchmark counter', ('view',))
+
+        def timed():
+            with histogram.labels('login').time():
+                pass
+
+        operations = [
+            ('baseline loop', lambda: None),
+            ('counter inc', lambda: counter.labels('login').inc()),
+            ('histogram observe', lambda: histogram.labels('login').observe(0.003)),
+            ('histogram time()', timed),
+        ]
+
+        self.stdout.write(f"{'operation':<20} {'threads':>8} {'ns/op':>10}")
+        worst = 0.0
+        for label, operation in operations:
+            for threads in (1, options['threads']):
+                cost = self._measure(operation, options['observations'], threads)
+                if label != 'baseline loop':
+                    worst = max(worst, cost)
+                self.stdout.write(f'{label:<20} {threads:>8} {cost:>10.0f}')
+
+        snapshot = registry.snapshot()['bench_seconds']['samples'][0][1]
+        self.stdout.write(f'\nHistogram count after the runs: {sum(snapshot[:-1])}')
+        if worst > options['budget_us'] * 1000:
+            raise CommandError(
+                f"Slowest operation took {worst:.0f} ns, over the "
+                f"{options['budget_us']} us budget"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Slowest operation took {worst:.0f} ns, within the {options['budget_us']} us budget"
+        ))
+
+    @staticmethod
+    def _measure(operation, observations, threads):
+        """Wall-clock nanoseconds per operation, per thread"""
+        barrier = threading.Barrier(threads + 1)
+
+        def run():
+            operation()
+            barrier.wait()
+            for _ in range(observations):
+                operation()
+
+        workers = [threading.Thread(target=run) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        barrier.wait()
+        start = time.perf_counter()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+        # Threads share the GIL, so the wall time covers every thread's work
+        return elapsed * 1e9 / (observations * threads)
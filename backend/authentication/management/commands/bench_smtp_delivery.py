@@ -0,0 +1,82 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.core.mail import get_connection
+
+from authentication.delivery import SMTPConnectionPool
+from authentication.management.smtp_stub import StubSMTPServer
+from authentication.utils import build_verification_email
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare per-message SMTP delivery with the pooled delivery engine '
+        'against a local SMTP stand-in.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--messages', type=int, default=500,
+            help='Number of messages sent by each strategy'
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=4,
+            help='Concurrent senders (and pool size for the pooled strategy)'
+        )
+        parser.add_argument(
+            '--handshake-delay', type=float, default=0.05,
+            help='Seconds the stand-in waits per connection to mimic TLS + AUTH'
+        )
+        parser.add_argument(
+            '--domains', type=int, default=8,
+            help='Number of distinct recipient domains'
+        )
+
+    def handle(self, *args, **options):
+        messages = [
+            build_verification_email(
+                f"user{i}@domain{i % options['domains']}.example",
+                'bench-token',
+                f'User {i}'
+            )
+            for i in range(options['messages'])
+        ]
+
+        with StubSMTPServer(handshake_delay=options['handshake_delay']) as server:
+            backend_kwargs = {
+                'backend': 'django.core.mail.backends.smtp.EmailBackend',
+                'host': '127.0.0.1',
+                'port': server.port,
+                'use_tls': False,
+                'use_ssl': False,
+                'username': '',
+                'password': '',
+            }
+
+            def send_per_message(message):
+                # The original path: a fresh connection for every message
+                get_connection(fail_silently=False, **backend_kwargs).send_messages([message])
+
+            pool = SMTPConnectionPool(
+                size=options['concurrency'],
+                per_domain_limit=options['concurrency'],
+                **backend_kwargs
+            )
+
+            results = []
+            for label, send in (('per-message', send_per_message), ('pooled', pool.send)):
+                connections_before = server.connections
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+                    list(executor.map(send, messages))
+                elapsed = time.perf_counter() - start
+                results.append((
+                    label, len(messages) / elapsed, server.connections - connections_before
+                ))
+            pool.close()
+
+        self.stdout.write(f"{'strategy':>12} {'msgs/sec':>10} {'connections':>12}")
+        for label, rate, connections in results:
+            self.stdout.write(f"{label:>12} {rate:>10.1f} {connections:>12}")
+        self.stdout.write(f"speedup: {results[1][1] / results[0][1]:.1f}x")
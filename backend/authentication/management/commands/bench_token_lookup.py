@@ -0,0 +1,111 @@
+import random
+import statistics
+import time
+import uuid
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from authentication.models import EmailVerificationToken, PasswordResetToken, User
+
+
+class _Rollback(Exception):
+    """Raised to discard the benchmark rows once measurements are done."""
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark token lookup latency as the token tables grow. '
+        'All rows are created inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='10000,100000,1000000,10000000',
+            help='Comma-separated table sizes to measure at (default: 10k..10M)'
+        )
+        parser.add_argument(
+            '--lookups', type=int, default=1000,
+            help='Number of random lookups per table size'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=10000,
+            help='bulk_create batch size used to grow the tables'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            sizes = sorted(int(size) for size in options['sizes'].split(','))
+        except ValueError as exc:
+            raise CommandError('--sizes must be a list of integers') from exc
+
+        try:
+            with transaction.atomic():
+                self._run(sizes, options['lookups'], options['batch_size'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _run(self, sizes, lookups, batch_size):
+        expires_at = timezone.now() + timedelta(hours=1)
+        verification_tokens = []
+        reset_tokens = []
+
+        self.stdout.write(f"{'rows':>12} {'model':>20} {'p50 us':>10} {'p99 us':>10}")
+        for size in sizes:
+            while len(verification_tokens) < size:
+                count = min(batch_size, size - len(verification_tokens))
+                verification_batch = [uuid.uuid4() for _ in range(count)]
+                reset_batch = [uuid.uuid4() for _ in range(count)]
+                # A user holds one token of each kind, so every pair gets a user
+                start = len(verification_tokens)
+                users = User.objects.bulk_create(
+                    User(
+                        email=f'bench-token-lookup-{i}@example.invalid',
+                        username=f'bench-token-lookup-{i}',
+                    )
+                    for i in range(start, start + count)
+                )
+                EmailVerificationToken.objects.bulk_create(
+                    EmailVerificationToken(user=user, token=token, expires_at=expires_at)
+                    for user, token in zip(users, verification_batch)
+                )
+                PasswordResetToken.objects.bulk_create(
+                    PasswordResetToken(user=user, token=token, expires_at=expires_at)
+                    for user, token in zip(users, reset_batch)
+                )
+                verification_tokens.extend(verification_batch)
+                reset_tokens.extend(reset_batch)
+
+            self._analyze()
+            for label, lookup in (
+                ('verification', lambda token: EmailVerificationToken.objects.get(token=token)),
+                ('password_reset', lambda token: PasswordResetToken.objects.get(
+                    token=token, is_used=False
+                )),
+            ):
+                pool = verification_tokens if label == 'verification' else reset_tokens
+                timings = []
+                for token in random.choices(pool, k=lookups):
+                    start = time.perf_counter()
+                    lookup(token)
+                    timings.append((time.perf_counter() - start) * 1e6)
+                timings.sort()
+                p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+                self.stdout.write(
+                    f"{size:>12} {label:>20} "
+                    f"{statistics.median(timings):>10.1f} {p99:>10.1f}"
+                )
+
+        self.stdout.write('\nQuery plan for the reset token lookup:')
+        self.stdout.write(
+            PasswordResetToken.objects.filter(token=reset_tokens[0], is_used=False).explain()
+        )
+
+    def _analyze(self):
+        """Refresh planner statistics so the plans reflect the current size."""
+        with connection.cursor() as cursor:
+            for model in (EmailVerificationToken, PasswordResetToken):
+                cursor.execute(f'ANALYZE {connection.ops.quote_name(model._meta.db_table)}')
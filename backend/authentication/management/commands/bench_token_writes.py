@@ -0,0 +1,105 @@
+import re
+import time
+from collections import Counter
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from authentication import link_tokens
+from authentication.models import EmailVerificationToken, PasswordResetToken, User
+from authentication.outbox import queue_password_reset_email, queue_verification_email
+
+WRITE_RE = re.compile(r'^\s*(INSERT INTO|UPDATE|DELETE FROM)\s+"?(\w+)"?', re.IGNORECASE)
+TOKEN_TABLES = {
+    EmailVerificationToken._meta.db_table,
+    PasswordResetToken._meta.db_table,
+}
+
+
+class _Rollback(Exception):
+    """Raised to discard the benchmark rows once measurements are done."""
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the database writes of stored and signed (SIGNED_AUTH_TOKENS) '
+        'verification and password reset tokens. In each mode every user gets '
+        'a verification email and follows it, then asks for a password reset '
+        'and follows that. Reports write statements per flow, those on the '
+        'token tables, and the token rows left for sweep_expired_tokens. '
+        'Passwords are hashed with MD5, as hashing costs the same in both '
+        'modes. All rows are created inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=500,
+            help='Users going through each flow per mode'
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 1:
+            raise CommandError('--users must be positive')
+
+        self.stdout.write(
+            f"{'mode':>8} {'flow':>14} {'writes/op':>10} {'token writes/op':>16} "
+            f"{'reads/op':>9} {'left rows':>10} {'us/op':>8}"
+        )
+        hashers = ['django.contrib.auth.hashers.MD5PasswordHasher']
+        try:
+            with transaction.atomic(), override_settings(PASSWORD_HASHERS=hashers):
+                for mode, signed in (('stored', False), ('signed', True)):
+                    with override_settings(SIGNED_AUTH_TOKENS=signed):
+                        self._run(mode, options['users'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _run(self, mode, count):
+        # bulk_create skips save(), which fills in the username
+        users = User.objects.bulk_create(
+            User(
+                email=f'bench-token-writes-{mode}-{i}@example.invalid',
+                username=f'bench-token-writes-{mode}-{i}',
+                password=make_password('bench-token-writes'),
+            )
+            for i in range(count)
+        )
+
+        def verify(user):
+            token = link_tokens.issue_verification_token(user)
+            queue_verification_email(user.email, token, user.username)
+            link_tokens.verify_email(token)
+
+        def reset(user):
+            token = link_tokens.reissue_reset_token(user)
+            queue_password_reset_email(user.email, token, user.username)
+            link_tokens.reset_password(token, 'bench-token-writes-new')
+
+        for flow, step, model in (
+            ('verify_email', verify, EmailVerificationToken),
+            ('reset_password', reset, PasswordResetToken),
+        ):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                for user in users:
+                    step(user)
+                elapsed = time.perf_counter() - start
+
+            writes = Counter()
+            reads = 0
+            for query in queries.captured_queries:
+                match = WRITE_RE.match(query['sql'])
+                if match:
+                    writes[match.group(2)] += 1
+                elif query['sql'].lstrip().upper().startswith('SELECT'):
+                    reads += 1
+            token_writes = sum(writes[table] for table in TOKEN_TABLES)
+            left = model.objects.filter(user__in=users).count()
+            self.stdout.write(
+                f"{mode:>8} {flow:>14} {sum(writes.values()) / count:>10.2f} "
+                f"{token_writes / count:>16.2f} {reads / count:>9.2f} {left:>10} "
+                f"{elapsed / count * 1e6:>8.0f}"
+            )
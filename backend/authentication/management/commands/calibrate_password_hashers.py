@@ -0,0 +1,139 @@
+import importlib.util
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher,
+    PBKDF2PasswordHasher,
+    ScryptPasswordHasher,
+)
+from django.core.management.base import BaseCommand, CommandError
+
+PASSWORD = 'calibrate-password-hashers'
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark PBKDF2, Argon2 and scrypt on this host and recommend cost '
+        'parameters that hash a password within the target latency.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target-ms', type=float, default=250.0,
+            help='Latency budget for a single hash in milliseconds'
+        )
+        parser.add_argument(
+            '--samples', type=int, default=5,
+            help='Hashes timed per parameter set (the median is used)'
+        )
+        parser.add_argument(
+            '--hashers', default='pbkdf2,argon2,scrypt',
+            help='Comma-separated hashers to calibrate'
+        )
+
+    def handle(self, *args, **options):
+        calibrators = {
+            'pbkdf2': self._pbkdf2,
+            'argon2': self._argon2,
+            'scrypt': self._scrypt,
+        }
+        names = options['hashers'].split(',')
+        unknown = set(names) - set(calibrators)
+        if unknown:
+            raise CommandError(f'Unknown hashers: {", ".join(sorted(unknown))}')
+
+        target = options['target_ms']
+        self.stdout.write(
+            f'Target {target:.0f} ms per hash; '
+            f'{settings.PASSWORD_HASHING_WORKERS} hashing workers per process'
+        )
+        self.stdout.write(
+            f"{'hasher':>8} {'default ms':>11} {'recommended':>36} {'ms':>8} {'hashes/s':>9}"
+        )
+        for name in names:
+            calibrators[name](target, options['samples'])
+
+    def _time(self, hasher, samples):
+        """Median milliseconds to hash PASSWORD with hasher"""
+        timings = []
+        for _ in range(samples):
+            start = time.perf_counter()
+            hasher.encode(PASSWORD, hasher.salt())
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
+
+    def _report(self, name, default_ms, params, measured_ms, *, weaker):
+        described = ', '.join(f'{key}={value}' for key, value in params.items())
+        throughput = settings.PASSWORD_HASHING_WORKERS * 1000 / measured_ms
+        self.stdout.write(
+            f'{name:>8} {default_ms:>11.1f} {described:>36} '
+            f'{measured_ms:>8.1f} {throughput:>9.1f}'
+        )
+        if weaker:
+            self.stdout.write(self.style.WARNING(
+                f'{name}: meeting the target needs weaker than Django\'s default '
+                'parameters; raise the budget or add hashing capacity instead'
+            ))
+
+    def _pbkdf2(self, target, samples):
+        hasher = PBKDF2PasswordHasher()
+        default_iterations = hasher.iterations
+        default_ms = self._time(hasher, samples)
+
+        # Cost is linear in the iteration count
+        iterations = max(
+            10000, int(default_iterations * target / default_ms) // 10000 * 10000
+        )
+        hasher.iterations = iterations
+        self._report(
+            'pbkdf2', default_ms, {'iterations': iterations},
+            self._time(hasher, samples), weaker=iterations < default_iterations,
+        )
+
+    def _argon2(self, target, samples):
+        if importlib.util.find_spec('argon2') is None:
+            self.stdout.write(f"{'argon2':>8} skipped: install argon2-cffi to calibrate it")
+            return
+        hasher = Argon2PasswordHasher()
+        default_time_cost = hasher.time_cost
+        default_ms = self._time(hasher, samples)
+
+        # Keep the memory cost and scale the number of passes, which is linear
+        time_cost = max(1, int(default_time_cost * target / default_ms))
+        hasher.time_cost = time_cost
+        self._report(
+            'argon2', default_ms,
+            {
+                'time_cost': time_cost,
+                'memory_cost': hasher.memory_cost,
+                'parallelism': hasher.parallelism,
+            },
+            self._time(hasher, samples), weaker=time_cost < default_time_cost,
+        )
+
+    def _scrypt(self, target, samples):
+        hasher = ScryptPasswordHasher()
+        default_work_factor = hasher.work_factor
+        default_ms = self._time(hasher, samples)
+
+        # The work factor must be a power of two; take the largest one in budget
+        work_factor = default_work_factor
+        measured_ms = default_ms
+        while measured_ms * 2 <= target:
+            work_factor *= 2
+            measured_ms *= 2
+        while measured_ms > target and work_factor > 2 ** 10:
+            work_factor //= 2
+            measured_ms /= 2
+        hasher.work_factor = work_factor
+        self._report(
+            'scrypt', default_ms,
+            {
+                'work_factor': work_factor,
+                'block_size': hasher.block_size,
+                'parallelism': hasher.parallelism,
+            },
+            self._time(hasher, samples), weaker=work_factor < default_work_factor,
+        )
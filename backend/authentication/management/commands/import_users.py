@@ -0,0 +1,329 @@
+import csv
+import json
+import os
+import sys
+import time
+from collections import Counter, defaultdict
+from contextlib import nullcontext
+from itertools import islice
+
+from django.contrib.auth import hashers
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from authentication.hashing import PasswordHashingService
+from authentication.link_tokens import issue_verification_tokens
+from authentication.models import (
+    USERNAME_ALLOCATION_ATTEMPTS,
+    EmailOutbox,
+    User,
+    UsernameCounter,
+)
+
+FORMATS = ('csv', 'ndjson')
+TRUE_VALUES = ('true', '1', 'yes', 'on')
+
+# Columns filled from the input, checked against their max_length so one
+# oversized row is rejected instead of failing the chunk's INSERT
+LENGTH_CHECKED_FIELDS = ('email', 'first_name', 'last_name', 'password')
+
+
+class InvalidRow:
+    """
+    An input row that could not be read. Kept in the stream so it is
+    reported and counted like other rejected rows, and the row numbers in
+    checkpoints stay the same.
+    """
+
+    def __init__(self, reason):
+        self.reason = reason
+
+
+def read_rows(stream, input_format):
+    """Rows of the input as dicts, or InvalidRow, one at a time"""
+    if input_format == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            yield InvalidRow(f'line {line_number} is not valid JSON: {exc}')
+            continue
+        if not isinstance(row, dict):
+            yield InvalidRow(f'line {line_number} is not a JSON object')
+            continue
+        yield row
+
+
+def allocate_usernames(users):
+    """
+    Give unsaved users the usernames User.save would, in a few queries per
+    chunk instead of a few per user: the bare local part where it is free,
+    otherwise suffixes reserved from UsernameCounter in blocks per prefix.
+    """
+    by_base = defaultdict(list)
+    for user in users:
+        by_base[user.email.split('@')[0]].append(user)
+    assigned = set()
+    waiting = {}
+    taken = set(User.objects.filter(username__in=by_base).values_list('username', flat=True))
+    for base, group in by_base.items():
+        if base not in taken:
+            group[0].username = base
+            assigned.add(base)
+            group = group[1:]
+        if group:
+            waiting[base] = group
+
+    # A suffixed name can also be somebody's bare local part (bob1@...), so
+    # taken candidates are passed over and the blocks grow until all fit
+    block = 1
+    while waiting:
+        reserved = UsernameCounter.reserve_suffixes(
+            {base: len(group) * block for base, group in waiting.items()}
+        )
+        candidates = {
+            base: [f'{base}{suffix}' for suffix in suffixes]
+            for base, suffixes in reserved.items()
+        }
+        taken = set(User.objects.filter(
+            username__in=[name for names in candidates.values() for name in names]
+        ).values_list('username', flat=True))
+        for base, names in candidates.items():
+            group = waiting.pop(base)
+            free = (name for name in names if name not in taken and name not in assigned)
+            for user, name in zip(group, free):
+                user.username = name
+                assigned.add(name)
+            group = [user for user in group if not user.username]
+            if group:
+                waiting[base] = group
+        block *= 2
+
+
+class Command(BaseCommand):
+    help = (
+        'Import users from a CSV or NDJSON file (or - for stdin) in chunks. '
+        'Columns: email, first_name, last_name, is_email_verified, date_joined and '
+        'either password_hash (a Django-encoded hash, stored as is) or password '
+        '(hashed in a process pool); rows without either get an unusable password. '
+        'Existing emails are skipped, so an interrupted import can be run again.'
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.hasher = None
+        self.totals = Counter()
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='Path of the file to import, or - for stdin')
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='Input format; guessed from the file extension by default'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Rows read, hashed and inserted per transaction'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='File recording the rows done, to resume an interrupted import from'
+        )
+        parser.add_argument(
+            '--hash-workers', type=int, default=os.cpu_count() or 1,
+            help='Processes hashing plain-text passwords'
+        )
+        parser.add_argument(
+            '--send-verification', action='store_true',
+            help='Create verification tokens and queue emails for unverified users'
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1 or options['hash_workers'] < 1:
+            raise CommandError('--chunk-size and --hash-workers must be positive')
+        path = options['input']
+        input_format = options['format'] or (
+            'ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv'
+        )
+        done = self._load_checkpoint(options['checkpoint'], path)
+        self.hasher = PasswordHashingService(
+            workers=options['hash_workers'], max_pending=options['chunk_size'],
+            use_processes=True,
+        )
+        self.totals = Counter()
+
+        try:
+            source = (
+                nullcontext(sys.stdin) if path == '-'
+                # Entered below, once the hashing pool is set to be shut down too
+                else open(path, newline='', encoding='utf-8')  # pylint: disable=consider-using-with
+            )
+        except OSError as exc:
+            raise CommandError(f'Cannot open {path}: {exc}') from exc
+        try:
+            with source as stream:
+                self._import_rows(read_rows(stream, input_format), done, options)
+        except (csv.Error, ValueError) as exc:
+            raise CommandError(f'Cannot read the input: {exc}') from exc
+        finally:
+            self.hasher.shutdown()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {self.totals['created']} users, skipped {self.totals['existing']} "
+            f"existing and {self.totals['invalid']} invalid rows"
+        ))
+
+    def _import_rows(self, rows, done, options):
+        # Skipping re-reads the rows, but nothing is held on to
+        for _ in islice(rows, done):
+            pass
+        start = time.perf_counter()
+        while True:
+            chunk = list(islice(rows, options['chunk_size']))
+            if not chunk:
+                return
+            self._import_chunk(chunk, done + 1, options['send_verification'])
+            done += len(chunk)
+            self.totals['rows'] += len(chunk)
+            if options['checkpoint']:
+                self._save_checkpoint(options['checkpoint'], options['input'], done)
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f"{done} rows: {self.totals['created']} created, "
+                f"{self.totals['existing']} existing, {self.totals['invalid']} invalid, "
+                f"{self.totals['rows'] / elapsed:.0f} rows/sec"
+            )
+
+    @staticmethod
+    def _load_checkpoint(checkpoint, path):
+        if not checkpoint or not os.path.exists(checkpoint):
+            return 0
+        with open(checkpoint, encoding='utf-8') as checkpoint_file:
+            state = json.load(checkpoint_file)
+        if state['input'] != os.path.abspath(path):
+            raise CommandError(f"The checkpoint belongs to {state['input']}")
+        return state['rows']
+
+    @staticmethod
+    def _save_checkpoint(checkpoint, path, rows):
+        temporary = f'{checkpoint}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as checkpoint_file:
+            json.dump({'input': os.path.abspath(path), 'rows': rows}, checkpoint_file)
+        os.replace(temporary, checkpoint)
+
+    def _reject(self, row_number, reason):
+        self.totals['invalid'] += 1
+        self.stderr.write(f'Row {row_number}: {reason}')
+
+    @staticmethod
+    def _too_long(user):
+        """Why user does not fit its columns, or None when it does"""
+        for name in LENGTH_CHECKED_FIELDS:
+            max_length = User._meta.get_field(name).max_length
+            if len(getattr(user, name)) > max_length:
+                return f'{name} longer than {max_length} characters'
+        return None
+
+    def _build_users(self, chunk, first_row):
+        """Validated, unsaved users of the chunk, keyed by email"""
+        users = {}
+        plain_passwords = {}
+        for row_number, row in enumerate(chunk, first_row):
+            if isinstance(row, InvalidRow):
+                self._reject(row_number, row.reason)
+                continue
+            email = User.objects.normalize_email((row.get('email') or '').strip())
+            try:
+                validate_email(email)
+            except ValidationError:
+                self._reject(row_number, f'invalid email {email!r}')
+                continue
+            if email in users:
+                self._reject(row_number, f'duplicate email {email}')
+                continue
+            encoded = row.get('password_hash') or None
+            if encoded is not None:
+                try:
+                    hashers.identify_hasher(encoded)
+                except ValueError:
+                    self._reject(row_number, 'unrecognised password_hash')
+                    continue
+            date_joined = None
+            if row.get('date_joined'):
+                date_joined = parse_datetime(str(row['date_joined']))
+                if date_joined is None:
+                    self._reject(row_number, f"invalid date_joined {row['date_joined']!r}")
+                    continue
+                if timezone.is_naive(date_joined):
+                    date_joined = timezone.make_aware(date_joined)
+
+            user = User(
+                email=email,
+                first_name=row.get('first_name') or '',
+                last_name=row.get('last_name') or '',
+                is_email_verified=str(row.get('is_email_verified', '')).lower() in TRUE_VALUES,
+                password=encoded or hashers.make_password(None),
+            )
+            too_long = self._too_long(user)
+            if too_long is not None:
+                self._reject(row_number, too_long)
+                continue
+            if date_joined is not None:
+                user.date_joined = date_joined
+            if encoded is None and row.get('password'):
+                plain_passwords[email] = row['password']
+            users[email] = user
+
+        # Hashed on the pool all at once, outside the chunk's transaction
+        futures = {
+            email: self.hasher.submit(hashers.make_password, password)
+            for email, password in plain_passwords.items()
+        }
+        for email, future in futures.items():
+            users[email].password = future.result()
+        return users
+
+    def _import_chunk(self, chunk, first_row, send_verification):
+        users = self._build_users(chunk, first_row)
+        for attempt in range(USERNAME_ALLOCATION_ATTEMPTS):
+            try:
+                with transaction.atomic():
+                    existing = set(
+                        User.objects.filter(email__in=users).values_list('email', flat=True)
+                    )
+                    new_users = [user for email, user in users.items() if email not in existing]
+                    allocate_usernames(new_users)
+                    created = User.objects.bulk_create(new_users)
+                    if send_verification:
+                        self._queue_verification(created)
+                break
+            except IntegrityError:
+                # A signup took an email or username between the checks and the insert
+                if attempt == USERNAME_ALLOCATION_ATTEMPTS - 1:
+                    raise
+                for user in users.values():
+                    user.pk = None
+                    user.username = ''
+        self.totals['existing'] += len(existing)
+        self.totals['created'] += len(created)
+
+    @staticmethod
+    def _queue_verification(users):
+        unverified = [user for user in users if not user.is_email_verified]
+        tokens = issue_verification_tokens(unverified)
+        EmailOutbox.objects.bulk_create(
+            EmailOutbox(
+                kind=EmailOutbox.KIND_VERIFICATION,
+                recipient=user.email,
+                token=token,
+                user_name=user.first_name or user.email.split('@')[0],
+            )
+            for user, token in zip(unverified, tokens)
+        )
@@ -0,0 +1,100 @@
+import logging
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from authentication.delivery import SMTPConnectionPool
+from authentication.outbox import claim_batch, deliver
+
+logger = logging.getLogger(__name__)
+
+# Seconds; cap on the backoff after consecutive worker errors
+MAX_ERROR_DELAY = 60
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued authentication emails from the outbox.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Number of concurrent delivery workers'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=10,
+            help='Messages claimed per worker per round'
+        )
+        parser.add_argument(
+            '--pool-size', type=int, default=None,
+            help='Open mail connections shared by the workers (default: EMAIL_POOL_SIZE)'
+        )
+        parser.add_argument(
+            '--max-attempts', type=int, default=5,
+            help='Attempts before a message is marked as failed'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help='Seconds to wait when the outbox is empty'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit once no due messages remain instead of polling forever'
+        )
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        counts = {'sent': 0, 'failed': 0}
+        counts_lock = threading.Lock()
+        pool = SMTPConnectionPool(size=options['pool_size'])
+
+        def work():
+            errors = 0
+            try:
+                while not stop.is_set():
+                    close_old_connections()
+                    try:
+                        messages = claim_batch(options['batch_size'])
+                        if not messages:
+                            if options['once']:
+                                return
+                            stop.wait(options['poll_interval'])
+                            continue
+                        for message in messages:
+                            sent = deliver(message, options['max_attempts'], pool)
+                            outcome = 'sent' if sent else 'failed'
+                            with counts_lock:
+                                counts[outcome] += 1
+                        errors = 0
+                    except Exception:  # pylint: disable=broad-exception-caught
+                        # A database outage must not end the worker; claimed
+                        # messages are retried once their lease expires
+                        errors += 1
+                        logger.exception("Outbox worker error, retrying")
+                        connection.close()
+                        stop.wait(min(options['poll_interval'] * 2 ** errors, MAX_ERROR_DELAY))
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=work, name=f'outbox-worker-{i}', daemon=True)
+            for i in range(options['workers'])
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=0.5)
+        except KeyboardInterrupt:
+            stop.set()
+            for thread in threads:
+                thread.join()
+        finally:
+            pool.close()
+
+        self.stdout.write(
+            f"Outbox delivery finished: {counts['sent']} sent, "
+            f"{counts['failed']} failed attempts"
+        )
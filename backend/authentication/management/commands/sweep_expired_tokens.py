@@ -0,0 +1,118 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+from authentication.models import EmailOutbox, EmailVerificationToken, PasswordResetToken
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete expired verification/reset tokens, expired simplejwt outstanding '
+        '(and with them blacklisted) tokens and old delivered outbox rows in small, '
+        'primary-key ordered batches.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Rows deleted per transaction'
+        )
+        parser.add_argument(
+            '--throttle', type=float, default=0.05,
+            help='Seconds to sleep between batches'
+        )
+        parser.add_argument(
+            '--outbox-retention-days', type=int, default=7,
+            help='Keep sent or failed outbox rows for this many days'
+        )
+        parser.add_argument(
+            '--daemon', action='store_true',
+            help='Keep sweeping forever instead of exiting after one pass'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=300.0,
+            help='Seconds between passes in daemon mode'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            self.sweep(options)
+            if not options['daemon']:
+                return
+            try:
+                time.sleep(options['interval'])
+            except KeyboardInterrupt:
+                return
+
+    @staticmethod
+    def targets(now, outbox_retention):
+        """The (label, queryset) pairs of rows that are safe to delete"""
+        return [
+            (
+                'email_verification_tokens',
+                EmailVerificationToken.objects.filter(expires_at__lt=now),
+            ),
+            (
+                'password_reset_tokens',
+                PasswordResetToken.objects.filter(Q(expires_at__lt=now) | Q(is_used=True)),
+            ),
+            (
+                # Blacklisted tokens cascade with their outstanding token
+                'outstanding_tokens',
+                OutstandingToken.objects.filter(expires_at__lt=now),
+            ),
+            (
+                'email_outbox',
+                EmailOutbox.objects.filter(
+                    status__in=[EmailOutbox.STATUS_SENT, EmailOutbox.STATUS_FAILED],
+                    created_at__lt=now - outbox_retention,
+                ),
+            ),
+        ]
+
+    def sweep(self, options):
+        now = timezone.now()
+        retention = timedelta(days=options['outbox_retention_days'])
+
+        for label, queryset in self.targets(now, retention):
+            # No count(): expires_at is not indexed on every table swept
+            deleted = 0
+            batches = 0
+            last_pk = 0
+            start = time.perf_counter()
+            while True:
+                pks = list(
+                    queryset.filter(pk__gt=last_pk)
+                    .order_by('pk')
+                    .values_list('pk', flat=True)[:options['batch_size']]
+                )
+                if not pks:
+                    break
+                with transaction.atomic():
+                    _, per_model = queryset.model.objects.filter(pk__in=pks).delete()
+                batch = per_model.get(queryset.model._meta.label, 0)
+                logger.debug('%s: deleted a batch of %d rows', label, batch)
+                deleted += batch
+                batches += 1
+                last_pk = pks[-1]
+                if options['throttle']:
+                    time.sleep(options['throttle'])
+            if not deleted:
+                continue
+
+            elapsed = time.perf_counter() - start
+            rate = deleted / elapsed if elapsed else float(deleted)
+            message = (
+                f'{label}: deleted {deleted} rows in {batches} batches '
+                f'({rate:.0f} rows/sec)'
+            )
+            logger.info(message)
+            self.stdout.write(message)
@@ -0,0 +1,103 @@
+"""
+Minimal in-process SMTP server used as a local relay stand-in by the tests
+and by the bench_smtp_delivery command. It speaks just enough SMTP for
+smtplib and records every accepted message. It lives with the management
+tooling, outside the modules the API serves requests with.
+"""
+import socketserver
+import threading
+import time
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+
+    def _reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        server = self.server
+        server.record_connection()
+        # Stands in for the TCP + TLS + AUTH cost of a real relay
+        if server.handshake_delay:
+            time.sleep(server.handshake_delay)
+        self._reply('220 stub ESMTP ready')
+
+        recipients = []
+        accepted_on_connection = 0
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('utf-8', 'replace').strip()
+            verb = command.split(' ', 1)[0].upper()
+
+            if verb in ('EHLO', 'HELO'):
+                self._reply('250-stub')
+                self._reply('250 8BITMIME')
+            elif verb == 'MAIL':
+                recipients = []
+                self._reply('250 OK')
+            elif verb == 'RCPT':
+                recipients.append(command.split(':', 1)[1].strip(' <>'))
+                self._reply('250 OK')
+            elif verb == 'DATA':
+                self._reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                while True:
+                    data_line = self.rfile.readline()
+                    if not data_line or data_line in (b'.\r\n', b'.\n'):
+                        break
+                    data.append(data_line)
+                server.record_message(recipients, b''.join(data))
+                accepted_on_connection += 1
+                self._reply('250 OK queued')
+                if (
+                    server.disconnect_after
+                    and accepted_on_connection >= server.disconnect_after
+                ):
+                    return
+            elif verb in ('RSET', 'NOOP'):
+                self._reply('250 OK')
+            elif verb == 'QUIT':
+                self._reply('221 Bye')
+                return
+            else:
+                self._reply('502 Command not implemented')
+
+
+class StubSMTPServer(socketserver.ThreadingTCPServer):
+    """Threaded SMTP stand-in bound to an ephemeral localhost port."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, handshake_delay=0.0, disconnect_after=None):
+        super().__init__(('127.0.0.1', 0), _SMTPHandler)
+        self.handshake_delay = handshake_delay
+        self.disconnect_after = disconnect_after
+        self.messages = []
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def record_connection(self):
+        with self._lock:
+            self.connections += 1
+
+    def record_message(self, recipients, data):
+        with self._lock:
+            self.messages.append((recipients, data))
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+        self._thread.join()
@@ -0,0 +1,392 @@
+import atexit
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
+from rest_framework.permissions import BasePermission
+
+logger = logging.getLogger(__name__)
+
+TEXT_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; the last bucket is +Inf
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+class _Holder:
+    """Thread-local owner of a thread's array; collected when the thread ends"""
+
+    __slots__ = ('values', '__weakref__')
+
+    def __init__(self, values):
+        self.values = values
+
+
+class _Shards:
+    """
+    Per-thread value arrays of one series, summed when collected.
+
+    Each thread only ever writes its own array, so observations take no
+    lock; the lock guards the set of arrays, touched once per thread. When a
+    thread ends its array is folded into the retired totals and dropped, so
+    servers running each request on a new thread keep a bounded set.
+    """
+
+    def __init__(self, size, registry):
+        self.size = size
+        self._registry = registry
+        self._local = threading.local()
+        self._live = {}
+        self._retired = [0] * size
+        self._lock = threading.Lock()
+
+    def get(self):
+        try:
+            return self._local.holder.values
+        except AttributeError:
+            values = [0] * self.size
+            holder = _Holder(values)
+            with self._lock:
+                self._live[id(values)] = values
+            # Thread-local storage is released when its thread ends
+            weakref.finalize(holder, self._retire, values)
+            self._local.holder = holder
+            self._registry.start()
+            return values
+
+    def _retire(self, values):
+        with self._lock:
+            del self._live[id(values)]
+            self._retired = [a + b for a, b in zip(self._retired, values)]
+
+    def total(self):
+        with self._lock:
+            shards = [self._retired, *self._live.values()]
+        return [sum(column) for column in zip(*shards)]
+
+
+class _Timer:
+    __slots__ = ('_series', '_start')
+
+    def __init__(self, series):
+        self._series = series
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._series.observe(time.perf_counter() - self._start)
+
+
+class HistogramSeries:
+    """Fixed-bucket histogram: a count per bucket plus the sum"""
+
+    def __init__(self, bounds, registry):
+        self._bounds = bounds
+        self._shards = _Shards(len(bounds) + 2, registry)
+
+    def observe(self, value):
+        values = self._shards.get()
+        values[bisect.bisect_left(self._bounds, value)] += 1
+        values[-1] += value
+
+    def time(self):
+        """Context manager observing the seconds its block took"""
+        return _Timer(self)
+
+    def snapshot(self):
+        return self._shards.total()
+
+
+class CounterSeries:
+    def __init__(self, registry):
+        self._shards = _Shards(1, registry)
+
+    def inc(self, amount=1):
+        self._shards.get()[0] += amount
+
+    def snapshot(self):
+        return self._shards.total()
+
+
+class Metric:
+    """A named family of series, one per combination of label values"""
+
+    def __init__(self, registry, kind, name, documentation, *, labelnames=(), buckets=None):
+        self.registry = registry
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) if buckets is not None else None
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        series = self._series.get(values)
+        if series is None:
+            with self._lock:
+                series = self._series.get(values)
+                if series is None:
+                    if self.kind == 'histogram':
+                        series = HistogramSeries(self.buckets, self.registry)
+                    else:
+                        series = CounterSeries(self.registry)
+                    self._series[values] = series
+        return series
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def snapshot(self):
+        with self._lock:
+            series = list(self._series.items())
+        return {
+            'type': self.kind,
+            'help': self.documentation,
+            'labelnames': list(self.labelnames),
+            'buckets': list(self.buckets) if self.buckets is not None else None,
+            'samples': [[list(values), child.snapshot()] for values, child in series],
+        }
+
+
+def _merge(target, snapshot):
+    for name, metric in snapshot.items():
+        merged = target.setdefault(name, {**metric, 'samples': {}})
+        for values, sample in metric['samples']:
+            key = tuple(values)
+            current = merged['samples'].get(key)
+            merged['samples'][key] = (
+                sample if current is None else [a + b for a, b in zip(current, sample)]
+            )
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    return format(value, 'g') if isinstance(value, float) else str(value)
+
+
+def _process_exists(pid):
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except (ValueError, PermissionError):
+        # Not named after a pid, or a process of another user
+        return True
+    return True
+
+
+class MetricsRegistry:
+    """
+    In-process counters and latency histograms.
+
+    Observations cost a thread-local lookup and a couple of list updates.
+    With METRICS_DIR set, a background thread writes this process's
+    snapshot to <METRICS_DIR>/<pid>.json every METRICS_FLUSH_INTERVAL
+    seconds, and render() adds up the snapshots of every worker on the host.
+    """
+
+    def __init__(self, directory=None, flush_interval=None):
+        self.directory = directory if directory is not None else settings.METRICS_DIR
+        self.flush_interval = flush_interval or settings.METRICS_FLUSH_INTERVAL
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric '{metric.name}' is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(
+            Metric(
+                self, 'histogram', name, documentation,
+                labelnames=labelnames, buckets=sorted(buckets),
+            )
+        )
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(
+            Metric(self, 'counter', name, documentation, labelnames=labelnames)
+        )
+
+    def snapshot(self):
+        """This process's metrics as a JSON-serialisable dict"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def start(self):
+        """Start publishing snapshots once per process, when METRICS_DIR is set"""
+        if not self.directory or self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='metrics-flush', daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except OSError as exc:
+                logger.error("Failed to write metrics to %s: %s", self.directory, exc)
+
+    def flush(self):
+        directory = Path(self.directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f'{os.getpid()}.json'
+        temporary = path.with_suffix('.tmp')
+        temporary.write_text(json.dumps(self.snapshot()), encoding='utf-8')
+        os.replace(temporary, path)
+
+    def collect(self):
+        """Snapshots of this process and every other worker, added up"""
+        merged = {}
+        _merge(merged, self.snapshot())
+        if self.directory:
+            own = f'{os.getpid()}.json'
+            for path in Path(self.directory).glob('*.json'):
+                if path.name == own:
+                    continue
+                if not _process_exists(path.stem):
+                    # Left behind by a worker that has exited or was replaced
+                    path.unlink(missing_ok=True)
+                    continue
+                try:
+                    _merge(merged, json.loads(path.read_text(encoding='utf-8')))
+                except (OSError, ValueError) as exc:
+                    logger.warning("Skipping unreadable metrics file %s: %s", path, exc)
+        return merged
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for name, metric in sorted(self.collect().items()):
+            lines.append(f'# HELP {name} {metric["help"]}')
+            lines.append(f'# TYPE {name} {metric["type"]}')
+            names = metric['labelnames']
+            for values, sample in sorted(metric['samples'].items()):
+                if metric['type'] == 'counter':
+                    lines.append(f'{name}{_labels(names, values)} {_number(sample[0])}')
+                    continue
+                cumulative = 0
+                bounds = [_number(float(bound)) for bound in metric['buckets']] + ['+Inf']
+                for bound, count in zip(bounds, sample[:-1]):
+                    cumulative += count
+                    lines.append(
+                        f'{name}_bucket{_labels(names, values, [("le", bound)])} {cumulative}'
+                    )
+                lines.append(f'{name}_sum{_labels(names, values)} {_number(float(sample[-1]))}')
+                lines.append(f'{name}_count{_labels(names, values)} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics_registry = MetricsRegistry()
+
+REQUEST_SECONDS = metrics_registry.histogram(
+    'auth_request_seconds', 'Time to serve a request, by URL name', ('view',)
+)
+RESPONSES = metrics_registry.counter(
+    'auth_responses_total', 'Responses by URL name and status code', ('view', 'status')
+)
+DB_SECONDS = metrics_registry.histogram(
+    'auth_db_seconds', 'Database time of a request, by URL name', ('view',)
+)
+PASSWORD_HASHING_SECONDS = metrics_registry.histogram(
+    'auth_password_hashing_seconds',
+    'Password hashing and verification time including queueing', ('operation',)
+)
+JWT_SIGNING_SECONDS = metrics_registry.histogram(
+    'auth_jwt_signing_seconds', 'Time to sign a JWT', ('token_type',)
+)
+EMAIL_RENDER_SECONDS = metrics_registry.histogram(
+    'auth_email_render_seconds', 'Time to render an email template', ('template',)
+)
+EMAIL_SEND_SECONDS = metrics_registry.histogram(
+    'auth_email_send_seconds', 'Time to hand an email to the SMTP server', ('kind',)
+)
+LOG_RECORDS_DROPPED = metrics_registry.counter(
+    'auth_log_records_dropped_total',
+    'Log records not written: queue_full, rate_limited or sampled', ('reason',)
+)
+
+
+class MetricsMiddleware:
+    """Times every request and counts responses per URL name and status"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        response = self.get_response(request)
+        self.observe(request, response, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        self.observe(request, response, time.perf_counter() - start)
+        return response
+
+    @staticmethod
+    def observe(request, response, duration):
+        match = request.resolver_match
+        # Unmatched paths share one label so scanners cannot inflate the series
+        view = match.view_name if match is not None else 'unmatched'
+        REQUEST_SECONDS.labels(view).observe(duration)
+        RESPONSES.labels(view, str(response.status_code)).inc()
+
+
+class HasMetricsToken(BasePermission):
+    """Lets scrapers in with the METRICS_TOKEN sent as X-Metrics-Token"""
+
+    def has_permission(self, request, view):
+        token = request.headers.get('X-Metrics-Token')
+        return bool(
+            settings.METRICS_TOKEN and token
+            and constant_time_compare(token, settings.METRICS_TOKEN)
+        )
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-16 22:39
+
+import authentication.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0003_email_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UsernameCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefix', models.CharField(max_length=150, unique=True)),
+                ('last_suffix', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('objects', authentication.models.UserManager()),
+            ],
+        ),
+    ]
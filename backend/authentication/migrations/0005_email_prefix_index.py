@@ -0,0 +1,35 @@
+from django.db import migrations
+
+INDEX_NAME = 'auth_user_email_prefix_idx'
+
+
+def create_index(apps, schema_editor):
+    # Matches the UPPER(email::text) LIKE 'PREFIX%' that istartswith compiles
+    # to on PostgreSQL; other databases have no pattern operator classes
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {INDEX_NAME} '
+        'ON authentication_user (UPPER(email::text) text_pattern_ops)'
+    )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run in a transaction, and builds the
+    # index without blocking writes to a large user table
+    atomic = False
+
+    dependencies = [
+        ('authentication', '0004_username_counter'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
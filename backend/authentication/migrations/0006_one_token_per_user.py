@@ -0,0 +1,36 @@
+# Generated by Django 5.2.1 on 2026-10-17 00:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def keep_newest_tokens(apps, schema_editor):
+    # Users may hold several tokens from before the unique constraint; only
+    # the newest one was ever mailed last, so the others are dropped
+    for model_name in ('EmailVerificationToken', 'PasswordResetToken'):
+        model = apps.get_model('authentication', model_name)
+        newest = model.objects.values('user').annotate(newest=Max('pk')).values('newest')
+        model.objects.exclude(pk__in=newest).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0005_email_prefix_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(keep_newest_tokens, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='emailverificationtoken',
+            name='user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='passwordresettoken',
+            name='user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
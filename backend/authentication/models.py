@@ -1,10 +1,135 @@
+import re
 import uuid
 from datetime import timedelta
 
-from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.conf import settings
+from django.contrib.auth.models import AbstractUser, UserManager as DjangoUserManager
+from django.core.cache import cache
+from django.db import IntegrityError, connections, models, router, transaction
+from django.db.models import F, Max
+from django.db.models.functions import Cast, Substr
 from django.utils import timezone
 
+from .db_router import pin_to_primary
+from .hashing import hashing_service
+from .user_cache import user_cache
+
+# How many times User.save re-allocates a username after losing a race
+USERNAME_ALLOCATION_ATTEMPTS = 5
+
+
+class UserManager(DjangoUserManager):
+    """User manager that lets User.save allocate the username from the email."""
+
+    def _create_user_object(self, username, email, password, **extra_fields):
+        if username:
+            # Hashing an unusable password is free; the real one goes through set_password
+            user = super()._create_user_object(username, email, None, **extra_fields)
+        else:
+            user = self.model(email=self.normalize_email(email), **extra_fields)
+        user.set_password(password)
+        return user
+
+    def create_user(self, username=None, email=None, password=None, **extra_fields):
+        return super().create_user(username, email, password, **extra_fields)
+
+    def create_superuser(self, username=None, email=None, password=None, **extra_fields):
+        return super().create_superuser(username, email, password, **extra_fields)
+
+
+class UsernameCounter(models.Model):
+    """Last numeric suffix handed out for a username prefix."""
+
+    prefix = models.CharField(max_length=150, unique=True)
+    last_suffix = models.PositiveBigIntegerField(default=0)
+
+    @classmethod
+    def next_suffix(cls, prefix):
+        """
+        Reserve the next suffix for prefix, in one query once the counter exists.
+
+        The counter row is bumped with an atomic UPDATE ... RETURNING, so
+        concurrent signups never receive the same suffix. A missing row is
+        first seeded from the highest numeric suffix existing usernames have
+        after the prefix.
+        """
+        suffix = cls._bump(prefix)
+        if suffix is None:
+            cls.objects.bulk_create(
+                [cls(prefix=prefix, last_suffix=cls.seed(prefix))],
+                # A concurrent signup may seed the same counter first
+                ignore_conflicts=True,
+            )
+            suffix = cls._bump(prefix)
+        return suffix
+
+    @classmethod
+    def _bump(cls, prefix):
+        """Add one to prefix's counter and return it, or None without a counter"""
+        if can_return_rows(_write_connection(cls)):
+            return _returning(
+                cls,
+                'UPDATE {table} SET {last_suffix} = {last_suffix} + 1 '
+                'WHERE {prefix} = %s RETURNING {last_suffix}',
+                [('prefix', prefix)],
+            )
+        counters = cls.objects.filter(prefix=prefix)
+        # The UPDATE locks the row until the new value has been read back
+        with transaction.atomic():
+            if not counters.update(last_suffix=F('last_suffix') + 1):
+                return None
+            return counters.values_list('last_suffix', flat=True).get()
+
+    @classmethod
+    def reserve_suffixes(cls, counts):
+        """
+        Reserve counts[prefix] suffixes for every prefix at once; returns
+        {prefix: range of suffixes}.
+
+        Bulk version of next_suffix for imports: one UPDATE per distinct
+        count and one SELECT, plus seeding the counters that do not exist yet.
+        """
+        prefixes = list(counts)
+        with transaction.atomic():
+            existing = set(
+                cls.objects.filter(prefix__in=prefixes).values_list('prefix', flat=True)
+            )
+            cls.objects.bulk_create(
+                [cls(prefix=prefix, last_suffix=cls.seed(prefix))
+                 for prefix in prefixes if prefix not in existing],
+                # A concurrent signup may seed the same counter first
+                ignore_conflicts=True,
+            )
+            by_count = {}
+            for prefix, count in counts.items():
+                by_count.setdefault(count, []).append(prefix)
+            for count, group in by_count.items():
+                cls.objects.filter(prefix__in=group).update(last_suffix=F('last_suffix') + count)
+            last = dict(
+                cls.objects.filter(prefix__in=prefixes).values_list('prefix', 'last_suffix')
+            )
+        return {
+            prefix: range(last[prefix] - count + 1, last[prefix] + 1)
+            for prefix, count in counts.items()
+        }
+
+    @staticmethod
+    def seed(prefix):
+        """
+        Starting value of a new counter: the highest suffix prefix already
+        has. Suffixes over 18 digits would overflow the bigint and are skipped.
+        """
+        suffix = Cast(Substr('username', len(prefix) + 1), models.BigIntegerField())
+        return User.objects.filter(
+            # A prefix LIKE, which the username index serves (on PostgreSQL
+            # through its varchar_pattern_ops twin), narrows the regex scan
+            username__startswith=prefix,
+            username__regex=rf'^{re.escape(prefix)}[0-9]{{1,18}}$',
+        ).aggregate(last=Max(suffix))['last'] or 0
+
+    def __str__(self):
+        return f"{self.prefix} ({self.last_suffix})"
+
 
 class User(AbstractUser):
     email = models.EmailField(unique=True)
@@ -12,55 +137,370 @@ class User(AbstractUser):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = UserManager()
+
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = []
 
     def save(self, *args, **kwargs):
-        if not self.username:
-            self.username = self.email.split('@')[0]
-            base_username = self.username
-            counter = 1
-            while User.objects.filter(username=self.username).exists():
-                self.username = f"{base_username}{counter}"
-                counter += 1
-        super().save(*args, **kwargs)
+        if self.username:
+            super().save(*args, **kwargs)
+            return
+
+        base_username = self.email.split('@')[0]
+        self.username = base_username
+        if User.objects.filter(username=base_username).exists():
+            self.username = f"{base_username}{UsernameCounter.next_suffix(base_username)}"
+
+        for attempt in range(USERNAME_ALLOCATION_ATTEMPTS):
+            try:
+                with transaction.atomic():
+                    super().save(*args, **kwargs)
+                return
+            except IntegrityError:
+                # Only retry when a concurrent signup took the same username
+                if (
+                    attempt == USERNAME_ALLOCATION_ATTEMPTS - 1
+                    or not User.objects.filter(username=self.username).exists()
+                ):
+                    raise
+                self.username = f"{base_username}{UsernameCounter.next_suffix(base_username)}"
+
+    def set_password(self, raw_password):
+        self.password = hashing_service.make_password(raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password):
+        """Verify on the hashing service, upgrading outdated hashes like Django does"""
+        is_correct, must_update = hashing_service.verify_password(raw_password, self.password)
+        if is_correct and must_update:
+            self.set_password(raw_password)
+            self._password = None
+            self.save(update_fields=['password'])
+        return is_correct
 
     def __str__(self):
         return self.email
 
 
+def can_return_rows(connection):
+    """
+    Whether UPDATE and DELETE ... RETURNING work on connection: always on
+    PostgreSQL, from 3.35 on SQLite. Callers fall back to a SELECT and a
+    conditional write elsewhere.
+    """
+    return connection.vendor == 'postgresql' or (
+        connection.vendor == 'sqlite' and connection.features.can_return_rows_from_bulk_insert
+    )
+
+
+def _write_connection(model):
+    return connections[router.db_for_write(model)]
+
+
+def _execute(model, sql, values):
+    """
+    Run a raw statement on model's table; returns (first row or None,
+    number of rows written).
+
+    sql is formatted with the quoted table name and the quoted columns of
+    model's fields by field name; values lists (field name, Python value)
+    pairs for its placeholders, prepared like the ORM would prepare them.
+    """
+    connection = _write_connection(model)
+    opts = model._meta
+    names = {field.name: connection.ops.quote_name(field.column) for field in opts.concrete_fields}
+    names['table'] = connection.ops.quote_name(opts.db_table)
+    params = [
+        opts.get_field(name).get_db_prep_value(value, connection, prepared=False)
+        for name, value in values
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(sql.format(**names), params)
+        row = cursor.fetchone() if cursor.description else None
+        return row, cursor.rowcount
+
+
+def _returning(model, sql, values):
+    """
+    Run an UPDATE or DELETE ... RETURNING one column (see _execute) and
+    return that column of the first row, or None when no row was written.
+    Only where can_return_rows.
+    """
+    row, _ = _execute(model, sql, values)
+    return row[0] if row else None
+
+
+def _reissue(model, user, replace_when, replace_params=(), **defaults):
+    """
+    Give user a new token of model and return it, or None when user's
+    current token is kept.
+
+    One INSERT ... ON CONFLICT (user) DO UPDATE, which only replaces the
+    existing row when it is older than TOKEN_REISSUE_SECONDS or matches
+    replace_when (SQL on the existing row, as in _execute). Concurrent
+    requests therefore leave a single token, and only the one whose
+    statement wrote a row gets it back to email.
+    """
+    now = timezone.now()
+    token = uuid.uuid4()
+    values = [
+        ('user', user.pk), ('token', token), ('created_at', now),
+        ('expires_at', now + model.LIFETIME), *defaults.items(),
+    ]
+    columns = ', '.join(f'{{{name}}}' for name, _ in values)
+    updates = ', '.join(
+        f'{{{name}}} = excluded.{{{name}}}' for name, _ in values if name != 'user'
+    )
+    sql = (
+        f'INSERT INTO {{table}} ({columns}) VALUES ({", ".join(["%s"] * len(values))}) '
+        f'ON CONFLICT ({{user}}) DO UPDATE SET {updates} '
+        f'WHERE {{table}}.{{created_at}} < %s{replace_when}'
+    )
+    fresh_since = now - timedelta(seconds=settings.TOKEN_REISSUE_SECONDS)
+    _, written = _execute(model, sql, [*values, ('created_at', fresh_since), *replace_params])
+    return token if written else None
+
+
+def user_updated(user_id):
+    """
+    What saving the User instance would have done, for a row changed with
+    an UPDATE statement: pin the user's reads to the primary, as the router
+    only sees the instance on save, and drop it from the user cache like
+    the post_save signal does.
+    """
+    pin_to_primary(user_id)
+    user_cache.invalidate(user_id)
+    transaction.on_commit(lambda: user_cache.invalidate(user_id))
+
+
 class EmailVerificationToken(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
-    token = models.UUIDField(default=uuid.uuid4, editable=False)
+    VERIFIED = 'verified'
+    ALREADY_VERIFIED = 'already_verified'
+    EXPIRED = 'expired'
+    INVALID = 'invalid'
+
+    # How long a consumed token keeps answering like a successful one, so a
+    # double-clicked link does not report an invalid token the second time
+    CONSUMED_TTL = 15 * 60
+
+    LIFETIME = timedelta(hours=24)
+
+    # A user has at most one verification token; a new one replaces it
+    user = models.OneToOneField(User, on_delete=models.CASCADE)
+    token = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
-    expires_at = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)
 
     def save(self, *args, **kwargs):
         if not self.expires_at:
-            self.expires_at = timezone.now() + timedelta(hours=24)
+            self.expires_at = timezone.now() + self.LIFETIME
         super().save(*args, **kwargs)
 
     def is_expired(self):
         return timezone.now() > self.expires_at
 
+    @classmethod
+    def reissue(cls, user):
+        """
+        Replace user's verification token with a new one and return it, or
+        None while the current token is younger than TOKEN_REISSUE_SECONDS.
+        """
+        return _reissue(cls, user, '')
+
+    @classmethod
+    def consume(cls, token):
+        """
+        Verify the email of token's user and delete the token; returns
+        VERIFIED, ALREADY_VERIFIED, EXPIRED or INVALID.
+
+        The token is deleted with DELETE ... RETURNING and the user flipped
+        with an UPDATE that only matches while is_email_verified is false,
+        in one transaction: two statements, and of two concurrent requests
+        for the same token only one finds it. Once committed, the token is
+        remembered for CONSUMED_TTL with its user, so repeats are answered
+        ALREADY_VERIFIED while that user is verified; across workers this
+        needs a shared cache (CACHE_BACKEND).
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            user_id = cls._delete_unexpired(token, now)
+            if user_id is not None:
+                transaction.on_commit(lambda: cache.set(
+                    cls._consumed_key(token), user_id, cls.CONSUMED_TTL
+                ))
+                if User.objects.filter(pk=user_id, is_email_verified=False).update(
+                    is_email_verified=True, updated_at=now
+                ):
+                    user_updated(user_id)
+                return cls.VERIFIED
+        consumed_by = cache.get(cls._consumed_key(token))
+        if consumed_by is not None and User.objects.filter(
+            pk=consumed_by, is_email_verified=True
+        ).exists():
+            return cls.ALREADY_VERIFIED
+        if cls.objects.filter(token=token).exists():
+            return cls.EXPIRED
+        return cls.INVALID
+
+    @classmethod
+    def _delete_unexpired(cls, token, now):
+        """Delete token if it has not expired and return its user's id, or None"""
+        if can_return_rows(_write_connection(cls)):
+            return _returning(
+                cls,
+                'DELETE FROM {table} WHERE {token} = %s AND {expires_at} >= %s '
+                'RETURNING {user}',
+                [('token', token), ('expires_at', now)],
+            )
+        unexpired = cls.objects.filter(token=token, expires_at__gte=now)
+        user_id = unexpired.values_list('user_id', flat=True).first()
+        # Only the request whose DELETE removed the row gets the user
+        if user_id is None or not unexpired.delete()[0]:
+            return None
+        return user_id
+
+    @staticmethod
+    def _consumed_key(token):
+        return f'auth:verified-token:{token}'
+
     def __str__(self):
         return f"Email verification token for {self.user.email}"
 
 
 class PasswordResetToken(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
-    token = models.UUIDField(default=uuid.uuid4, editable=False)
+    RESET = 'reset'
+    EXPIRED = 'expired'
+    INVALID = 'invalid'
+
+    LIFETIME = timedelta(hours=1)
+
+    # A user has at most one reset token; a new one replaces it
+    user = models.OneToOneField(User, on_delete=models.CASCADE)
+    token = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
-    expires_at = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)
     is_used = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # Covers the reset_password lookup (token=..., is_used=False) and
+            # carries expires_at so the expiry check needs no heap fetch.
+            # now() is not immutable, so expiry cannot be in the predicate.
+            models.Index(
+                fields=['token', 'expires_at'],
+                condition=models.Q(is_used=False),
+                name='pwdreset_unused_token_idx',
+            ),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.expires_at:
-            self.expires_at = timezone.now() + timedelta(hours=1)
+            self.expires_at = timezone.now() + self.LIFETIME
         super().save(*args, **kwargs)
 
     def is_expired(self):
         return timezone.now() > self.expires_at
 
+    @classmethod
+    def reissue(cls, user):
+        """
+        Replace user's reset token with a new, unused one and return it, or
+        None while the current token is unused and younger than
+        TOKEN_REISSUE_SECONDS.
+        """
+        return _reissue(
+            cls, user, ' OR {table}.{is_used} = %s', [('is_used', True)], is_used=False
+        )
+
+    @classmethod
+    def claim(cls, token):
+        """
+        Mark an unused, unexpired token used and return its user's id, or
+        None when there is no such token.
+
+        A single UPDATE ... WHERE is_used = false RETURNING user_id, so of
+        concurrent requests with the same token exactly one gets the id.
+        Call it inside the transaction that changes the password, so the
+        token comes back if that fails.
+        """
+        now = timezone.now()
+        if can_return_rows(_write_connection(cls)):
+            return _returning(
+                cls,
+                'UPDATE {table} SET {is_used} = %s '
+                'WHERE {token} = %s AND {is_used} = %s AND {expires_at} >= %s '
+                'RETURNING {user}',
+                [('is_used', True), ('token', token), ('is_used', False), ('expires_at', now)],
+            )
+        unused = cls.objects.filter(token=token, is_used=False, expires_at__gte=now)
+        user_id = unused.values_list('user_id', flat=True).first()
+        if user_id is None or not unused.update(is_used=True):
+            return None
+        return user_id
+
+    @classmethod
+    def set_password(cls, token, raw_password):
+        """
+        Claim token and set its user's password with one UPDATE of the
+        password and updated_at columns; returns RESET, EXPIRED or INVALID.
+        The password is hashed first, so the transaction holding the claimed
+        token row lasts two statements rather than the whole hash.
+        """
+        encoded = hashing_service.make_password(raw_password)
+        with transaction.atomic():
+            user_id = cls.claim(token)
+            if user_id is not None:
+                User.objects.filter(pk=user_id).update(
+                    password=encoded, updated_at=timezone.now()
+                )
+                user_updated(user_id)
+                return cls.RESET
+        if cls.objects.filter(token=token, is_used=False).exists():
+            return cls.EXPIRED
+        return cls.INVALID
+
     def __str__(self):
         return f"Password reset token for {self.user.email}"
+
+
+class EmailOutbox(models.Model):
+    """Authentication email waiting to be delivered by process_email_outbox."""
+
+    KIND_VERIFICATION = 'verification'
+    KIND_PASSWORD_RESET = 'password_reset'
+    KIND_CHOICES = [
+        (KIND_VERIFICATION, 'Email verification'),
+        (KIND_PASSWORD_RESET, 'Password reset'),
+    ]
+
+    STATUS_PENDING = 'pending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=32, choices=KIND_CHOICES)
+    recipient = models.EmailField()
+    user_name = models.CharField(max_length=150)
+    token = models.CharField(max_length=255)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['available_at'],
+                condition=models.Q(status='pending'),
+                name='outbox_pending_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} email to {self.recipient} ({self.status})"
@@ -0,0 +1,114 @@
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .metrics import EMAIL_SEND_SECONDS
+from .models import EmailOutbox
+from .utils import build_verification_email, build_password_reset_email
+
+logger = logging.getLogger(__name__)
+
+# How long a claimed message stays invisible to other workers. If a worker
+# dies mid-send the message becomes claimable again once the lease expires.
+CLAIM_LEASE = timedelta(minutes=5)
+
+RETRY_BASE_DELAY = timedelta(seconds=30)
+RETRY_MAX_DELAY = timedelta(hours=1)
+
+BUILDERS = {
+    EmailOutbox.KIND_VERIFICATION: build_verification_email,
+    EmailOutbox.KIND_PASSWORD_RESET: build_password_reset_email,
+}
+
+
+def queue_verification_email(user_email, verification_token, user_name):
+    """Queue an email verification message for background delivery"""
+    return EmailOutbox.objects.create(
+        kind=EmailOutbox.KIND_VERIFICATION,
+        recipient=user_email,
+        token=verification_token,
+        user_name=user_name,
+    )
+
+
+def queue_password_reset_email(user_email, reset_token, user_name):
+    """Queue a password reset message for background delivery"""
+    return EmailOutbox.objects.create(
+        kind=EmailOutbox.KIND_PASSWORD_RESET,
+        recipient=user_email,
+        token=reset_token,
+        user_name=user_name,
+    )
+
+
+def retry_delay(attempts):
+    """Exponential backoff for the given number of failed attempts"""
+    exponent = min(max(attempts - 1, 0), 16)
+    return min(RETRY_BASE_DELAY * (2 ** exponent), RETRY_MAX_DELAY)
+
+
+def claim_batch(batch_size):
+    """
+    Claim up to batch_size due messages for this worker.
+
+    Rows are locked with SELECT ... FOR UPDATE SKIP LOCKED so concurrent
+    workers never pick the same message, then leased by pushing
+    available_at forward before the lock is released.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        messages = list(
+            EmailOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status=EmailOutbox.STATUS_PENDING, available_at__lte=now)
+            .order_by('available_at')[:batch_size]
+        )
+        if messages:
+            EmailOutbox.objects.filter(pk__in=[message.pk for message in messages]).update(
+                attempts=F('attempts') + 1,
+                available_at=now + CLAIM_LEASE,
+            )
+    for message in messages:
+        message.attempts += 1
+    return messages
+
+
+def deliver(message, max_attempts, pool=None):
+    """
+    Send a claimed message and record the outcome. Returns True on success.
+
+    When a SMTPConnectionPool is given the message goes out over one of its
+    open connections; otherwise a connection is opened for this message.
+    """
+    try:
+        # Built here so a message that cannot be rendered counts as a failed
+        # attempt instead of coming back after every lease
+        email = BUILDERS[message.kind](message.recipient, message.token, message.user_name)
+        with EMAIL_SEND_SECONDS.labels(message.kind).time():
+            if pool is not None:
+                pool.send(email)
+            else:
+                email.send(fail_silently=False)
+        sent = True
+        logger.info("%s email sent successfully to %s", message.kind, message.recipient)
+    except Exception as exc:
+        sent = False
+        logger.error("Failed to send %s email to %s: %s", message.kind, message.recipient, exc)
+    now = timezone.now()
+
+    if sent:
+        message.status = EmailOutbox.STATUS_SENT
+        message.sent_at = now
+    elif message.attempts >= max_attempts:
+        message.status = EmailOutbox.STATUS_FAILED
+        logger.error(
+            "Giving up on %s email to %s after %d attempts",
+            message.kind, message.recipient, message.attempts
+        )
+    else:
+        message.available_at = now + retry_delay(message.attempts)
+
+    message.save(update_fields=['status', 'sent_at', 'available_at'])
+    return sent
@@ -0,0 +1,158 @@
+import hashlib
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .metrics import DB_SECONDS
+
+logger = logging.getLogger(__name__)
+
+_recorder = ContextVar('query_recorder', default=None)
+
+_PLACEHOLDER_LIST = re.compile(r'%s(?:\s*,\s*%s)+')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """Short hash of a statement's shape, the same whatever its parameters"""
+    shape = _WHITESPACE.sub(' ', _PLACEHOLDER_LIST.sub('%s, ...', sql)).strip()
+    return hashlib.md5(shape.encode(), usedforsecurity=False).hexdigest()[:8]
+
+
+class QueryRecorder:
+    """
+    Queries executed while recording: how many, the time they took and how
+    often each statement shape ran.
+
+    Recorders nest; queries count towards every enclosing recorder.
+    """
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+        self.samples = {}
+
+    def add(self, sql, duration):
+        recorder = self
+        key = fingerprint(sql)
+        while recorder is not None:
+            recorder.count += 1
+            recorder.duration += duration
+            recorder.statements[key] += 1
+            recorder.samples.setdefault(key, sql)
+            recorder = recorder.parent
+
+    @property
+    def duplicates(self):
+        """{fingerprint: count} of statement shapes that ran more than once"""
+        return {key: count for key, count in self.statements.items() if count > 1}
+
+    def describe(self):
+        """The recorded statements, most repeated first, for failure messages"""
+        return '\n'.join(
+            f'{count}x [{key}] {self.samples[key]}'
+            for key, count in self.statements.most_common()
+        )
+
+
+def _record(execute, sql, params, many, context):
+    recorder = _recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        recorder.add(sql, time.perf_counter() - start)
+
+
+def instrument(connection):
+    """Install the recording execute wrapper on a connection, once"""
+    if _record not in connection.execute_wrappers:
+        # First, so execute_wrapper() blocks still pop their own wrapper
+        connection.execute_wrappers.insert(0, _record)
+
+
+@contextmanager
+def record_queries():
+    """
+    Record the queries run in this context, including those run on other
+    threads through sync_to_async.
+    """
+    for alias in connections:
+        instrument(connections[alias])
+    recorder = QueryRecorder(parent=_recorder.get())
+    token = _recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _recorder.reset(token)
+
+
+class QueryBudgetMiddleware:
+    """
+    Measures the queries of each request against its endpoint's budget.
+
+    With DEBUG the figures are returned in X-Query-Count, X-Query-Time-Ms
+    and X-Query-Duplicates headers; otherwise they are logged, as a warning
+    when the request exceeded QUERY_BUDGETS[url name] (or
+    QUERY_BUDGET_DEFAULT) or repeated a statement.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.QUERY_INSTRUMENTATION:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with record_queries() as recorder:
+            response = self.get_response(request)
+        self.report(request, response, recorder)
+        return response
+
+    async def __acall__(self, request):
+        with record_queries() as recorder:
+            response = await self.get_response(request)
+        self.report(request, response, recorder)
+        return response
+
+    @staticmethod
+    def report(request, response, recorder):
+        match = request.resolver_match
+        endpoint = match.view_name if match is not None else request.path
+        budget = settings.QUERY_BUDGETS.get(endpoint, settings.QUERY_BUDGET_DEFAULT)
+        duplicates = ','.join(f'{key}x{count}' for key, count in recorder.duplicates.items())
+        duration_ms = recorder.duration * 1000
+        if match is not None:
+            DB_SECONDS.labels(endpoint).observe(recorder.duration)
+
+        if settings.DEBUG:
+            response['X-Query-Count'] = str(recorder.count)
+            response['X-Query-Time-Ms'] = f'{duration_ms:.1f}'
+            response['X-Query-Duplicates'] = duplicates
+            return
+
+        level = (
+            logging.WARNING if recorder.count > budget or duplicates else logging.INFO
+        )
+        logger.log(
+            level, 'Queries for %s: %d of %d budgeted, %.1f ms, duplicates: %s',
+            endpoint, recorder.count, budget, duration_ms, duplicates or 'none',
+        )
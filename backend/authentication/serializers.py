@@ -1,7 +1,16 @@
 from rest_framework import serializers
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer,
+    TokenRefreshSerializer,
+)
+from rest_framework_simplejwt.settings import api_settings
+from django.conf import settings
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
+from .db_router import read_from_primary
 from .models import User
+from .tokens import ACCESS_CLAIMS, PROFILE_FIELDS, ProfileRefreshToken, add_profile_claims
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -19,20 +28,24 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         validated_data.pop('password_confirm')
-        username = validated_data.get('email').split('@')[0]
-        user = User.objects.create_user(username=username, **validated_data)
+        # The username is allocated from the email prefix by User.save
+        user = User.objects.create_user(**validated_data)
         return user
 
 
-class UserLoginSerializer(serializers.Serializer):
+class LoginCredentialsSerializer(serializers.Serializer):
     email = serializers.EmailField()
     password = serializers.CharField()
 
+
+class UserLoginSerializer(LoginCredentialsSerializer):
     def validate(self, attrs):
         email = attrs.get('email')
         password = attrs.get('password')
 
         if email and password:
+            # A password reset moments ago may not have reached the replicas
+            read_from_primary()
             user = authenticate(username=email, password=password)
             if not user:
                 raise serializers.ValidationError('Invalid credentials')
@@ -44,28 +57,42 @@ class UserLoginSerializer(serializers.Serializer):
         raise serializers.ValidationError('Must include email and password')
 
 
+def validate_link_token(value):
+    """Stored tokens are UUIDs; signed ones are checked by link_tokens"""
+    if settings.SIGNED_AUTH_TOKENS:
+        return value
+    return serializers.UUIDField().to_internal_value(value)
+
+
 class EmailVerificationSerializer(serializers.Serializer):
-    token = serializers.UUIDField()
+    token = serializers.CharField(max_length=255)
+
+    def validate_token(self, value):
+        return validate_link_token(value)
 
 
 class PasswordResetRequestSerializer(serializers.Serializer):
     email = serializers.EmailField()
 
-    def validate_email(self, value):
+    def validate(self, attrs):
+        # The user is handed to the view so it is fetched only once
         try:
-            User.objects.get(email=value)
+            attrs['user'] = User.objects.get(email=attrs['email'])
         except User.DoesNotExist as exc:
             raise serializers.ValidationError(
-                "No user found with this email address"
+                {'email': "No user found with this email address"}
             ) from exc
-        return value
+        return attrs
 
 
 class PasswordResetConfirmSerializer(serializers.Serializer):
-    token = serializers.UUIDField()
+    token = serializers.CharField(max_length=255)
     password = serializers.CharField(validators=[validate_password])
     password_confirm = serializers.CharField()
 
+    def validate_token(self, value):
+        return validate_link_token(value)
+
     def validate(self, attrs):
         if attrs['password'] != attrs['password_confirm']:
             raise serializers.ValidationError("Passwords don't match")
@@ -82,3 +109,44 @@ class UserProfileSerializer(serializers.ModelSerializer):
         read_only_fields = (
             'id', 'email', 'username', 'is_email_verified', 'created_at'
         )
+
+
+class ProfileTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = ProfileRefreshToken
+
+
+class ProfileTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refreshes tokens with the user's current profile claims."""
+
+    token_class = ProfileRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+
+        # The user may have been deactivated moments ago
+        read_from_primary()
+        user_id = refresh.payload.get(api_settings.USER_ID_CLAIM)
+        user = User.objects.only(*PROFILE_FIELDS, *ACCESS_CLAIMS).filter(
+            **{api_settings.USER_ID_FIELD: user_id}
+        ).first()
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(
+                self.error_messages['no_active_account'],
+                'no_active_account',
+            )
+        add_profile_claims(refresh, user)
+
+        data = {'access': str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.blacklist()
+
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            refresh.outstand()
+
+            data['refresh'] = str(refresh)
+
+        return data
@@ -0,0 +1,43 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from .blacklist_filter import blacklist_filter
+from .db_pool import connection_counter
+from .query_budget import instrument
+from .user_cache import user_cache
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(instance, **kwargs):
+    """Drop a saved or deleted user from the user cache in every worker"""
+    user_id = instance.pk
+    user_cache.invalidate(user_id)
+    # Invalidate again once the change is visible to other connections, so a
+    # concurrent miss cannot re-cache the pre-commit row under the new stamp.
+    transaction.on_commit(lambda: user_cache.invalidate(user_id))
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def add_to_blacklist_filter(instance, created, **kwargs):
+    """Record a newly blacklisted JTI in this process's blacklist filter"""
+    if created:
+        blacklist_filter.add(instance.token.jti)
+
+
+@receiver(connection_created)
+def count_connection(connection, **kwargs):
+    """Count new database connections so reuse shows up in the pool stats"""
+    connection_counter.record(connection.alias)
+
+
+@receiver(connection_created)
+def instrument_connection(connection, **kwargs):
+    """Let the query budget recorder see queries on new connections"""
+    instrument(connection)
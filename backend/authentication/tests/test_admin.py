@@ -0,0 +1,90 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from authentication.admin import UserAdmin
+from authentication.models import EmailVerificationToken
+
+User = get_user_model()
+
+
+class ScalableAdminTest(TestCase):
+    """Test cases for the keyset-paginated admin changelists."""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            email='admin@example.com', password='testpass123'
+        )
+        self.client.force_login(self.admin)
+        self.users = [
+            User.objects.create_user(email=f'user{i}@example.com', password=None)
+            for i in range(4)
+        ]
+        self.url = reverse('admin:authentication_user_changelist')
+
+    def _emails(self, response):
+        return [user.email for user in response.context['cl'].result_list]
+
+    @patch.object(UserAdmin, 'list_per_page', 2)
+    def test_show_more(self):
+        """Test pages continue below the last primary key instead of an offset."""
+        response = self.client.get(self.url)
+
+        self.assertEqual(self._emails(response), ['user3@example.com', 'user2@example.com'])
+        next_url = response.context['cl'].next_page_url
+        self.assertEqual(next_url, f'?after={self.users[2].pk}')
+        self.assertContains(response, 'Show more')
+
+        response = self.client.get(self.url + next_url)
+
+        self.assertEqual(self._emails(response), ['user1@example.com', 'user0@example.com'])
+        response = self.client.get(self.url + response.context['cl'].next_page_url)
+        self.assertEqual(self._emails(response), ['admin@example.com'])
+        self.assertIsNone(response.context['cl'].next_page_url)
+
+    @patch.object(UserAdmin, 'list_per_page', 2)
+    def test_ordering_ignored(self):
+        """Test an o= sort parameter cannot reorder the keyset pages."""
+        response = self.client.get(self.url, {'o': '1'})
+
+        self.assertEqual(self._emails(response), ['user3@example.com', 'user2@example.com'])
+
+    def test_invalid_after(self):
+        """Test a malformed page marker is treated like other bad parameters."""
+        response = self.client.get(self.url, {'after': 'x'})
+
+        self.assertRedirects(response, self.url + '?e=1', fetch_redirect_response=False)
+
+    def test_prefix_search(self):
+        """Test email search matches from the start of the address."""
+        response = self.client.get(self.url, {'q': 'USER1'})
+
+        self.assertEqual(self._emails(response), ['user1@example.com'])
+        response = self.client.get(self.url, {'q': 'example.com'})
+        self.assertEqual(self._emails(response), [])
+
+    def test_estimated_count(self):
+        """Test large planner estimates are shown instead of counting rows."""
+        with patch('authentication.admin.estimated_count', return_value=12_345_678):
+            response = self.client.get(self.url)
+
+        self.assertContains(response, '~12345678 users')
+
+    def test_token_list_queries(self):
+        """Test token emails come from a join rather than a query per row."""
+        url = reverse('admin:authentication_emailverificationtoken_changelist')
+        EmailVerificationToken.objects.create(user=self.users[0])
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url)
+        for user in self.users[1:]:
+            EmailVerificationToken.objects.create(user=user)
+
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(url)
+
+        self.assertContains(response, 'user3@example.com')
+        self.assertEqual(len(many), len(few))
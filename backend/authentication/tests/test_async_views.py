@@ -0,0 +1,255 @@
+import json
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from authentication import async_views
+from authentication.models import EmailOutbox, EmailVerificationToken, PasswordResetToken
+from authentication.tokens import ProfileRefreshToken
+
+User = get_user_model()
+
+
+class AsyncViewsTest(TestCase):
+    """Test cases for the native async authentication views."""
+
+    def setUp(self):
+        self.factory = AsyncRequestFactory()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123',
+            first_name='Test',
+            last_name='User'
+        )
+        self.refresh = ProfileRefreshToken.for_user(self.user)
+
+    def _request(self, method, data=None, authenticated=False):
+        headers = {}
+        if authenticated:
+            headers['Authorization'] = f'Bearer {self.refresh.access_token}'
+        if method == 'get':
+            return self.factory.get('/', headers=headers)
+        return getattr(self.factory, method)(
+            '/', data=json.dumps(data or {}), content_type='application/json', headers=headers
+        )
+
+    async def test_register(self):
+        """Test registration creates the user and queues the verification email."""
+        response = await async_views.register(self._request('post', {
+            'email': 'newuser@example.com',
+            'password': 'newpass123',
+            'password_confirm': 'newpass123',
+            'first_name': 'New',
+        }))
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        user = await User.objects.aget(email='newuser@example.com')
+        self.assertEqual(json.loads(response.content)['user_id'], user.id)
+        self.assertEqual(user.username, 'newuser')
+        self.assertTrue(await user.acheck_password('newpass123'))
+        self.assertTrue(await EmailVerificationToken.objects.filter(user=user).aexists())
+        self.assertTrue(
+            await EmailOutbox.objects.filter(recipient='newuser@example.com').aexists()
+        )
+
+    async def test_register_duplicate_email(self):
+        """Test registration rejects an email that is already taken."""
+        response = await async_views.register(self._request('post', {
+            'email': 'test@example.com',
+            'password': 'newpass123',
+            'password_confirm': 'newpass123',
+        }))
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('email', json.loads(response.content))
+
+    async def test_login(self):
+        """Test login returns tokens and the profile."""
+        response = await async_views.login(self._request('post', {
+            'email': 'test@example.com', 'password': 'testpass123'
+        }))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = json.loads(response.content)
+        self.assertIn('access_token', data)
+        self.assertIn('refresh_token', data)
+        self.assertEqual(data['user']['email'], 'test@example.com')
+
+    async def test_login_invalid_credentials(self):
+        """Test wrong passwords and unknown emails are rejected alike."""
+        for email, password in (
+            ('test@example.com', 'wrongpass'),
+            ('nobody@example.com', 'testpass123'),
+        ):
+            response = await async_views.login(self._request('post', {
+                'email': email, 'password': password
+            }))
+
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(
+                json.loads(response.content), {'non_field_errors': ['Invalid credentials']}
+            )
+
+    async def test_verify_email(self):
+        """Test verification marks the user verified and consumes the token."""
+        token = await EmailVerificationToken.objects.acreate(user=self.user)
+
+        response = await async_views.verify_email(
+            self._request('post', {'token': str(token.token)})
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        await self.user.arefresh_from_db()
+        self.assertTrue(self.user.is_email_verified)
+        self.assertFalse(await EmailVerificationToken.objects.filter(pk=token.pk).aexists())
+
+    async def test_verify_email_expired(self):
+        """Test an expired verification token is rejected."""
+        token = await EmailVerificationToken.objects.acreate(
+            user=self.user, expires_at=timezone.now() - timedelta(hours=1)
+        )
+
+        response = await async_views.verify_email(
+            self._request('post', {'token': str(token.token)})
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        await self.user.arefresh_from_db()
+        self.assertFalse(self.user.is_email_verified)
+
+    def test_verify_email_twice(self):
+        """Test a repeated request for a consumed token still succeeds."""
+        token = EmailVerificationToken.objects.create(user=self.user)
+        verify_email = async_to_sync(async_views.verify_email)
+        # Sync, so the view's database work shares this thread's connection
+        with self.captureOnCommitCallbacks(execute=True):
+            verify_email(self._request('post', {'token': str(token.token)}))
+
+        response = verify_email(self._request('post', {'token': str(token.token)}))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content), {'message': 'Email already verified'})
+
+    async def test_forgot_password(self):
+        """Test a reset request stores a token and queues its email."""
+        response = await async_views.forgot_password(
+            self._request('post', {'email': 'test@example.com'})
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        token = await PasswordResetToken.objects.aget(user=self.user)
+        outbox = await EmailOutbox.objects.aget(recipient='test@example.com')
+        self.assertEqual(outbox.token, str(token.token))
+
+    async def test_reset_password(self):
+        """Test a reset token sets the new password."""
+        token = await PasswordResetToken.objects.acreate(user=self.user)
+
+        response = await async_views.reset_password(self._request('post', {
+            'token': str(token.token),
+            'password': 'newpass456',
+            'password_confirm': 'newpass456',
+        }))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        await self.user.arefresh_from_db()
+        self.assertTrue(await self.user.acheck_password('newpass456'))
+
+    async def test_profile(self):
+        """Test the profile of the authenticated user is returned."""
+        response = await async_views.profile(self._request('get', authenticated=True))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content)['email'], 'test@example.com')
+
+    async def test_profile_unauthenticated(self):
+        """Test requests without a token get a 401 with a challenge."""
+        response = await async_views.profile(self._request('get'))
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn('WWW-Authenticate', response)
+
+    @override_settings(
+        JWT_AUTHENTICATION_CLASS='authentication.authentication.ProfileClaimsAuthentication'
+    )
+    def test_profile_stateless(self):
+        """Test claims-only authentication serves the profile without a query."""
+        request = self._request('get', authenticated=True)
+
+        with self.assertNumQueries(0):
+            response = async_to_sync(async_views.profile)(request)
+
+        self.assertEqual(json.loads(response.content)['first_name'], 'Test')
+
+    @override_settings(
+        JWT_AUTHENTICATION_CLASS='authentication.authentication.ProfileClaimsAuthentication'
+    )
+    def test_profile_not_modified(self):
+        """Test a current ETag gets a 304 from the claims without a query."""
+        etag = async_to_sync(async_views.profile)(self._request('get', authenticated=True))['ETag']
+        request = self.factory.get('/', headers={
+            'Authorization': f'Bearer {self.refresh.access_token}', 'If-None-Match': etag,
+        })
+
+        with self.assertNumQueries(0):
+            response = async_to_sync(async_views.profile)(request)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    async def test_update_profile(self):
+        """Test the writable profile fields are updated."""
+        response = await async_views.update_profile(
+            self._request('put', {'first_name': 'Updated', 'email': 'x@example.com'},
+                          authenticated=True)
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        await self.user.arefresh_from_db()
+        self.assertEqual(self.user.first_name, 'Updated')
+        self.assertEqual(self.user.email, 'test@example.com')
+
+    async def test_update_if_match(self):
+        """Test an update with an outdated ETag is refused."""
+        request = self.factory.put(
+            '/', data=json.dumps({'first_name': 'Updated'}), content_type='application/json',
+            headers={
+                'Authorization': f'Bearer {self.refresh.access_token}', 'If-Match': '"1-0"',
+            },
+        )
+
+        response = await async_views.update_profile(request)
+
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        await self.user.arefresh_from_db()
+        self.assertEqual(self.user.first_name, 'Test')
+
+    async def test_wrong_method(self):
+        """Test other HTTP methods are refused."""
+        response = await async_views.update_profile(self._request('post', authenticated=True))
+
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    async def test_logout(self):
+        """Test logout blacklists the refresh token."""
+        response = await async_views.logout(
+            self._request('post', {'refresh_token': str(self.refresh)}, authenticated=True)
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(
+            await BlacklistedToken.objects.filter(token__jti=self.refresh['jti']).aexists()
+        )
+
+    async def test_logout_invalid_token(self):
+        """Test an unusable refresh token is rejected."""
+        response = await async_views.logout(
+            self._request('post', {'refresh_token': 'invalid'}, authenticated=True)
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
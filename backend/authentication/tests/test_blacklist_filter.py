@@ -0,0 +1,107 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.exceptions import TokenError
+
+from authentication.blacklist_filter import BlacklistFilter, BloomFilter
+from authentication.tokens import ProfileRefreshToken
+
+User = get_user_model()
+
+
+class BloomFilterTest(SimpleTestCase):
+    """Test cases for the Bloom filter."""
+
+    def test_no_false_negatives(self):
+        """Test every added key is reported as present."""
+        bloom = BloomFilter(capacity=10000, fp_rate=0.01)
+        keys = [f'jti-{i}' for i in range(10000)]
+        for key in keys:
+            bloom.add(key)
+
+        self.assertTrue(all(key in bloom for key in keys))
+        self.assertGreater(bloom.count, 9900)
+
+    def test_false_positive_rate(self):
+        """Test the measured false-positive rate stays near the target."""
+        bloom = BloomFilter(capacity=10000, fp_rate=0.01)
+        for i in range(10000):
+            bloom.add(f'jti-{i}')
+
+        false_positives = sum(f'other-{i}' in bloom for i in range(10000))
+
+        self.assertLess(false_positives / 10000, 0.02)
+        self.assertAlmostEqual(bloom.estimated_fp_rate(), 0.01, delta=0.005)
+
+
+@override_settings(JWT_BLACKLIST_FILTER=True)
+class BlacklistFilterTest(TestCase):
+    """Test cases for the refresh-token blacklist filter."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.filter = BlacklistFilter(capacity=1000, fp_rate=0.001)
+        for target in ('authentication.tokens', 'authentication.signals'):
+            patcher = patch(f'{target}.blacklist_filter', self.filter)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = patch.object(self.filter, 'start')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _blacklist_queries(self, raw_token):
+        with CaptureQueriesContext(connection) as queries:
+            ProfileRefreshToken(raw_token)
+        return [q for q in queries if 'blacklistedtoken' in q['sql']]
+
+    def test_rebuild_loads_blacklist(self):
+        """Test a rebuild picks up tokens already in the blacklist table."""
+        token = ProfileRefreshToken.for_user(self.user)
+        token.blacklist()
+
+        self.filter.rebuild()
+
+        self.assertTrue(self.filter.might_contain(token['jti']))
+        self.assertEqual(self.filter.stats()['entries'], 1)
+
+    def test_skips_db_when_absent(self):
+        """Test a never-blacklisted token is checked without a query."""
+        self.filter.rebuild()
+        token = ProfileRefreshToken.for_user(self.user)
+
+        self.assertEqual(self._blacklist_queries(str(token)), [])
+        self.assertEqual(self.filter.stats()['skipped_lookups'], 1)
+
+    def test_blacklisted_token_rejected(self):
+        """Test blacklisting updates the filter so the token is refused."""
+        self.filter.rebuild()
+        token = ProfileRefreshToken.for_user(self.user)
+        token.blacklist()
+
+        with self.assertRaises(TokenError):
+            ProfileRefreshToken(str(token))
+
+    def test_not_ready_uses_db(self):
+        """Test checks go to the database until the filter is built."""
+        token = ProfileRefreshToken.for_user(self.user)
+
+        self.assertEqual(len(self._blacklist_queries(str(token))), 1)
+
+    def test_sync_adds_new_rows(self):
+        """Test rows blacklisted by another process arrive with the next sync."""
+        self.filter.rebuild()
+        token = ProfileRefreshToken.for_user(self.user)
+        with patch('authentication.signals.blacklist_filter', BlacklistFilter()):
+            token.blacklist()
+        self.assertFalse(self.filter.might_contain(token['jti']))
+
+        self.filter.sync()
+
+        self.assertTrue(self.filter.might_contain(token['jti']))
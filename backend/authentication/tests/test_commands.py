@@ -0,0 +1,339 @@
+import gzip
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from authentication.models import (
+    EmailOutbox, EmailVerificationToken, PasswordResetToken, UsernameCounter
+)
+
+User = get_user_model()
+
+
+class SweepExpiredTokensTest(TestCase):
+    """Test cases for the sweep_expired_tokens command."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.past = timezone.now() - timedelta(hours=1)
+
+    def _sweep(self):
+        out = StringIO()
+        call_command('sweep_expired_tokens', batch_size=2, throttle=0, stdout=out)
+        return out.getvalue()
+
+    def test_deletes_expired_tokens(self):
+        """Test expired and used tokens are deleted in batches."""
+        # Users hold one token of each kind
+        users = [
+            User.objects.create_user(email=f'user{i}@example.com', password=None)
+            for i in range(5)
+        ]
+        for user in users:
+            EmailVerificationToken.objects.create(user=user, expires_at=self.past)
+        live_verification = EmailVerificationToken.objects.create(user=self.user)
+        PasswordResetToken.objects.create(user=users[0], expires_at=self.past)
+        PasswordResetToken.objects.create(user=users[1], is_used=True)
+        live_reset = PasswordResetToken.objects.create(user=self.user)
+
+        output = self._sweep()
+
+        self.assertEqual(list(EmailVerificationToken.objects.all()), [live_verification])
+        self.assertEqual(list(PasswordResetToken.objects.all()), [live_reset])
+        self.assertIn('email_verification_tokens: deleted 5 rows in 3 batches', output)
+
+    def test_deletes_expired_jwts(self):
+        """Test expired outstanding tokens go together with their blacklist rows."""
+        expired = RefreshToken.for_user(self.user)
+        expired.blacklist()
+        OutstandingToken.objects.filter(jti=expired['jti']).update(expires_at=self.past)
+        live = RefreshToken.for_user(self.user)
+
+        self._sweep()
+
+        self.assertEqual(
+            list(OutstandingToken.objects.values_list('jti', flat=True)), [live['jti']]
+        )
+        self.assertFalse(BlacklistedToken.objects.exists())
+
+    def test_keeps_recent_outbox(self):
+        """Test only old delivered outbox rows are removed."""
+        old = EmailOutbox.objects.create(
+            kind=EmailOutbox.KIND_VERIFICATION, recipient='test@example.com',
+            user_name='Test', token='old', status=EmailOutbox.STATUS_SENT
+        )
+        EmailOutbox.objects.filter(pk=old.pk).update(
+            created_at=timezone.now() - timedelta(days=30)
+        )
+        recent = EmailOutbox.objects.create(
+            kind=EmailOutbox.KIND_VERIFICATION, recipient='test@example.com',
+            user_name='Test', token='recent', status=EmailOutbox.STATUS_SENT
+        )
+
+        self._sweep()
+
+        self.assertEqual(list(EmailOutbox.objects.all()), [recent])
+
+    def test_no_backlog_count(self):
+        """Test a sweep with nothing to delete runs one batch query per table."""
+        with self.assertNumQueries(4):
+            output = self._sweep()
+
+        self.assertEqual(output, '')
+
+
+class BenchAuthTest(TestCase):
+    """Test cases for the bench_auth command."""
+
+    # Register and login hash passwords at full cost; these flows stay quick
+    flows = 'refresh,profile,verify_email,logout'
+
+    def _bench(self, **options):
+        call_command(
+            'bench_auth', flows=self.flows, requests=3, concurrency=1,
+            stdout=StringIO(), **options
+        )
+
+    def test_writes_results(self):
+        """Test every flow is measured and the bench data is removed."""
+        with tempfile.TemporaryDirectory() as directory:
+            output = Path(directory, 'results.json')
+
+            self._bench(output=str(output))
+
+            results = json.loads(output.read_text(encoding='utf-8'))
+        self.assertEqual(set(results['flows']), set(self.flows.split(',')))
+        for figures in results['flows'].values():
+            self.assertEqual(figures['requests'], 3)
+            self.assertGreater(figures['throughput'], 0)
+            self.assertLessEqual(figures['p50_ms'], figures['p99_ms'])
+        self.assertFalse(User.objects.exists())
+
+    def test_fails_on_regression(self):
+        """Test a run slower than the baseline exits with an error."""
+        baseline = {'flows': {
+            'profile': {'throughput': 1e9, 'p50_ms': 0.001, 'p95_ms': 0.001, 'p99_ms': 0.001}
+        }}
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory, 'baseline.json')
+            path.write_text(json.dumps(baseline), encoding='utf-8')
+
+            with self.assertRaisesMessage(CommandError, 'profile throughput'):
+                self._bench(baseline=str(path))
+
+
+class BenchAsgiTest(TransactionTestCase):
+    """Test cases for the bench_asgi command."""
+
+    def test_compares_stacks(self):
+        """Test every flow is measured on both stacks and the bench data is removed."""
+        flows = ('verify_email', 'forgot_password', 'profile')
+        out = StringIO()
+
+        call_command(
+            'bench_asgi', flows=','.join(flows), requests=3, concurrency=1, stdout=out
+        )
+
+        rows = [line.split() for line in out.getvalue().splitlines()[1:len(flows) * 2 + 1]]
+        self.assertEqual(
+            [row[:2] for row in rows],
+            [[flow, stack] for flow in flows for stack in ('sync', 'async')],
+        )
+        self.assertFalse(User.objects.exists())
+        self.assertFalse(EmailOutbox.objects.exists())
+
+
+class BenchTokenWritesTest(TestCase):
+    """Test cases for the bench_token_writes command."""
+
+    def test_compares_modes(self):
+        """Test both modes are measured, signed tokens write no token rows."""
+        out = StringIO()
+
+        call_command('bench_token_writes', users=2, stdout=out)
+
+        rows = [line.split() for line in out.getvalue().splitlines()[1:]]
+        self.assertEqual(
+            [row[:2] for row in rows],
+            [['stored', 'verify_email'], ['stored', 'reset_password'],
+             ['signed', 'verify_email'], ['signed', 'reset_password']]
+        )
+        stored_reset, signed_rows = rows[1], rows[2:]
+        self.assertEqual(stored_reset[3], '2.00')
+        self.assertEqual(stored_reset[5], '2')
+        for row in signed_rows:
+            self.assertEqual(row[3], '0.00')
+        self.assertFalse(User.objects.exists())
+
+
+class ImportUsersTest(TestCase):
+    """Test cases for the import_users command."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        # Few iterations, so the test hashes quickly
+        self.encoded = PBKDF2PasswordHasher().encode('legacy-pass', 'legacysalt', iterations=1000)
+
+    def _write(self, name, content):
+        path = Path(self.directory, name)
+        path.write_text(content, encoding='utf-8')
+        return str(path)
+
+    def _import(self, path, **options):
+        out = StringIO()
+        options.setdefault('stderr', StringIO())
+        call_command('import_users', path, stdout=out, **options)
+        return out.getvalue()
+
+    def test_imports_csv(self):
+        """Test users get hashes as given and usernames like at signup."""
+        User.objects.create_user(email='john@example.com', password='testpass123')
+        path = self._write('users.csv', (
+            'email,first_name,password_hash,is_email_verified\n'
+            f'john@legacy.com,John,{self.encoded},true\n'
+            f'john@other.com,Johnny,{self.encoded},false\n'
+            'not-an-email,Nobody,,false\n'
+            'mary@legacy.com,Mary,,false\n'
+        ))
+
+        output = self._import(path, chunk_size=2)
+
+        self.assertIn('Imported 3 users, skipped 0 existing and 1 invalid rows', output)
+        self.assertEqual(
+            set(User.objects.filter(email__endswith='.com').values_list('username', flat=True)),
+            {'john', 'john1', 'john2', 'mary'}
+        )
+        imported = User.objects.get(email='john@legacy.com')
+        self.assertTrue(imported.is_email_verified)
+        self.assertTrue(imported.check_password('legacy-pass'))
+        self.assertFalse(User.objects.get(email='mary@legacy.com').has_usable_password())
+        self.assertEqual(UsernameCounter.objects.get(prefix='john').last_suffix, 2)
+
+    def test_rejects_long_fields(self):
+        """Test rows that do not fit their columns are rejected, not inserted."""
+        path = self._write('users.ndjson', (
+            json.dumps({'email': 'long@legacy.com', 'first_name': 'x' * 151}) + '\n'
+            + json.dumps({'email': 'fits@legacy.com', 'last_name': 'x' * 150}) + '\n'
+        ))
+
+        output = self._import(path)
+
+        self.assertIn('Imported 1 users, skipped 0 existing and 1 invalid rows', output)
+        self.assertEqual(User.objects.get().email, 'fits@legacy.com')
+
+    def test_rejects_bad_json(self):
+        """Test malformed or non-object NDJSON lines are rejected and the rest imported."""
+        path = self._write('users.ndjson', (
+            '{"email": "broken@legacy.com"\n'
+            '[1, 2]\n'
+            '"x"\n'
+            + json.dumps({'email': 'fits@legacy.com'}) + '\n'
+        ))
+        err = StringIO()
+
+        output = self._import(path, stderr=err)
+
+        self.assertIn('Imported 1 users, skipped 0 existing and 3 invalid rows', output)
+        self.assertIn('Row 2: line 2 is not a JSON object', err.getvalue())
+        self.assertEqual(User.objects.get().email, 'fits@legacy.com')
+
+    def test_suffix_clash(self):
+        """Test a reserved suffix taken as somebody's bare username is skipped."""
+        User.objects.create_user(email='bob@example.com', password='testpass123')
+        User.objects.create_user(email='bob1@example.com', password='testpass123')
+        UsernameCounter.objects.create(prefix='bob', last_suffix=0)
+        path = self._write('users.csv', 'email\nbob@legacy.com\n')
+
+        self._import(path)
+
+        self.assertEqual(User.objects.get(email='bob@legacy.com').username, 'bob2')
+
+    def test_resumes_from_checkpoint(self):
+        """Test rows recorded in the checkpoint are not read again and reruns skip users."""
+        path = self._write('users.ndjson', ''.join(
+            json.dumps({'email': f'user{i}@legacy.com', 'password_hash': self.encoded}) + '\n'
+            for i in range(5)
+        ))
+        checkpoint = str(Path(self.directory, 'checkpoint.json'))
+        self._write('checkpoint.json', json.dumps({'input': path, 'rows': 2}))
+
+        self._import(path, checkpoint=checkpoint, chunk_size=2)
+
+        self.assertEqual(
+            sorted(User.objects.values_list('email', flat=True)),
+            ['user2@legacy.com', 'user3@legacy.com', 'user4@legacy.com']
+        )
+        self.assertEqual(json.loads(Path(checkpoint).read_text(encoding='utf-8'))['rows'], 5)
+
+        output = self._import(path)
+
+        self.assertIn('Imported 2 users, skipped 3 existing and 0 invalid rows', output)
+
+    def test_queues_verification(self):
+        """Test unverified users get a token and a queued email."""
+        path = self._write('users.ndjson', (
+            json.dumps({'email': 'new@legacy.com', 'first_name': 'New'}) + '\n'
+            + json.dumps({'email': 'done@legacy.com', 'is_email_verified': True}) + '\n'
+        ))
+
+        self._import(path, send_verification=True)
+
+        token = EmailVerificationToken.objects.get()
+        self.assertEqual(token.user.email, 'new@legacy.com')
+        outbox = EmailOutbox.objects.get()
+        self.assertEqual(
+            (outbox.recipient, outbox.token, outbox.user_name),
+            ('new@legacy.com', str(token.token), 'New')
+        )
+
+    def test_hashes_plain_passwords(self):
+        """Test plain-text passwords are hashed in the process pool."""
+        path = self._write('users.csv', 'email,password\nplain@legacy.com,plain-pass-123\n')
+
+        self._import(path, hash_workers=1)
+
+        user = User.objects.get(email='plain@legacy.com')
+        self.assertNotEqual(user.password, 'plain-pass-123')
+        self.assertTrue(user.check_password('plain-pass-123'))
+
+
+class ExportUsersCommandTest(TestCase):
+    """Test cases for the export_users command."""
+
+    def test_writes_gzip_file(self):
+        """Test every user is written to the output file."""
+        for i in range(3):
+            User.objects.create_user(email=f'user{i}@example.com', password='testpass123')
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = Path(directory, 'users.ndjson.gz')
+        err = StringIO()
+
+        call_command(
+            'export_users', format='ndjson', gzip=True, chunk_size=2, output=str(path),
+            stderr=err
+        )
+
+        lines = gzip.decompress(path.read_bytes()).decode().splitlines()
+        self.assertEqual(
+            [json.loads(line)['email'] for line in lines],
+            [f'user{i}@example.com' for i in range(3)]
+        )
+        self.assertIn('Exported 3 users', err.getvalue())
@@ -0,0 +1,129 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from authentication import views
+from authentication.authentication import ProfileClaimsAuthentication
+from authentication.conditional import profile_etag
+from authentication.serializers import UserProfileSerializer
+from authentication.tokens import ProfileRefreshToken
+
+User = get_user_model()
+
+
+class ConditionalProfileTest(APITestCase):
+    """Test cases for ETag and Last-Modified validators on the profile."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com', password='testpass123', first_name='Test'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.profile_url = reverse('authentication:profile')
+        self.update_url = reverse('authentication:update_profile')
+
+    def _update(self, first_name, **headers):
+        return self.client.put(self.update_url, {'first_name': first_name}, headers=headers)
+
+    def test_validators(self):
+        """Test the profile carries validators derived from updated_at."""
+        response = self.client.get(self.profile_url)
+
+        self.assertEqual(response['ETag'], profile_etag(self.user))
+        self.assertEqual(
+            response['Last-Modified'], http_date(int(self.user.updated_at.timestamp()))
+        )
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('Authorization', response['Vary'])
+
+    def test_if_none_match(self):
+        """Test a current ETag gets a 304 without serializing the profile."""
+        etag = self.client.get(self.profile_url)['ETag']
+
+        with patch.object(UserProfileSerializer, 'to_representation') as to_representation:
+            response = self.client.get(self.profile_url, headers={'If-None-Match': etag})
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        to_representation.assert_not_called()
+
+    def test_if_modified_since(self):
+        """Test an up-to-date If-Modified-Since gets a 304."""
+        last_modified = self.client.get(self.profile_url)['Last-Modified']
+
+        response = self.client.get(
+            self.profile_url, headers={'If-Modified-Since': last_modified}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_stale_etag(self):
+        """Test the profile is sent again once it has been updated."""
+        etag = self.client.get(self.profile_url)['ETag']
+        self._update('Updated')
+
+        response = self.client.get(self.profile_url, headers={'If-None-Match': etag})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['first_name'], 'Updated')
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_if_match(self):
+        """Test an update with the current ETag saves and returns the new one."""
+        etag = self.client.get(self.profile_url)['ETag']
+
+        response = self._update('Updated', **{'If-Match': etag})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, 'Updated')
+        self.assertEqual(response['ETag'], profile_etag(self.user))
+
+    def test_if_match_stale(self):
+        """Test an update based on an outdated profile is refused."""
+        etag = self.client.get(self.profile_url)['ETag']
+        self._update('First')
+
+        response = self._update('Second', **{'If-Match': etag})
+
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, 'First')
+
+    def test_if_match_lost_race(self):
+        """Test a save landing after the precondition check still gets a 412."""
+        etag = self.client.get(self.profile_url)['ETag']
+        # The request authenticates with self.user as loaded before this save
+        User.objects.filter(pk=self.user.pk).update(
+            first_name='Other', updated_at=timezone.now()
+        )
+
+        response = self._update('Second', **{'If-Match': etag})
+
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertEqual(response.data, views.PROFILE_CHANGED_RESPONSE)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, 'Other')
+
+    def test_stateless_not_modified(self):
+        """Test claims-only authentication answers a 304 without any queries."""
+        self.client.force_authenticate(user=None)
+        patcher = patch.object(
+            views.profile.cls, 'authentication_classes', [ProfileClaimsAuthentication]
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        access = ProfileRefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        etag = self.client.get(self.profile_url)['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.profile_url, headers={'If-None-Match': etag})
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(etag, profile_etag(self.user))
@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from authentication.db_pool import pool_stats
+
+User = get_user_model()
+
+
+class PoolStatsTest(SimpleTestCase):
+    """Test cases for the connection pool statistics."""
+
+    def test_psycopg_pool(self):
+        """Test pool figures are reported with derived checkout latency."""
+        pool = SimpleNamespace(get_stats=lambda: {
+            'pool_min': 2, 'pool_max': 10, 'pool_size': 4, 'pool_available': 1,
+            'requests_waiting': 3, 'requests_num': 20, 'requests_wait_ms': 50,
+            'connections_num': 4, 'connections_ms': 80,
+        })
+        connection = SimpleNamespace(
+            vendor='postgresql', pool=pool,
+            settings_dict={
+                'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': True,
+                'OPTIONS': {'pool': {'max_lifetime': 3600}},
+            },
+        )
+
+        with patch('authentication.db_pool.connections', {'default': connection}):
+            stats = pool_stats()
+
+        self.assertEqual(stats['mode'], 'pool')
+        self.assertEqual(stats['in_use'], 3)
+        self.assertEqual(stats['waiting'], 3)
+        self.assertEqual(stats['avg_checkout_ms'], 2.5)
+        self.assertEqual(stats['avg_connect_ms'], 20.0)
+        self.assertEqual(stats['max_lifetime'], 3600)
+
+    def test_persistent_connections(self):
+        """Test persistent mode reports its maximum connection age."""
+        connection = SimpleNamespace(
+            vendor='postgresql',
+            settings_dict={'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': True, 'OPTIONS': {}},
+        )
+
+        with patch('authentication.db_pool.connections', {'default': connection}):
+            stats = pool_stats()
+
+        self.assertEqual(stats['mode'], 'persistent')
+        self.assertEqual(stats['conn_max_age'], 600)
+        self.assertNotIn('in_use', stats)
+
+
+class PoolStatsViewTest(APITestCase):
+    """Test cases for the pool statistics endpoint."""
+
+    def test_admin_only(self):
+        """Test the stats are only served to staff users."""
+        user = User.objects.create_user(
+            username='testuser', email='test@example.com', password='testpass123'
+        )
+        url = reverse('authentication:db_pool_stats')
+        self.client.force_authenticate(user)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+        user.is_staff = True
+        user.save()
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['vendor'], 'sqlite')
+        self.assertEqual(response.data['mode'], 'off')
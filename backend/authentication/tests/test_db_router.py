@@ -0,0 +1,208 @@
+from contextvars import Context
+from unittest.mock import Mock, patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, router as db_router
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from authentication.db_router import (
+    PrimaryReplicaRouter,
+    ReplicaPinningMiddleware,
+    is_pinned,
+    pin_to_primary,
+)
+from authentication.models import EmailVerificationToken, PasswordResetToken
+from authentication.tokens import ProfileRefreshToken
+
+User = get_user_model()
+
+
+class PrimaryReplicaRouterTest(SimpleTestCase):
+    """Test cases for routing reads to replicas."""
+
+    def setUp(self):
+        self.router = PrimaryReplicaRouter(replicas=['replica_1', 'replica_2'])
+
+    def test_reads_go_to_replicas(self):
+        """Test reads are spread over the replicas and writes go to the primary."""
+        reads = {Context().run(self.router.db_for_read, User) for _ in range(50)}
+
+        self.assertEqual(reads, {'replica_1', 'replica_2'})
+        self.assertEqual(Context().run(self.router.db_for_write, User), 'default')
+
+    def test_reads_after_write(self):
+        """Test a context that wrote reads from the primary."""
+        def write_then_read():
+            self.router.db_for_write(EmailVerificationToken)
+            return self.router.db_for_read(User)
+
+        self.assertEqual(Context().run(write_then_read), 'default')
+        self.assertIn(Context().run(self.router.db_for_read, User), ['replica_1', 'replica_2'])
+
+    def test_written_users_are_recorded(self):
+        """Test saving a user pins that user's id."""
+        def write_user():
+            self.router.db_for_write(User, instance=User(pk=42))
+            return is_pinned()
+
+        self.assertTrue(Context().run(write_user))
+
+    def test_without_replicas(self):
+        """Test everything uses the default database without replicas."""
+        router = PrimaryReplicaRouter(replicas=[])
+
+        self.assertEqual(router.db_for_read(User), 'default')
+
+    def test_middleware_unused(self):
+        """Test the middleware drops out when no replicas are configured."""
+        with self.assertRaises(MiddlewareNotUsed):
+            ReplicaPinningMiddleware(lambda request: HttpResponse())
+
+
+@override_settings(DB_REPLICA_ALIASES=['replica_1'], DB_REPLICA_PIN_SECONDS=5)
+class ReplicaPinningTest(APITestCase):
+    """Test cases for read-your-writes pinning across requests."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.token = ProfileRefreshToken.for_user(self.user).access_token
+
+    def pinned_at_start(self, token):
+        """Whether a request sent with token starts pinned to the primary"""
+        seen = []
+        middleware = ReplicaPinningMiddleware(
+            lambda request: seen.append(is_pinned()) or HttpResponse()
+        )
+        middleware(RequestFactory().get('/', headers={'Authorization': f'Bearer {token}'}))
+        return seen[0]
+
+    def test_user_pinned_after_update(self):
+        """Test a user reads from the primary for a while after writing."""
+        self.assertFalse(self.pinned_at_start(self.token))
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        response = self.client.put(reverse('authentication:update_profile'), {'first_name': 'A'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(self.pinned_at_start(self.token))
+
+        other = User.objects.create_user(username='other', email='other@example.com')
+        self.assertFalse(self.pinned_at_start(ProfileRefreshToken.for_user(other).access_token))
+
+    def test_reads_do_not_pin(self):
+        """Test requests that only read leave the user on the replicas."""
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.client.get(reverse('authentication:profile'))
+
+        self.assertFalse(self.pinned_at_start(self.token))
+
+    def test_pin_not_extended_by_reads(self):
+        """Test pinned requests that only read do not renew the pin."""
+        with patch('authentication.db_router.cache') as shared:
+            shared.get.return_value = True
+            middleware = ReplicaPinningMiddleware(lambda request: HttpResponse())
+            middleware(RequestFactory().get(
+                '/', headers={'Authorization': f'Bearer {self.token}'}
+            ))
+
+        shared.set_many.assert_not_called()
+
+    def test_anonymous_write_pins_user(self):
+        """Test an anonymous request that saves a user pins that user."""
+        verification_token = EmailVerificationToken.objects.create(user=self.user)
+
+        self.client.post(
+            reverse('authentication:verify_email'), {'token': verification_token.token}
+        )
+
+        self.assertTrue(self.pinned_at_start(self.token))
+
+    def test_pin_expires(self):
+        """Test the pin is stored for DB_REPLICA_PIN_SECONDS."""
+        with patch('authentication.db_router.cache') as shared:
+            shared.get.return_value = None
+            middleware = ReplicaPinningMiddleware(
+                lambda request: pin_to_primary() or HttpResponse()
+            )
+            middleware(RequestFactory().get(
+                '/', headers={'Authorization': f'Bearer {self.token}'}
+            ))
+
+        shared.set_many.assert_called_once_with(
+            {f'db:pin:{self.user.pk}': True}, timeout=5
+        )
+
+
+class PrimaryAuthReadsTest(APITestCase):
+    """Test cases for reads that decide authentication going to the primary."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='test@example.com', password='testpass123')
+        self.replica_reads = []
+        original = PrimaryReplicaRouter.db_for_read
+
+        def db_for_read(router, model, **hints):
+            # Replica reads are recorded, then served by the test database
+            alias = original(router, model, **hints)
+            if alias != DEFAULT_DB_ALIAS:
+                self.replica_reads.append(model._meta.label)
+            return DEFAULT_DB_ALIAS
+
+        for patcher in (
+            patch.object(db_router.routers[0], 'replicas', ['replica_1']),
+            patch.object(PrimaryReplicaRouter, 'db_for_read', db_for_read),
+            # The test case's transaction would keep every read on the primary
+            patch(
+                'authentication.db_router.connections',
+                {DEFAULT_DB_ALIAS: Mock(in_atomic_block=False)},
+            ),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _post(self, name, data):
+        # Each request in a fresh context, as the pinning of one request
+        # never carries over to the next
+        return Context().run(self.client.post, reverse(name), data)
+
+    def test_login_after_reset(self):
+        """Test login right after a password reset reads the user from the primary."""
+        token = PasswordResetToken.objects.create(user=self.user)
+        self._post('authentication:reset_password', {
+            'token': token.token, 'password': 'newpassword123',
+            'password_confirm': 'newpassword123',
+        })
+        self.replica_reads.clear()
+
+        response = self._post(
+            'authentication:login', {'email': 'test@example.com', 'password': 'newpassword123'}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('authentication.User', self.replica_reads)
+
+    def test_refresh_after_logout(self):
+        """Test a logged-out refresh token is checked against the primary."""
+        refresh = ProfileRefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self._post('authentication:logout', {'refresh_token': str(refresh)})
+        self.replica_reads.clear()
+
+        response = self._post('token_refresh', {'refresh': str(refresh)})
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertFalse(
+            [label for label in self.replica_reads if label.startswith('token_blacklist.')]
+        )
+        self.assertNotIn('authentication.User', self.replica_reads)
@@ -0,0 +1,106 @@
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from django.core.mail import EmailMessage
+from django.test import SimpleTestCase
+
+from authentication.delivery import SMTPConnectionPool, is_transient
+from authentication.management.smtp_stub import StubSMTPServer
+
+
+def _message(recipient='user@example.com'):
+    return EmailMessage('Subject', 'Body', 'noreply@vendorly.com', [recipient])
+
+
+class SMTPConnectionPoolTest(SimpleTestCase):
+    """Test cases for the pooled SMTP delivery engine."""
+
+    def _pool(self, server, **kwargs):
+        return SMTPConnectionPool(
+            backend='django.core.mail.backends.smtp.EmailBackend',
+            host='127.0.0.1',
+            port=server.port,
+            use_tls=False,
+            use_ssl=False,
+            username='',
+            password='',
+            **kwargs
+        )
+
+    def test_reuses_connection(self):
+        """Test many messages are sent over a single connection."""
+        with StubSMTPServer() as server:
+            pool = self._pool(server, size=1)
+            for _ in range(5):
+                pool.send(_message())
+            pool.close()
+
+        self.assertEqual(len(server.messages), 5)
+        self.assertEqual(server.connections, 1)
+        self.assertEqual(pool.connections_opened, 1)
+
+    def test_reconnects_on_disconnect(self):
+        """Test a dropped connection is replaced and the message retried."""
+        with StubSMTPServer(disconnect_after=2) as server:
+            pool = self._pool(server, size=1)
+            for _ in range(5):
+                pool.send(_message())
+            pool.close()
+
+        self.assertEqual(len(server.messages), 5)
+        self.assertEqual(server.connections, 3)
+
+    def test_concurrent_sends(self):
+        """Test concurrent senders never open more connections than the pool size."""
+        with StubSMTPServer(handshake_delay=0.01) as server:
+            pool = self._pool(server, size=3, per_domain_limit=3)
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                list(executor.map(
+                    lambda i: pool.send(_message(f'user{i}@example.com')), range(40)
+                ))
+            pool.close()
+
+        self.assertEqual(len(server.messages), 40)
+        self.assertLessEqual(server.connections, 3)
+
+    def test_per_domain_limit(self):
+        """Test concurrency towards one recipient domain is capped."""
+        active = {'now': 0, 'peak': 0}
+        lock = threading.Lock()
+
+        class SlowConnection:
+            def open(self):
+                return True
+
+            def close(self):
+                pass
+
+            def send_messages(self, messages):
+                with lock:
+                    active['now'] += 1
+                    active['peak'] = max(active['peak'], active['now'])
+                time.sleep(0.01)
+                with lock:
+                    active['now'] -= 1
+                return len(messages)
+
+        with patch(
+            'authentication.delivery.get_connection',
+            side_effect=lambda **kwargs: SlowConnection()
+        ):
+            pool = SMTPConnectionPool(size=8, per_domain_limit=2)
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                list(executor.map(lambda i: pool.send(_message()), range(16)))
+
+        self.assertEqual(active['peak'], 2)
+
+    def test_transient_classification(self):
+        """Test which SMTP failures are retried."""
+        self.assertTrue(is_transient(smtplib.SMTPServerDisconnected()))
+        self.assertTrue(is_transient(smtplib.SMTPResponseException(421, b'busy')))
+        self.assertTrue(is_transient(ConnectionRefusedError()))
+        self.assertFalse(is_transient(smtplib.SMTPResponseException(550, b'no such user')))
+        self.assertFalse(is_transient(smtplib.SMTPRecipientsRefused({})))
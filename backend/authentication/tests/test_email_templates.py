@@ -0,0 +1,50 @@
+from unittest.mock import patch
+
+from django.template.loader import render_to_string
+from django.test import SimpleTestCase, override_settings
+from django.utils.html import strip_tags
+
+from authentication.email_templates import CompiledEmailTemplate
+from authentication.utils import build_password_reset_email, build_verification_email
+
+
+class CompiledEmailTemplateTest(SimpleTestCase):
+    """Test cases for precompiled email template rendering."""
+
+    def test_matches_django_rendering(self):
+        """Test output is identical to render_to_string + strip_tags."""
+        context = {
+            'user_name': 'O\'Brien & <Sons>',
+            'verification_url': 'http://localhost:3000/auth/verify-email?token=a&b=1',
+        }
+        template = CompiledEmailTemplate(
+            'authentication/verification_email.html', ('user_name', 'verification_url')
+        )
+
+        html, text = template.render(context)
+
+        expected_html = render_to_string('authentication/verification_email.html', context)
+        self.assertEqual(html, expected_html)
+        self.assertEqual(text, strip_tags(expected_html))
+
+    def test_compiles_once(self):
+        """Test the Django template is rendered only at compile time."""
+        template = CompiledEmailTemplate(
+            'authentication/password_reset_email.html', ('user_name', 'reset_url')
+        )
+        with patch('authentication.email_templates.render_to_string') as mock_render:
+            for i in range(3):
+                template.render({'user_name': f'User {i}', 'reset_url': 'http://x/'})
+        mock_render.assert_not_called()
+
+    @override_settings(FRONTEND_URL='https://app.vendorly.example')
+    def test_links_use_frontend_url(self):
+        """Test email links are built from the FRONTEND_URL setting."""
+        verification = build_verification_email('test@example.com', 'abc', 'Test')
+        reset = build_password_reset_email('test@example.com', 'def', 'Test')
+
+        self.assertIn('https://app.vendorly.example/auth/verify-email?token=abc', verification.body)
+        self.assertIn(
+            'https://app.vendorly.example/auth/reset-password?token=def',
+            reset.alternatives[0][0]
+        )
@@ -0,0 +1,104 @@
+import csv
+import gzip
+import io
+import json
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.test import AsyncRequestFactory, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, force_authenticate
+
+from authentication import views
+
+User = get_user_model()
+
+
+@override_settings(USER_EXPORT_CHUNK_SIZE=2)
+class ExportUsersTest(APITestCase):
+    """Test cases for the streaming user export endpoint."""
+
+    def setUp(self):
+        self.staff = User.objects.create_user(
+            email='staff@example.com', password='testpass123', is_staff=True
+        )
+        for i in range(4):
+            User.objects.create_user(email=f'user{i}@example.com', password='testpass123')
+        self.url = reverse('authentication:export_users')
+
+    def _export(self, **params):
+        self.client.force_authenticate(self.staff)
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_staff_only(self):
+        """Test the export is refused to users who are not staff."""
+        self.client.force_authenticate(User.objects.get(email='user0@example.com'))
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_csv(self):
+        """Test every user is exported once, in primary key order, without passwords."""
+        response, content = self._export()
+
+        rows = list(csv.DictReader(io.StringIO(content.decode())))
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('filename="users.csv"', response['Content-Disposition'])
+        self.assertEqual(
+            [row['email'] for row in rows],
+            ['staff@example.com'] + [f'user{i}@example.com' for i in range(4)]
+        )
+        self.assertNotIn('password', rows[0])
+        self.assertEqual(rows[0]['is_staff'], 'True')
+
+    def test_csv_formulas(self):
+        """Test names a spreadsheet would run as formulas are quoted in CSV only."""
+        User.objects.filter(email='user0@example.com').update(
+            first_name='=HYPERLINK("http://example.com")', last_name='-2'
+        )
+
+        _, content = self._export()
+
+        row = list(csv.DictReader(io.StringIO(content.decode())))[1]
+        self.assertEqual(row['first_name'], '\'=HYPERLINK("http://example.com")')
+        self.assertEqual(row['last_name'], "'-2")
+        _, content = self._export(type='ndjson')
+        self.assertEqual(json.loads(content.splitlines()[1])['last_name'], '-2')
+
+    def test_ndjson_gzip(self):
+        """Test NDJSON output compressed with gzip."""
+        response, content = self._export(type='ndjson', gzip='1')
+
+        lines = gzip.decompress(content).decode().splitlines()
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('filename="users.ndjson.gz"', response['Content-Disposition'])
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(json.loads(lines[1])['email'], 'user0@example.com')
+
+    def test_unknown_type(self):
+        """Test an unknown type is rejected."""
+        self.client.force_authenticate(self.staff)
+
+        response = self.client.get(self.url, {'type': 'xml'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_asgi_streams_async(self):
+        """Test ASGI requests get an async iterator Django does not buffer."""
+        request = AsyncRequestFactory().get(self.url, {'type': 'ndjson'})
+        force_authenticate(request, self.staff)
+
+        response = views.export_users(request)
+
+        async def consume():
+            return [chunk async for chunk in response]
+
+        self.assertTrue(response.is_async)
+        chunks = async_to_sync(consume)()
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(b''.join(chunks).count(b'\n'), 5)
@@ -0,0 +1,92 @@
+import threading
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from authentication.hashing import HashingUnavailable, PasswordHashingService
+
+User = get_user_model()
+
+
+class PasswordHashingServiceTest(SimpleTestCase):
+    """Test cases for the password hashing service."""
+
+    def test_hash_and_verify(self):
+        """Test hashes made on the pool verify like regular ones."""
+        service = PasswordHashingService(workers=2, max_pending=4, use_processes=False)
+        self.addCleanup(service.shutdown)
+
+        encoded = service.make_password('secret123')
+
+        self.assertTrue(check_password('secret123', encoded))
+        self.assertEqual(service.verify_password('secret123', encoded), (True, False))
+        self.assertEqual(service.verify_password('wrong', encoded), (False, False))
+        self.assertEqual(service.stats()['completed'], 3)
+
+    def test_process_pool(self):
+        """Test hashing in spawned worker processes."""
+        service = PasswordHashingService(workers=1, max_pending=4, use_processes=True)
+        self.addCleanup(service.shutdown)
+
+        encoded = service.make_password('secret123')
+
+        self.assertTrue(check_password('secret123', encoded))
+
+    def test_rejects_when_full(self):
+        """Test new work is refused once max_pending hashes are in flight."""
+        service = PasswordHashingService(workers=1, max_pending=1, use_processes=False)
+        self.addCleanup(service.shutdown)
+        release = threading.Event()
+        service.submit(release.wait)
+
+        with self.assertRaises(HashingUnavailable):
+            service.make_password('secret123')
+        release.set()
+
+        self.assertEqual(service.stats()['rejected'], 1)
+
+
+class HashingUnavailableViewTest(APITestCase):
+    """Test cases for requests arriving while the hashing pool is full."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+
+    def test_login_returns_503(self):
+        """Test login answers 503 instead of queueing behind a full pool."""
+        full = PasswordHashingService(workers=1, max_pending=0, use_processes=False)
+
+        with patch('authentication.models.hashing_service', full):
+            response = self.client.post(reverse('authentication:login'), {
+                'email': 'test@example.com',
+                'password': 'testpass123'
+            })
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response.data['detail'].code, 'hashing_unavailable')
+
+
+class CalibratePasswordHashersTest(TestCase):
+    """Test cases for the calibrate_password_hashers command."""
+
+    def test_recommends_iterations(self):
+        """Test a PBKDF2 iteration count is recommended for the budget."""
+        out = StringIO()
+
+        call_command(
+            'calibrate_password_hashers', hashers='pbkdf2', samples=1,
+            target_ms=50, stdout=out
+        )
+
+        self.assertRegex(out.getvalue(), r'pbkdf2 .* iterations=\d+')
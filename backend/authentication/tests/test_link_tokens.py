@@ -0,0 +1,105 @@
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from authentication import link_tokens
+from authentication.models import EmailOutbox, EmailVerificationToken, PasswordResetToken
+from authentication.utils import build_verification_email
+
+User = get_user_model()
+
+
+@override_settings(SIGNED_AUTH_TOKENS=True)
+class SignedLinkTokensTest(APITestCase):
+    """Test cases for verification and reset links carrying signed tokens."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='test@example.com', password='testpass123')
+        self.verify_url = reverse('authentication:verify_email')
+        self.reset_url = reverse('authentication:reset_password')
+
+    def _reset(self, token, password='newpassword123'):
+        return self.client.post(self.reset_url, {
+            'token': token, 'password': password, 'password_confirm': password
+        })
+
+    def test_verify_email(self):
+        """Test signup mails a signed token that verifies once, with no token row."""
+        self.client.post(reverse('authentication:register'), {
+            'email': 'new@example.com',
+            'password': 'newpass123',
+            'password_confirm': 'newpass123',
+        })
+        token = EmailOutbox.objects.get().token
+
+        response = self.client.post(self.verify_url, {'token': token})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(User.objects.get(email='new@example.com').is_email_verified)
+        self.assertFalse(EmailVerificationToken.objects.exists())
+        response = self.client.post(self.verify_url, {'token': token})
+        self.assertEqual(response.data['message'], 'Email already verified')
+
+    def test_verify_tampered(self):
+        """Test a token with an altered signature is rejected."""
+        token = link_tokens.make_signed_token(self.user, link_tokens.VERIFY_EMAIL)
+        forged = token[:-1] + ('A' if token[-1] != 'A' else 'B')
+
+        response = self.client.post(self.verify_url, {'token': forged})
+
+        self.assertEqual(response.data['error'], 'Invalid verification token')
+
+    def test_verify_after_email_change(self):
+        """Test a token stops working when a fingerprinted field changes."""
+        token = link_tokens.make_signed_token(self.user, link_tokens.VERIFY_EMAIL)
+        self.user.email = 'changed@example.com'
+        self.user.save()
+
+        response = self.client.post(self.verify_url, {'token': token})
+
+        self.assertEqual(response.data['error'], 'Invalid verification token')
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_email_verified)
+
+    def test_verify_expired(self):
+        """Test a token older than the verification lifetime has expired."""
+        token = link_tokens.make_signed_token(self.user, link_tokens.VERIFY_EMAIL)
+        later = time.time() + EmailVerificationToken.LIFETIME.total_seconds() + 60
+
+        with patch('django.core.signing.time.time', return_value=later):
+            response = self.client.post(self.verify_url, {'token': token})
+
+        self.assertEqual(response.data['error'], 'Verification token has expired')
+
+    def test_reset_once(self):
+        """Test a reset token stops working once the password has changed."""
+        self.client.post(reverse('authentication:forgot_password'), {'email': self.user.email})
+        token = EmailOutbox.objects.get().token
+
+        response = self._reset(token)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(PasswordResetToken.objects.exists())
+        response = self._reset(token, 'otherpassword123')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('newpassword123'))
+
+    def test_reset_purpose(self):
+        """Test a verification token cannot reset the password."""
+        token = link_tokens.make_signed_token(self.user, link_tokens.VERIFY_EMAIL)
+
+        response = self._reset(token)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_link_quotes_token(self):
+        """Test the token is URL-encoded into the link."""
+        message = build_verification_email('test@example.com', 'a:b/c', 'Test')
+
+        self.assertIn('verify-email?token=a%3Ab%2Fc', message.body)
@@ -0,0 +1,122 @@
+import json
+import logging
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from authentication.log_queue import JsonFormatter, QueuedFileHandler, SampledInfoFilter
+
+
+class GatedHandler(QueuedFileHandler):
+    """Writer that waits for the gate, so tests can fill the queue"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.gate = threading.Event()
+
+    def _write(self, stream, batch):
+        self.gate.wait(5)
+        super()._write(stream, batch)
+
+
+def make_record(msg, *args, level=logging.INFO, name='authentication.tests'):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+class QueuedFileHandlerTest(SimpleTestCase):
+    """Test cases for the queued file handler."""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = Path(directory, 'test.log')
+
+    def _handler(self, handler_class=QueuedFileHandler, **kwargs):
+        handler = handler_class(self.path, **kwargs)
+        handler.setFormatter(logging.Formatter('{levelname} {message}', style='{'))
+        self.addCleanup(handler.close)
+        return handler
+
+    def test_writes_in_order(self):
+        """Test records reach the file in order, with arguments merged at log time."""
+        handler = self._handler()
+        values = ['first']
+        handler.handle(make_record('value %s', values))
+        values.append('changed')
+        handler.handle(make_record('second', level=logging.WARNING))
+
+        handler.flush()
+
+        self.assertEqual(
+            self.path.read_text(encoding='utf-8'),
+            "INFO value ['first']\nWARNING second\n"
+        )
+
+    def test_drops_when_full(self):
+        """Test records are dropped, counted and noted instead of blocking."""
+        handler = self._handler(GatedHandler, maxsize=1)
+        handler.handle(make_record('taken by the writer'))
+        deadline = time.monotonic() + 5
+        while handler.queue.qsize() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        handler.handle(make_record('queued'))
+
+        handler.handle(make_record('dropped'))
+
+        self.assertEqual(handler.dropped, 1)
+        handler.gate.set()
+        handler.flush()
+        lines = self.path.read_text(encoding='utf-8').splitlines()
+        self.assertEqual(lines, [
+            'WARNING Dropped 1 log records, the log queue was full',
+            'INFO taken by the writer',
+            'INFO queued',
+        ])
+
+
+class JsonFormatterTest(SimpleTestCase):
+    """Test cases for the JSON log formatter."""
+
+    def test_format(self):
+        """Test a record becomes one JSON object, exception included."""
+        try:
+            raise ValueError('bad value')
+        except ValueError as exc:
+            record = make_record('failed for %s', 'user@example.com', level=logging.ERROR)
+            record.exc_info = (type(exc), exc, exc.__traceback__)
+
+        entry = json.loads(JsonFormatter().format(record))
+
+        self.assertEqual(entry['level'], 'ERROR')
+        self.assertEqual(entry['logger'], 'authentication.tests')
+        self.assertEqual(entry['message'], 'failed for user@example.com')
+        self.assertIn('ValueError: bad value', entry['exc_info'])
+        self.assertIn('+00:00', entry['time'])
+
+
+class SampledInfoFilterTest(SimpleTestCase):
+    """Test cases for the INFO rate limit and sampling filter."""
+
+    def test_rate_limit_per_message(self):
+        """Test each message is capped separately and warnings always pass."""
+        log_filter = SampledInfoFilter(per_second=2)
+        warning = make_record('email sent to %s', 5, level=logging.WARNING)
+
+        with patch('authentication.log_queue.time.monotonic', return_value=100.0):
+            passed = [log_filter.filter(make_record('email sent to %s', i)) for i in range(4)]
+            self.assertTrue(log_filter.filter(make_record('another message')))
+            self.assertTrue(log_filter.filter(warning))
+
+        self.assertEqual(passed, [True, True, False, False])
+
+    def test_sampling(self):
+        """Test a zero sample rate drops every INFO record."""
+        log_filter = SampledInfoFilter(sample_rate=0)
+
+        self.assertFalse(log_filter.filter(make_record('email sent')))
+        self.assertTrue(log_filter.filter(make_record('email failed', level=logging.ERROR)))
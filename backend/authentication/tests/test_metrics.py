@@ -0,0 +1,151 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from authentication.metrics import MetricsRegistry
+
+User = get_user_model()
+
+
+class MetricsRegistryTest(SimpleTestCase):
+    """Test cases for the in-process metrics registry."""
+
+    def test_histogram_rendering(self):
+        """Test buckets are rendered cumulatively with sum and count."""
+        registry = MetricsRegistry(directory='')
+        histogram = registry.histogram('demo_seconds', 'Demo', ('view',), buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.5, 3.0):
+            histogram.labels('login').observe(value)
+
+        text = registry.render()
+
+        self.assertIn('# TYPE demo_seconds histogram', text)
+        self.assertIn('demo_seconds_bucket{view="login",le="0.1"} 1', text)
+        self.assertIn('demo_seconds_bucket{view="login",le="1"} 3', text)
+        self.assertIn('demo_seconds_bucket{view="login",le="+Inf"} 4', text)
+        self.assertIn('demo_seconds_sum{view="login"} 4.05', text)
+        self.assertIn('demo_seconds_count{view="login"} 4', text)
+
+    def test_threads_are_added_up(self):
+        """Test observations from every thread are collected."""
+        registry = MetricsRegistry(directory='')
+        counter = registry.counter('demo_total', 'Demo')
+
+        def work():
+            for _ in range(1000):
+                counter.inc()
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertIn('demo_total 4000', registry.render())
+
+    def test_workers_are_added_up(self):
+        """Test snapshots written by other workers are merged in."""
+        with tempfile.TemporaryDirectory() as directory:
+            other = MetricsRegistry(directory='')
+            other.counter('demo_total', 'Demo', ('view',)).labels('login').inc(2)
+            path = Path(directory, f'{os.getppid()}.json')
+            path.write_text(json.dumps(other.snapshot()), encoding='utf-8')
+
+            registry = MetricsRegistry(directory=directory)
+            registry.counter('demo_total', 'Demo', ('view',)).labels('login').inc(3)
+
+            self.assertIn('demo_total{view="login"} 5', registry.render())
+
+    def test_finished_threads_folded(self):
+        """Test a thread's observations outlive it without keeping its shard."""
+        registry = MetricsRegistry(directory='')
+        counter = registry.counter('demo_total', 'Demo')
+
+        for _ in range(20):
+            thread = threading.Thread(target=counter.inc)
+            thread.start()
+            thread.join()
+
+        self.assertEqual(counter.labels()._shards._live, {})  # pylint: disable=protected-access
+        self.assertIn('demo_total 20', registry.render())
+
+    def test_dead_workers_pruned(self):
+        """Test snapshots of workers that have exited are deleted."""
+        with subprocess.Popen([sys.executable, '-c', '']) as process:
+            process.wait()
+        with tempfile.TemporaryDirectory() as directory:
+            other = MetricsRegistry(directory='')
+            other.counter('demo_total', 'Demo').inc(2)
+            path = Path(directory, f'{process.pid}.json')
+            path.write_text(json.dumps(other.snapshot()), encoding='utf-8')
+
+            registry = MetricsRegistry(directory=directory)
+            registry.counter('demo_total', 'Demo').inc(3)
+
+            self.assertIn('demo_total 3', registry.render())
+            self.assertFalse(path.exists())
+
+    def test_duplicate_name(self):
+        """Test a metric name can only be registered once."""
+        registry = MetricsRegistry(directory='')
+        registry.counter('demo_total', 'Demo')
+
+        with self.assertRaises(ValueError):
+            registry.counter('demo_total', 'Demo')
+
+
+class MetricsEndpointTest(APITestCase):
+    """Test cases for the metrics endpoint."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.url = reverse('metrics')
+
+    def test_staff_only(self):
+        """Test the metrics are not public."""
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_scrape_token(self):
+        """Test scrapers get in with the metrics token."""
+        response = self.client.get(self.url, headers={'X-Metrics-Token': 'wrong'})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        response = self.client.get(self.url, headers={'X-Metrics-Token': 'scrape-secret'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+
+    def test_auth_stages_recorded(self):
+        """Test a login shows up in the view, hashing and signing metrics."""
+        self.client.post(
+            reverse('authentication:login'),
+            {'email': 'test@example.com', 'password': 'testpass123'}
+        )
+        self.user.is_staff = True
+        self.user.save()
+        self.client.force_authenticate(self.user)
+
+        text = self.client.get(self.url).content.decode()
+
+        self.assertIn('auth_request_seconds_count{view="authentication:login"}', text)
+        self.assertIn('auth_responses_total{view="authentication:login",status="200"}', text)
+        self.assertIn('auth_password_hashing_seconds_count{operation="verify"}', text)
+        self.assertIn('auth_jwt_signing_seconds_count{token_type="access"}', text)
+        self.assertIn('auth_db_seconds_count{view="authentication:login"}', text)
@@ -1,11 +1,17 @@
 import uuid
 from datetime import timedelta
+from unittest.mock import patch
 
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 
-from authentication.models import EmailVerificationToken, PasswordResetToken
+from authentication.hashing import hashing_service
+from authentication.models import EmailVerificationToken, PasswordResetToken, UsernameCounter
 
 User = get_user_model()
 
@@ -66,6 +72,61 @@ class UserModelTest(TestCase):
         self.assertEqual(user1.username, 'test1')
         self.assertNotEqual(user1.username, user2.username)
 
+    def test_username_from_email(self):
+        """Test usernames are allocated from the email prefix with suffixes."""
+        users = [
+            User.objects.create_user(email=f'info@domain{i}.com', password='testpass123')
+            for i in range(3)
+        ]
+
+        self.assertEqual([user.username for user in users], ['info', 'info1', 'info2'])
+
+    def test_username_seed(self):
+        """Test a new counter starts after the highest suffix of its prefix."""
+        for username in ('j', 'john', 'jane', 'jim'):
+            User.objects.create_user(username=username, email=f'{username}@a.com')
+
+        self.assertEqual(User.objects.create_user(email='j@b.com').username, 'j1')
+        UsernameCounter.objects.all().delete()
+        User.objects.create_user(username='j7', email='j7@a.com')
+        self.assertEqual(User.objects.create_user(email='j@c.com').username, 'j8')
+
+    def test_username_seed_overflow(self):
+        """Test suffixes too long for a bigint are left out of the seed."""
+        User.objects.create_user(username='j', email='j@a.com')
+        User.objects.create_user(username='j3', email='j3@a.com')
+        User.objects.create_user(username=f'j{"9" * 25}', email='j9@a.com')
+
+        self.assertEqual(User.objects.create_user(email='j@b.com').username, 'j4')
+
+    def test_username_race_retry(self):
+        """Test allocation retries when a suffix was taken by another signup."""
+        User.objects.create_user(email='info@a.com')
+        User.objects.create_user(email='info@b.com')
+        # Simulate a concurrent signup claiming the next suffix first
+        User.objects.create_user(username='info2', email='other@c.com')
+
+        user = User.objects.create_user(email='info@d.com')
+
+        self.assertEqual(user.username, 'info3')
+
+    def test_username_constant_queries(self):
+        """Test signups sharing a prefix use a bounded number of queries."""
+        query_counts = []
+        for i in range(10000):
+            if i % 500:
+                User.objects.create_user(email=f'info@domain{i}.com')
+                continue
+            with CaptureQueriesContext(connection) as queries:
+                User.objects.create_user(email=f'info@domain{i}.com')
+            query_counts.append(len(queries))
+
+        # Savepoints included; the first counter-creating signup is the costliest
+        self.assertLessEqual(max(query_counts[2:]), query_counts[1])
+        self.assertLessEqual(query_counts[1], 13)
+        self.assertTrue(User.objects.filter(username='info9999').exists())
+        self.assertEqual(UsernameCounter.objects.get(prefix='info').last_suffix, 9999)
+
     def test_user_email_unique(self):
         """Test that user email is unique."""
         User.objects.create_user(
@@ -134,11 +195,54 @@ class EmailVerificationTokenModelTest(TestCase):
 
     def test_token_uniqueness(self):
         """Test that each token is unique."""
+        other = User.objects.create_user(email='other@example.com', password=None)
         token1 = EmailVerificationToken.objects.create(user=self.user)
-        token2 = EmailVerificationToken.objects.create(user=self.user)
+        token2 = EmailVerificationToken.objects.create(user=other)
 
         self.assertNotEqual(token1.token, token2.token)
 
+    def test_token_unique_constraint(self):
+        """Test that the database rejects a duplicate token value."""
+        other = User.objects.create_user(email='other@example.com', password=None)
+        token = EmailVerificationToken.objects.create(user=self.user)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            EmailVerificationToken.objects.create(user=other, token=token.token)
+
+    def test_one_token_per_user(self):
+        """Test that the database rejects a second token for a user."""
+        EmailVerificationToken.objects.create(user=self.user)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            EmailVerificationToken.objects.create(user=self.user)
+
+    def test_consume_rolled_back(self):
+        """Test a rolled-back verification is not remembered as consumed."""
+        token = EmailVerificationToken.objects.create(user=self.user).token
+
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            EmailVerificationToken.consume(token)
+            raise RuntimeError
+
+        self.assertIsNone(cache.get(f'auth:verified-token:{token}'))
+        self.assertEqual(EmailVerificationToken.consume(token), EmailVerificationToken.VERIFIED)
+
+    @patch('authentication.models.can_return_rows', return_value=False)
+    def test_consume_no_returning(self, _can_return_rows):
+        """Test tokens are consumed once without DELETE ... RETURNING."""
+        token = EmailVerificationToken.objects.create(user=self.user).token
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(
+                EmailVerificationToken.consume(token), EmailVerificationToken.VERIFIED
+            )
+
+        self.assertEqual(
+            EmailVerificationToken.consume(token), EmailVerificationToken.ALREADY_VERIFIED
+        )
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_email_verified)
+
 
 class PasswordResetTokenModelTest(TestCase):
     """Test cases for PasswordResetToken model."""
@@ -197,7 +301,46 @@ class PasswordResetTokenModelTest(TestCase):
 
     def test_token_uniqueness(self):
         """Test that each token is unique."""
+        other = User.objects.create_user(email='other@example.com', password=None)
         token1 = PasswordResetToken.objects.create(user=self.user)
-        token2 = PasswordResetToken.objects.create(user=self.user)
+        token2 = PasswordResetToken.objects.create(user=other)
 
         self.assertNotEqual(token1.token, token2.token)
+
+    def test_token_unique_constraint(self):
+        """Test that the database rejects a duplicate token value."""
+        other = User.objects.create_user(email='other@example.com', password=None)
+        token = PasswordResetToken.objects.create(user=self.user)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            PasswordResetToken.objects.create(user=other, token=token.token)
+
+    def test_one_token_per_user(self):
+        """Test that the database rejects a second token for a user."""
+        PasswordResetToken.objects.create(user=self.user)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            PasswordResetToken.objects.create(user=self.user)
+
+    def test_hash_before_claim(self):
+        """Test the password is hashed before the token row is claimed."""
+        token = PasswordResetToken.objects.create(user=self.user).token
+        make_password = hashing_service.make_password
+
+        def hash_unclaimed(raw_password):
+            self.assertFalse(PasswordResetToken.objects.get().is_used)
+            return make_password(raw_password)
+
+        with patch.object(hashing_service, 'make_password', side_effect=hash_unclaimed):
+            result = PasswordResetToken.set_password(token, 'newpassword123')
+
+        self.assertEqual(result, PasswordResetToken.RESET)
+        self.assertTrue(PasswordResetToken.objects.get().is_used)
+
+    @patch('authentication.models.can_return_rows', return_value=False)
+    def test_claim_no_returning(self, _can_return_rows):
+        """Test tokens are claimed once without UPDATE ... RETURNING."""
+        token = PasswordResetToken.objects.create(user=self.user).token
+
+        self.assertEqual(PasswordResetToken.claim(token), self.user.pk)
+        self.assertIsNone(PasswordResetToken.claim(token))
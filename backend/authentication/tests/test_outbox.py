@@ -0,0 +1,120 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import Mock, patch
+
+from django.core import mail
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test import TestCase
+from django.utils import timezone
+
+from authentication.models import EmailOutbox
+from authentication.outbox import (
+    BUILDERS,
+    CLAIM_LEASE,
+    claim_batch,
+    deliver,
+    queue_password_reset_email,
+    queue_verification_email,
+    retry_delay,
+)
+
+
+class EmailOutboxTest(TestCase):
+    """Test cases for the email outbox and its delivery helpers."""
+
+    def setUp(self):
+        self.broken_pool = Mock()
+        self.broken_pool.send.side_effect = OSError('relay unavailable')
+
+    def test_queue_creates_pending(self):
+        """Test queueing stores a pending message without sending mail."""
+        message = queue_verification_email('test@example.com', 'token-123', 'Test')
+
+        self.assertEqual(message.status, EmailOutbox.STATUS_PENDING)
+        self.assertEqual(message.attempts, 0)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_claim_leases_messages(self):
+        """Test claimed messages are hidden from other workers until the lease ends."""
+        queue_verification_email('test@example.com', 'token-123', 'Test')
+
+        claimed = claim_batch(10)
+
+        self.assertEqual(len(claimed), 1)
+        self.assertEqual(claimed[0].attempts, 1)
+        self.assertEqual(claim_batch(10), [])
+
+        message = EmailOutbox.objects.get()
+        self.assertEqual(message.attempts, 1)
+        self.assertGreater(message.available_at, timezone.now() + CLAIM_LEASE / 2)
+
+    def test_claim_skips_future(self):
+        """Test messages scheduled for a later retry are not claimed."""
+        message = queue_verification_email('test@example.com', 'token-123', 'Test')
+        message.available_at = timezone.now() + timedelta(minutes=1)
+        message.save()
+
+        self.assertEqual(claim_batch(10), [])
+
+    def test_deliver_success(self):
+        """Test a successful delivery sends the email and marks the row sent."""
+        queue_password_reset_email('test@example.com', 'token-123', 'Test')
+        message = claim_batch(1)[0]
+
+        self.assertTrue(deliver(message, max_attempts=5))
+
+        message.refresh_from_db()
+        self.assertEqual(message.status, EmailOutbox.STATUS_SENT)
+        self.assertIsNotNone(message.sent_at)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn('token-123', mail.outbox[0].body)
+
+    def test_deliver_failure_backs_off(self):
+        """Test a failed delivery is rescheduled with backoff."""
+        queue_verification_email('test@example.com', 'token-123', 'Test')
+        message = claim_batch(1)[0]
+
+        self.assertFalse(deliver(message, max_attempts=5, pool=self.broken_pool))
+
+        message.refresh_from_db()
+        self.assertEqual(message.status, EmailOutbox.STATUS_PENDING)
+        self.assertGreater(message.available_at, timezone.now())
+
+    def test_deliver_gives_up(self):
+        """Test a message is marked failed after the last attempt."""
+        queue_verification_email('test@example.com', 'token-123', 'Test')
+        message = claim_batch(1)[0]
+
+        deliver(message, max_attempts=1, pool=self.broken_pool)
+
+        message.refresh_from_db()
+        self.assertEqual(message.status, EmailOutbox.STATUS_FAILED)
+
+    def test_deliver_build_failure(self):
+        """Test a message that cannot be built counts as a failed attempt."""
+        queue_verification_email('test@example.com', 'token-123', 'Test')
+        message = claim_batch(1)[0]
+
+        with patch.dict(BUILDERS, {EmailOutbox.KIND_VERIFICATION: Mock(side_effect=KeyError)}):
+            self.assertFalse(deliver(message, max_attempts=1))
+
+        message.refresh_from_db()
+        self.assertEqual(message.status, EmailOutbox.STATUS_FAILED)
+
+    def test_worker_survives_errors(self):
+        """Test a delivery worker keeps going after a database error."""
+        claim = Mock(side_effect=[OperationalError('connection lost'), []])
+        out = StringIO()
+        command = 'authentication.management.commands.process_email_outbox'
+
+        with patch(f'{command}.claim_batch', claim), self.assertLogs(command, 'ERROR'):
+            call_command('process_email_outbox', once=True, poll_interval=0.01, stdout=out)
+
+        self.assertEqual(claim.call_count, 2)
+        self.assertIn('finished', out.getvalue())
+
+    def test_retry_delay_is_capped(self):
+        """Test backoff grows exponentially up to the cap."""
+        self.assertLess(retry_delay(1), retry_delay(2))
+        self.assertEqual(retry_delay(50), retry_delay(60))
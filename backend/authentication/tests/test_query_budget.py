@@ -0,0 +1,74 @@
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from authentication.query_budget import fingerprint, record_queries
+from authentication.tokens import ProfileRefreshToken
+
+User = get_user_model()
+
+
+class FingerprintTest(SimpleTestCase):
+    """Test cases for statement fingerprints."""
+
+    def test_same_shape(self):
+        """Test IN lists of any length and whitespace share a fingerprint."""
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s)'),
+            fingerprint('SELECT *  FROM t\nWHERE id IN (%s, %s, %s, %s)'),
+        )
+        self.assertNotEqual(
+            fingerprint('SELECT * FROM t WHERE id = %s'),
+            fingerprint('SELECT * FROM u WHERE id = %s'),
+        )
+
+
+class QueryBudgetMiddlewareTest(APITestCase):
+    """Test cases for per-endpoint query instrumentation."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        token = ProfileRefreshToken.for_user(self.user).access_token
+        self.headers = {'Authorization': f'Bearer {token}'}
+        self.profile_url = reverse('authentication:profile')
+
+    def test_recorders_nest(self):
+        """Test queries count towards every enclosing recorder."""
+        with record_queries() as outer:
+            User.objects.count()
+            with record_queries() as inner:
+                User.objects.count()
+
+        self.assertEqual((outer.count, inner.count), (2, 1))
+        self.assertEqual(list(outer.duplicates.values()), [2])
+
+    @override_settings(DEBUG=True)
+    def test_debug_headers(self):
+        """Test debug responses carry the query figures."""
+        response = self.client.get(self.profile_url, headers=self.headers)
+
+        self.assertEqual(response['X-Query-Count'], '1')
+        self.assertIn('X-Query-Time-Ms', response)
+        self.assertEqual(response['X-Query-Duplicates'], '')
+
+    @override_settings(DEBUG=True)
+    def test_async_requests(self):
+        """Test queries run in sync_to_async threads are recorded."""
+        response = async_to_sync(self.async_client.get)(self.profile_url, headers=self.headers)
+
+        self.assertEqual(response['X-Query-Count'], '1')
+
+    @override_settings(QUERY_BUDGETS={'authentication:profile': 0})
+    def test_over_budget_logged(self):
+        """Test requests over their budget are logged as warnings."""
+        with self.assertLogs('authentication.query_budget', 'WARNING') as logs:
+            response = self.client.get(self.profile_url, headers=self.headers)
+
+        self.assertNotIn('X-Query-Count', response)
+        self.assertIn('authentication:profile: 1 of 0 budgeted', logs.output[0])
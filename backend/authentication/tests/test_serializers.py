@@ -52,6 +52,18 @@ class UserRegistrationSerializerTest(TestCase):
         self.assertEqual(user.first_name, self.valid_data['first_name'])
         self.assertEqual(user.last_name, self.valid_data['last_name'])
 
+    def test_shared_email_prefix(self):
+        """Test registrations sharing an email prefix get distinct usernames."""
+        usernames = []
+        for domain in ('example.com', 'example.org'):
+            data = self.valid_data.copy()
+            data['email'] = f'test@{domain}'
+            serializer = UserRegistrationSerializer(data=data)
+            self.assertTrue(serializer.is_valid())
+            usernames.append(serializer.save().username)
+
+        self.assertEqual(usernames, ['test', 'test1'])
+
     def test_invalid_email(self):
         """Test serializer with invalid email."""
         data = self.valid_data.copy()
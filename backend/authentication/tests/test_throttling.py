@@ -0,0 +1,162 @@
+import json
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import AsyncRequestFactory, SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from authentication import async_views
+from authentication.throttling import SlidingWindowLimiter, limiter
+
+User = get_user_model()
+
+
+def throttle_rates(**rates):
+    """REST_FRAMEWORK settings with some throttle rates replaced"""
+    return {
+        **settings.REST_FRAMEWORK,
+        'DEFAULT_THROTTLE_RATES': {
+            **settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], **rates
+        },
+    }
+
+
+class SlidingWindowLimiterTest(SimpleTestCase):
+    """Test cases for the sliding-window limiter."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_rejects_over_limit(self):
+        """Test hits beyond the limit are rejected with a wait time."""
+        counters = SlidingWindowLimiter(maxsize=10)
+        results = [counters.hit('scope', 'key', 3, 60, now=10.0 + i) for i in range(4)]
+
+        self.assertEqual([allowed for allowed, _ in results], [True, True, True, False])
+        self.assertAlmostEqual(results[-1][1], 47.0)
+        self.assertEqual(counters.stats()['rejected'], {'scope': 1})
+
+    def test_window_slides(self):
+        """Test the previous window counts in proportion to its overlap."""
+        counters = SlidingWindowLimiter(maxsize=10)
+        for _ in range(4):
+            counters.hit('scope', 'key', 4, 60, now=30.0)
+
+        # A quarter into the next window, 3 of the 4 previous hits still count
+        self.assertEqual(counters.hit('scope', 'key', 4, 60, now=75.0)[0], True)
+        self.assertEqual(counters.hit('scope', 'key', 4, 60, now=75.0)[0], False)
+        # Two windows later the old hits are gone
+        self.assertEqual(counters.hit('scope', 'key', 1, 60, now=200.0)[0], True)
+
+    def test_lru_bound(self):
+        """Test the local counters keep at most maxsize keys."""
+        counters = SlidingWindowLimiter(maxsize=2)
+        for key in ('a', 'b', 'c'):
+            counters.hit('scope', key, 5, 60, now=0.0)
+
+        self.assertEqual(counters.stats()['tracked_keys'], 2)
+
+    @override_settings(THROTTLE_SHARED_CACHE=True)
+    def test_shared_cache(self):
+        """Test nodes using the shared cache enforce one limit together."""
+        node_a = SlidingWindowLimiter(maxsize=10)
+        node_b = SlidingWindowLimiter(maxsize=10)
+
+        self.assertTrue(node_a.hit('scope', 'key', 2, 60, now=5.0)[0])
+        self.assertTrue(node_b.hit('scope', 'key', 2, 60, now=6.0)[0])
+        self.assertFalse(node_a.hit('scope', 'key', 2, 60, now=7.0)[0])
+        self.assertEqual(node_a.stats()['tracked_keys'], 0)
+
+
+class ThrottledViewsTest(APITestCase):
+    """Test cases for throttling the anonymous endpoints."""
+
+    def setUp(self):
+        limiter.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.login_url = reverse('authentication:login')
+
+    @override_settings(REST_FRAMEWORK=throttle_rates(login_email='2/min'))
+    def test_login_throttled_per_email(self):
+        """Test an over-limit login is refused before any hashing or query."""
+        data = {'email': 'Test@example.com', 'password': 'wrongpass'}
+        for _ in range(2):
+            self.client.post(self.login_url, data)
+
+        with patch('authentication.models.hashing_service') as hashing, \
+                self.assertNumQueries(0):
+            response = self.client.post(self.login_url, {**data, 'email': 'test@example.com'})
+
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+        hashing.verify_password.assert_not_called()
+
+        # Other addresses from the same client are not affected
+        response = self.client.post(self.login_url, {**data, 'email': 'other@example.com'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(REST_FRAMEWORK=throttle_rates(login_email='2/min'))
+    def test_non_object_body(self):
+        """Test JSON bodies that are not objects are throttled per IP, not a 500."""
+        for body in ('[1, 2]', '"x"'):
+            response = self.client.post(self.login_url, body, content_type='application/json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post(self.login_url, '[]', content_type='application/json')
+
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(REST_FRAMEWORK=throttle_rates(forgot_password_ip='1/hour'))
+    def test_forgot_password_per_ip(self):
+        """Test password reset requests are limited per client IP."""
+        url = reverse('authentication:forgot_password')
+        self.client.post(url, {'email': 'test@example.com'})
+
+        response = self.client.post(url, {'email': 'other@example.com'})
+
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(REST_FRAMEWORK=throttle_rates(login_ip='1/min'))
+    def test_async_login_throttled(self):
+        """Test the async login applies the same throttles."""
+        factory = AsyncRequestFactory()
+
+        def login():
+            request = factory.post(
+                '/', data=json.dumps({'email': 'x@example.com', 'password': 'x'}),
+                content_type='application/json'
+            )
+            return async_to_sync(async_views.login)(request)
+
+        login()
+        response = login()
+
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+
+    @override_settings(REST_FRAMEWORK=throttle_rates(register_email='1/hour'))
+    def test_stats_endpoint(self):
+        """Test rejection counts are reported to admins only."""
+        url = reverse('authentication:register')
+        for _ in range(2):
+            self.client.post(url, {'email': 'new@example.com'})
+        stats_url = reverse('authentication:throttle_stats')
+
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get(stats_url).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(stats_url)
+
+        self.assertEqual(response.data['rejected'], {'register_email': 1})
+        self.assertEqual(response.data['rejected_total'], 1)
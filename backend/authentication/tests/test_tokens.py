@@ -0,0 +1,146 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from authentication import views
+from authentication.authentication import ProfileClaimsAuthentication
+from authentication.tokens import ProfileRefreshToken
+
+User = get_user_model()
+
+
+class ProfileClaimsTokenTest(APITestCase):
+    """Test cases for profile claims embedded in JWTs."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123',
+            first_name='Test',
+            last_name='User'
+        )
+
+    def test_login_embeds_claims(self):
+        """Test the access token issued at login carries the profile claims."""
+        response = self.client.post(reverse('authentication:login'), {
+            'email': 'test@example.com',
+            'password': 'testpass123'
+        })
+
+        access = AccessToken(response.data['access_token'])
+        self.assertEqual(access['email'], 'test@example.com')
+        self.assertEqual(access['username'], 'testuser')
+        self.assertEqual(access['first_name'], 'Test')
+        self.assertFalse(access['is_email_verified'])
+
+    def test_refresh_updates_claims(self):
+        """Test refreshing re-reads the profile into the new access token."""
+        refresh = ProfileRefreshToken.for_user(self.user)
+        User.objects.filter(pk=self.user.pk).update(
+            first_name='Renamed', is_email_verified=True, is_staff=True
+        )
+
+        response = self.client.post(reverse('token_refresh'), {'refresh': str(refresh)})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        access = AccessToken(response.data['access'])
+        self.assertEqual(access['first_name'], 'Renamed')
+        self.assertTrue(access['is_email_verified'])
+        self.assertTrue(access['is_staff'])
+
+
+class StatelessAuthenticationTest(APITestCase):
+    """Test cases for authenticating from token claims (JWT_STATELESS_AUTH)."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123',
+            first_name='Test',
+            last_name='User'
+        )
+        self.profile_url = reverse('authentication:profile')
+        # Views bind their authentication classes at import time
+        for view in (views.profile, views.update_profile, views.user_cache_stats):
+            patcher = patch.object(
+                view.cls, 'authentication_classes', [ProfileClaimsAuthentication]
+            )
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_stateless_profile_no_db(self):
+        """Test the profile endpoint is served without any queries."""
+        access = ProfileRefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.profile_url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['id'], self.user.id)
+        self.assertEqual(response.data['email'], 'test@example.com')
+        self.assertEqual(response.data['last_name'], 'User')
+
+    def test_stateless_legacy_token(self):
+        """Test tokens without profile claims fall back to a database lookup."""
+        access = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.profile_url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['email'], 'test@example.com')
+
+    def test_stateless_update_profile(self):
+        """Test profile updates load the user and save only the loaded columns."""
+        access = ProfileRefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+
+        response = self.client.put(
+            reverse('authentication:update_profile'), {'first_name': 'Updated'}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, 'Updated')
+        self.assertTrue(self.user.check_password('testpass123'))
+
+    def test_stateless_staff(self):
+        """Test staff reach admin-only endpoints from the token claims."""
+        url = reverse('authentication:user_cache_stats')
+        self.user.is_staff = True
+        self.user.save()
+        access = ProfileRefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_stateless_not_staff(self):
+        """Test other users are still refused by admin-only endpoints."""
+        access = ProfileRefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+
+        response = self.client.get(reverse('authentication:user_cache_stats'))
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_stateless_inactive(self):
+        """Test a token issued to an inactive user is rejected."""
+        self.user.is_active = False
+        access = ProfileRefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+
+        response = self.client.get(self.profile_url)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,138 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from authentication import views
+from authentication.authentication import CachedJWTAuthentication
+from authentication.user_cache import UserCache, user_cache
+
+User = get_user_model()
+
+
+class UserCacheTest(APITestCase):
+    """Test cases for the two-level user cache."""
+
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123',
+            first_name='Test'
+        )
+
+    def test_local_hit_skips_db(self):
+        """Test a warm lookup is served without a query."""
+        worker = UserCache(maxsize=10, ttl=60, shared_ttl=60)
+        worker.get(self.user.pk)
+
+        with self.assertNumQueries(0):
+            user = worker.get(self.user.pk)
+
+        self.assertEqual(user.email, 'test@example.com')
+        self.assertEqual(worker.stats()['hits'], 1)
+        self.assertEqual(worker.stats()['misses'], 1)
+
+    def test_shared_hit_skips_db(self):
+        """Test a second worker is filled from the shared cache."""
+        UserCache(maxsize=10, ttl=60, shared_ttl=60).get(self.user.pk)
+        other_worker = UserCache(maxsize=10, ttl=60, shared_ttl=60)
+
+        with self.assertNumQueries(0):
+            other_worker.get(self.user.pk)
+
+        self.assertEqual(other_worker.stats()['shared_hits'], 1)
+
+    def test_save_invalidates_workers(self):
+        """Test saving a user invalidates entries warmed in other workers."""
+        worker = UserCache(maxsize=10, ttl=60, shared_ttl=60)
+        worker.get(self.user.pk)
+
+        self.user.first_name = 'Renamed'
+        self.user.save()
+
+        self.assertEqual(worker.get(self.user.pk).first_name, 'Renamed')
+        self.assertEqual(worker.stats()['misses'], 2)
+
+    def test_delete_invalidates(self):
+        """Test deleting a user removes it from the cache."""
+        worker = UserCache(maxsize=10, ttl=60, shared_ttl=60)
+        worker.get(self.user.pk)
+        user_id = self.user.pk
+
+        self.user.delete()
+
+        with self.assertRaises(User.DoesNotExist):
+            worker.get(user_id)
+
+    def test_lru_eviction(self):
+        """Test the local cache never grows beyond maxsize."""
+        worker = UserCache(maxsize=1, ttl=60, shared_ttl=60)
+        other = User.objects.create_user(email='other@example.com')
+
+        worker.get(self.user.pk)
+        worker.get(other.pk)
+
+        self.assertEqual(worker.stats()['size'], 1)
+
+    def test_returns_copies(self):
+        """Test mutating a returned user does not change the cached entry."""
+        worker = UserCache(maxsize=10, ttl=60, shared_ttl=60)
+        worker.get(self.user.pk).first_name = 'Mutated'
+
+        self.assertEqual(worker.get(self.user.pk).first_name, 'Test')
+
+    def test_cached_authentication(self):
+        """Test the profile endpoint reuses the cached user across requests."""
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        url = reverse('authentication:profile')
+
+        with patch.object(
+            views.profile.cls, 'authentication_classes', [CachedJWTAuthentication]
+        ):
+            self.client.get(url)
+            with self.assertNumQueries(0):
+                response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['email'], 'test@example.com')
+
+    def test_cached_revoke_check(self):
+        """Test tokens issued before a password change are refused from the cache."""
+        url = reverse('authentication:profile')
+
+        with patch.object(
+            views.profile.cls, 'authentication_classes', [CachedJWTAuthentication]
+        ), patch.object(api_settings, 'CHECK_REVOKE_TOKEN', True):
+            access = RefreshToken.for_user(self.user).access_token
+            self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+            self.user.set_password('newpass123')
+            self.user.save()
+
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_stats_endpoint_admin_only(self):
+        """Test the cache counters are exposed to staff only."""
+        url = reverse('authentication:user_cache_stats')
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('hit_ratio', response.data)
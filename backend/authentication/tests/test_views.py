@@ -1,21 +1,49 @@
+import logging
+import threading
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import timedelta
 from unittest.mock import patch
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core import mail
+from django.db import OperationalError, connections
+from django.test import TransactionTestCase, override_settings
 from django.utils import timezone
 from django.urls import reverse
 
-from rest_framework.test import APITestCase
+from rest_framework.test import APIClient, APITestCase
 from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from authentication.models import EmailVerificationToken, PasswordResetToken
+from authentication.hashing import HashingUnavailable, hashing_service
+from authentication.models import EmailOutbox, EmailVerificationToken, PasswordResetToken
+from authentication.query_budget import record_queries
+from authentication.user_cache import user_cache
 
 User = get_user_model()
 
 
-class AuthenticationViewsTest(APITestCase):
+class QueryBudgetMixin:
+    """Lets a test declare how many queries a block may run."""
+
+    @contextmanager
+    def query_budget(self, budget, allow_duplicates=False):
+        """Fail when the block runs more than budget queries or repeats one"""
+        with record_queries() as recorder:
+            yield recorder
+        if recorder.count > budget:
+            self.fail(
+                f'{recorder.count} queries exceed the budget of {budget}:\n'
+                f'{recorder.describe()}'
+            )
+        if recorder.duplicates and not allow_duplicates:
+            self.fail(f'Statements were repeated:\n{recorder.describe()}')
+
+
+class AuthenticationViewsTest(QueryBudgetMixin, APITestCase):
     """Test cases for authentication views."""
 
     def setUp(self):
@@ -31,11 +59,8 @@ class AuthenticationViewsTest(APITestCase):
         self.verify_email_url = reverse('authentication:verify_email')
         self.profile_url = reverse('authentication:profile')
 
-    @patch('authentication.views.send_verification_email')
-    def test_user_registration_success(self, mock_send_email):
+    def test_user_registration_success(self):
         """Test successful user registration."""
-        mock_send_email.return_value = True
-
         data = {
             'email': 'newuser@example.com',
             'password': 'newpass123',
@@ -44,13 +69,45 @@ class AuthenticationViewsTest(APITestCase):
             'last_name': 'User'
         }
 
-        response = self.client.post(self.register_url, data)
+        with self.query_budget(9):
+            response = self.client.post(self.register_url, data)
 
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertIn('message', response.data)
         self.assertIn('user_id', response.data)
+        self.assertEqual(response.data['email_sent'], 'queued')
         self.assertTrue(User.objects.filter(email='newuser@example.com').exists())
 
+        # The verification email is queued alongside the token
+        token = EmailVerificationToken.objects.get(user_id=response.data['user_id'])
+        message = EmailOutbox.objects.get(recipient='newuser@example.com')
+        self.assertEqual(message.kind, EmailOutbox.KIND_VERIFICATION)
+        self.assertEqual(message.token, str(token.token))
+        self.assertEqual(message.user_name, 'New')
+
+    def test_registration_collision(self):
+        """Test registrations whose username is taken stay within the budget."""
+        # The test case's transaction adds a SAVEPOINT and its RELEASE
+        budget = settings.QUERY_BUDGETS['authentication:register'] + 2
+        for domain in ('example.org', 'example.net'):
+            data = {
+                'email': f'testuser@{domain}',
+                'password': 'newpass123',
+                'password_confirm': 'newpass123',
+            }
+
+            # Seeding bumps the new counter with the same UPDATE again
+            with self.query_budget(budget, allow_duplicates=True):
+                response = self.client.post(self.register_url, data)
+
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            list(User.objects.filter(username__startswith='test').values_list(
+                'username', flat=True
+            ).order_by('pk')),
+            ['testuser', 'testuser1', 'testuser2'],
+        )
+
     def test_registration_invalid_data(self):
         """Test user registration with invalid data."""
         data = {
@@ -82,7 +139,8 @@ class AuthenticationViewsTest(APITestCase):
             'password': 'testpass123'
         }
 
-        response = self.client.post(self.login_url, data)
+        with self.query_budget(2):
+            response = self.client.post(self.login_url, data)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn('access_token', response.data)
@@ -115,7 +173,8 @@ class AuthenticationViewsTest(APITestCase):
         token = EmailVerificationToken.objects.create(user=self.user)
 
         data = {'token': str(token.token)}
-        response = self.client.post(self.verify_email_url, data)
+        with self.query_budget(4):
+            response = self.client.post(self.verify_email_url, data)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn('message', response.data)
@@ -143,6 +202,39 @@ class AuthenticationViewsTest(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_verification_double_click(self):
+        """Test a repeated request for a consumed token still succeeds."""
+        token = EmailVerificationToken.objects.create(user=self.user)
+        data = {'token': str(token.token)}
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.verify_email_url, data)
+
+        response = self.client.post(self.verify_email_url, data)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['message'], 'Email already verified')
+        self.assertFalse(EmailVerificationToken.objects.filter(pk=token.pk).exists())
+
+    def test_verification_cache(self):
+        """Test a cached user is dropped although no post_save signal is sent."""
+        token = EmailVerificationToken.objects.create(user=self.user)
+        self.assertFalse(user_cache.get(self.user.pk).is_email_verified)
+
+        self.client.post(self.verify_email_url, {'token': str(token.token)})
+
+        self.assertTrue(user_cache.get(self.user.pk).is_email_verified)
+
+    def test_verification_expired_kept(self):
+        """Test an expired token is reported as expired and not consumed."""
+        token = EmailVerificationToken.objects.create(
+            user=self.user, expires_at=timezone.now() - timedelta(hours=1)
+        )
+
+        response = self.client.post(self.verify_email_url, {'token': str(token.token)})
+
+        self.assertEqual(response.data['error'], 'Verification token has expired')
+        self.assertTrue(EmailVerificationToken.objects.filter(pk=token.pk).exists())
+
     def test_verification_invalid_uuid(self):
         """Test email verification with invalid UUID format."""
         data = {'token': 'invalid-token'}
@@ -156,7 +248,8 @@ class AuthenticationViewsTest(APITestCase):
         refresh = RefreshToken.for_user(self.user)
         self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
 
-        response = self.client.get(self.profile_url)
+        with self.query_budget(1):
+            response = self.client.get(self.profile_url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['email'], self.user.email)
@@ -166,21 +259,46 @@ class AuthenticationViewsTest(APITestCase):
         response = self.client.get(self.profile_url)
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
-    @patch('authentication.views.send_verification_email')
-    def test_resend_verify_success(self, mock_send_email):
+    def test_resend_verify_success(self):
         """Test resending verification email."""
-        mock_send_email.return_value = True
-
         url = reverse('authentication:resend_verification')
         data = {'email': self.user.email}
 
-        response = self.client.post(url, data)
+        with self.query_budget(5):
+            response = self.client.post(url, data)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        mock_send_email.assert_called_once()
+        self.assertEqual(
+            EmailOutbox.objects.filter(kind=EmailOutbox.KIND_VERIFICATION).count(), 1
+        )
+
+    def test_resend_keeps_fresh_token(self):
+        """Test a resend right after the last one keeps the token already mailed."""
+        url = reverse('authentication:resend_verification')
+        self.client.post(url, {'email': self.user.email})
+        token = EmailVerificationToken.objects.get(user=self.user)
+
+        response = self.client.post(url, {'email': self.user.email})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(EmailVerificationToken.objects.get(user=self.user), token)
+        self.assertEqual(EmailOutbox.objects.count(), 1)
+
+    def test_resend_replaces_stale(self):
+        """Test a resend after TOKEN_REISSUE_SECONDS replaces the token in place."""
+        old = EmailVerificationToken.objects.create(user=self.user)
+        EmailVerificationToken.objects.filter(pk=old.pk).update(
+            created_at=timezone.now() - timedelta(minutes=5)
+        )
+
+        self.client.post(reverse('authentication:resend_verification'), {'email': self.user.email})
 
-    @patch('authentication.views.send_verification_email')
-    def test_resend_verify_verified(self, mock_send_email):
+        token = EmailVerificationToken.objects.get(user=self.user)
+        self.assertEqual(token.pk, old.pk)
+        self.assertNotEqual(token.token, old.token)
+        self.assertEqual(EmailOutbox.objects.get().token, str(token.token))
+
+    def test_resend_verify_verified(self):
         """Test resending verification email for already verified user."""
         self.user.is_email_verified = True
         self.user.save()
@@ -192,7 +310,7 @@ class AuthenticationViewsTest(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn('already verified', response.data['message'])
-        mock_send_email.assert_not_called()
+        self.assertFalse(EmailOutbox.objects.exists())
 
     def test_resend_verify_nonexistent(self):
         """Test resending verification email for non-existent user."""
@@ -212,18 +330,30 @@ class AuthenticationViewsTest(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
-    @patch('authentication.views.send_password_reset_email')
-    def test_forgot_pwd_success(self, mock_send_email):
+    def test_forgot_pwd_success(self):
         """Test forgot password functionality."""
-        mock_send_email.return_value = True
-
         url = reverse('authentication:forgot_password')
         data = {'email': self.user.email}
 
-        response = self.client.post(url, data)
+        with self.query_budget(5):
+            response = self.client.post(url, data)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        mock_send_email.assert_called_once()
+        self.assertEqual(response.data['email_sent'], 'queued')
+        reset_token = PasswordResetToken.objects.get(user=self.user)
+        message = EmailOutbox.objects.get(kind=EmailOutbox.KIND_PASSWORD_RESET)
+        self.assertEqual(message.token, str(reset_token.token))
+
+    def test_forgot_pwd_replaces_used(self):
+        """Test a fresh token that was already used is replaced with an unused one."""
+        used = PasswordResetToken.objects.create(user=self.user, is_used=True)
+
+        self.client.post(reverse('authentication:forgot_password'), {'email': self.user.email})
+
+        reset_token = PasswordResetToken.objects.get(user=self.user)
+        self.assertFalse(reset_token.is_used)
+        self.assertNotEqual(reset_token.token, used.token)
+        self.assertEqual(EmailOutbox.objects.get().token, str(reset_token.token))
 
     def test_forgot_pwd_nonexistent(self):
         """Test forgot password with non-existent user."""
@@ -234,17 +364,15 @@ class AuthenticationViewsTest(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
-    @patch('authentication.views.send_password_reset_email')
-    def test_forgot_pwd_send_failure(self, mock_send_email):
-        """Test forgot password when email sending fails."""
-        mock_send_email.return_value = False
-
+    def test_forgot_pwd_no_relay(self):
+        """Test forgot password does not touch the mail relay."""
         url = reverse('authentication:forgot_password')
         data = {'email': self.user.email}
 
         response = self.client.post(url, data)
 
-        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(mail.outbox), 0)
 
     def test_reset_password_success(self):
         """Test successful password reset."""
@@ -258,7 +386,8 @@ class AuthenticationViewsTest(APITestCase):
             'password_confirm': 'newpassword123'
         }
 
-        response = self.client.post(url, data)
+        with self.query_budget(4):
+            response = self.client.post(url, data)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
@@ -302,6 +431,38 @@ class AuthenticationViewsTest(APITestCase):
         response = self.client.post(url, data)
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_reset_password_twice(self):
+        """Test a reset token only changes the password once."""
+        reset_token = PasswordResetToken.objects.create(user=self.user)
+        url = reverse('authentication:reset_password')
+        for password in ('newpassword123', 'otherpassword123'):
+            response = self.client.post(url, {
+                'token': str(reset_token.token),
+                'password': password,
+                'password_confirm': password
+            })
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('newpassword123'))
+
+    def test_reset_password_rollback(self):
+        """Test the token stays usable when the new password cannot be hashed."""
+        reset_token = PasswordResetToken.objects.create(user=self.user)
+        url = reverse('authentication:reset_password')
+        data = {
+            'token': str(reset_token.token),
+            'password': 'newpassword123',
+            'password_confirm': 'newpassword123'
+        }
+
+        with patch.object(hashing_service, 'make_password', side_effect=HashingUnavailable):
+            response = self.client.post(url, data)
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        reset_token.refresh_from_db()
+        self.assertFalse(reset_token.is_used)
+
     def test_reset_password_invalid(self):
         """Test password reset with invalid token."""
         url = reverse('authentication:reset_password')
@@ -337,7 +498,8 @@ class AuthenticationViewsTest(APITestCase):
         url = reverse('authentication:logout')
         data = {'refresh_token': str(refresh)}
 
-        response = self.client.post(url, data)
+        with self.query_budget(7):
+            response = self.client.post(url, data)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
     def test_logout_without_token(self):
@@ -384,7 +546,8 @@ class AuthenticationViewsTest(APITestCase):
             'last_name': 'Name'
         }
 
-        response = self.client.put(url, data)
+        with self.query_budget(2):
+            response = self.client.put(url, data)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.user.refresh_from_db()
@@ -417,3 +580,71 @@ class AuthenticationViewsTest(APITestCase):
         self.user.refresh_from_db()
         self.assertEqual(self.user.first_name, 'Updated')
         self.assertEqual(self.user.last_name, 'User')  # Should remain unchanged
+
+
+class TokenReissueConcurrencyTest(TransactionTestCase):
+    """Test concurrent resend and forgot-password requests for one user."""
+
+    REQUESTS = 24
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='test@example.com', password=None)
+        # Every request comes from one client for one email; test the views, not the throttles
+        rates = dict.fromkeys(settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'])
+        throttles_off = override_settings(
+            REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates}
+        )
+        throttles_off.enable()
+        self.addCleanup(throttles_off.disable)
+        # Keep the tracebacks of the retried lock errors out of the test output
+        request_logger = logging.getLogger('django.request')
+        self.addCleanup(request_logger.setLevel, request_logger.level)
+        request_logger.setLevel(logging.CRITICAL)
+
+    def _hammer(self, url):
+        """POST the user's email to url from many threads; returns per-request query counts"""
+        start = threading.Event()
+
+        def post(_):
+            start.wait()
+            try:
+                # SQLite test databases fail a conflicting write at once
+                # instead of waiting for the lock; a retry is a later request
+                for _ in range(100):
+                    try:
+                        with record_queries() as recorder:
+                            response = APIClient().post(url, {'email': self.user.email})
+                        break
+                    except OperationalError:
+                        continue
+                else:
+                    self.fail('The database stayed locked')
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                return recorder.count
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            counts = executor.map(post, range(self.REQUESTS))
+            start.set()
+            return list(counts)
+
+    def _assert_within_budget(self, counts, endpoint):
+        # SQLite also records the BEGIN of the view's transaction
+        self.assertLessEqual(max(counts), settings.QUERY_BUDGETS[endpoint] + 1)
+
+    def test_resend_one_token(self):
+        """Test concurrent resends leave one token, mailed once."""
+        counts = self._hammer(reverse('authentication:resend_verification'))
+
+        token = EmailVerificationToken.objects.get(user=self.user)
+        self.assertEqual(EmailOutbox.objects.get().token, str(token.token))
+        self._assert_within_budget(counts, 'authentication:resend_verification')
+
+    def test_forgot_pwd_one_token(self):
+        """Test concurrent password reset requests leave one token, mailed once."""
+        counts = self._hammer(reverse('authentication:forgot_password'))
+
+        reset_token = PasswordResetToken.objects.get(user=self.user)
+        self.assertEqual(EmailOutbox.objects.get().token, str(reset_token.token))
+        self._assert_within_budget(counts, 'authentication:forgot_password')
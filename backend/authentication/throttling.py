@@ -0,0 +1,206 @@
+import threading
+import time
+from collections import Counter, OrderedDict
+from collections.abc import Mapping
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+
+def _estimate(previous, current, elapsed_fraction):
+    """Hits in the sliding window, weighting the previous window by its overlap"""
+    return previous * (1 - elapsed_fraction) + current
+
+
+def _wait(previous, estimate, limit, window, now):
+    """Seconds until the estimate drops below limit"""
+    remaining = window - now % window
+    if previous:
+        return min(remaining, (estimate - limit + 1) / previous * window)
+    return remaining
+
+
+class SlidingWindowLimiter:
+    """
+    Sliding-window rate limits with constant work and memory per key.
+
+    Each key keeps only the hit counts of the current and previous fixed
+    windows; the sliding count is the current count plus the previous one
+    weighted by how much of it still overlaps the window. Counters live in a
+    process-local LRU of at most maxsize keys, or in the shared Django cache
+    when THROTTLE_SHARED_CACHE is enabled so limits hold across nodes.
+    Rejected requests are not counted against the key but are tallied per
+    scope for stats().
+    """
+
+    def __init__(self, maxsize=None, key_prefix='throttle'):
+        self.maxsize = maxsize or settings.THROTTLE_LOCAL_MAXSIZE
+        self.key_prefix = key_prefix
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self.allowed = Counter()
+        self.rejected = Counter()
+
+    def hit(self, scope, key, limit, window, *, now=None):
+        """Record a hit for key unless it is over limit; returns (allowed, wait)"""
+        now = time.time() if now is None else now
+        if settings.THROTTLE_SHARED_CACHE:
+            allowed, wait = self._hit_shared(key, limit, window, now)
+        else:
+            allowed, wait = self._hit_local(key, limit, window, now)
+        with self._lock:
+            (self.allowed if allowed else self.rejected)[scope] += 1
+        return allowed, wait
+
+    def _hit_local(self, key, limit, window, now):
+        index, offset = divmod(now, window)
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None or entry[0] < index - 1:
+                entry = [index, 0, 0]
+            elif entry[0] == index - 1:
+                entry = [index, entry[2], 0]
+            self._local[key] = entry
+            self._local.move_to_end(key)
+            while len(self._local) > self.maxsize:
+                self._local.popitem(last=False)
+
+            estimate = _estimate(entry[1], entry[2], offset / window)
+            if estimate >= limit:
+                return False, _wait(entry[1], estimate, limit, window, now)
+            entry[2] += 1
+            return True, None
+
+    def _hit_shared(self, key, limit, window, now):
+        index, offset = divmod(now, window)
+        current_key = f'{self.key_prefix}:{key}:{int(index)}'
+        previous_key = f'{self.key_prefix}:{key}:{int(index) - 1}'
+        counts = cache.get_many([previous_key, current_key])
+        previous = counts.get(previous_key, 0)
+
+        estimate = _estimate(previous, counts.get(current_key, 0), offset / window)
+        if estimate >= limit:
+            return False, _wait(previous, estimate, limit, window, now)
+        # The counter must outlive the next window, which reads it as previous
+        if not cache.add(current_key, 1, timeout=int(window * 2) + 1):
+            cache.incr(current_key)
+        return True, None
+
+    def clear(self):
+        """Forget the local counters and reset the tallies"""
+        with self._lock:
+            self._local.clear()
+            self.allowed.clear()
+            self.rejected.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': 'shared' if settings.THROTTLE_SHARED_CACHE else 'local',
+                'tracked_keys': len(self._local),
+                'allowed': dict(self.allowed),
+                'rejected': dict(self.rejected),
+                'rejected_total': sum(self.rejected.values()),
+            }
+
+
+limiter = SlidingWindowLimiter()
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    """
+    DRF throttle on the sliding-window limiter.
+
+    The rate comes from DEFAULT_THROTTLE_RATES[scope]; a rate of None turns
+    the throttle off. Subclasses choose what a request is counted against.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._wait = None
+
+    def get_rate(self):
+        # Read at instantiation so overridden REST_FRAMEWORK settings apply
+        try:
+            return api_settings.DEFAULT_THROTTLE_RATES[self.scope]
+        except KeyError as exc:
+            raise ImproperlyConfigured(
+                f"No default throttle rate set for '{self.scope}' scope"
+            ) from exc
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return True
+        allowed, self._wait = limiter.hit(
+            self.scope, key, self.num_requests, self.duration, now=self.timer()
+        )
+        return allowed
+
+    def wait(self):
+        return self._wait
+
+
+class ClientIPThrottle(SlidingWindowThrottle):
+    """Counts requests per client IP (honouring NUM_PROXIES)"""
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class SubmittedEmailThrottle(SlidingWindowThrottle):
+    """
+    Counts requests per email address in the request body; bodies that are
+    not an object (a JSON list or string) are counted per client IP.
+    """
+
+    def get_cache_key(self, request, view):
+        if not isinstance(request.data, Mapping):
+            return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+        email = request.data.get('email')
+        if not isinstance(email, str) or not email.strip():
+            return None
+        return self.cache_format % {'scope': self.scope, 'ident': email.strip().lower()}
+
+
+class LoginIPThrottle(ClientIPThrottle):
+    scope = 'login_ip'
+
+
+class LoginEmailThrottle(SubmittedEmailThrottle):
+    scope = 'login_email'
+
+
+class RegisterIPThrottle(ClientIPThrottle):
+    scope = 'register_ip'
+
+
+class RegisterEmailThrottle(SubmittedEmailThrottle):
+    scope = 'register_email'
+
+
+class ForgotPasswordIPThrottle(ClientIPThrottle):
+    scope = 'forgot_password_ip'
+
+
+class ForgotPasswordEmailThrottle(SubmittedEmailThrottle):
+    scope = 'forgot_password_email'
+
+
+class ResendVerificationIPThrottle(ClientIPThrottle):
+    scope = 'resend_verification_ip'
+
+
+class ResendVerificationEmailThrottle(SubmittedEmailThrottle):
+    scope = 'resend_verification_email'
+
+
+LOGIN_THROTTLES = [LoginIPThrottle, LoginEmailThrottle]
+REGISTER_THROTTLES = [RegisterIPThrottle, RegisterEmailThrottle]
+FORGOT_PASSWORD_THROTTLES = [ForgotPasswordIPThrottle, ForgotPasswordEmailThrottle]
+RESEND_VERIFICATION_THROTTLES = [ResendVerificationIPThrottle, ResendVerificationEmailThrottle]
@@ -0,0 +1,126 @@
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from .blacklist_filter import blacklist_filter
+from .metrics import JWT_SIGNING_SECONDS
+
+# Claims needed to render UserProfileSerializer, and its ETag, without
+# loading the user
+PROFILE_CLAIMS = (
+    'email', 'username', 'first_name', 'last_name', 'is_email_verified', 'created_at',
+    'updated_at',
+)
+DATETIME_CLAIMS = ('created_at', 'updated_at')
+
+# Claims the permission checks read from request.user. Not profile fields,
+# so load_user does not load them and a profile save cannot write them back.
+ACCESS_CLAIMS = ('is_active', 'is_staff', 'is_superuser')
+
+# Columns loaded when a stateless request needs a real User instance
+PROFILE_FIELDS = ('id',) + PROFILE_CLAIMS
+
+
+def add_profile_claims(token, user):
+    """Copy the profile and access fields of user onto token"""
+    for claim in PROFILE_CLAIMS + ACCESS_CLAIMS:
+        value = getattr(user, claim)
+        token[claim] = value.isoformat() if claim in DATETIME_CLAIMS else value
+    return token
+
+
+def has_profile_claims(token):
+    return all(claim in token for claim in PROFILE_CLAIMS + ACCESS_CLAIMS)
+
+
+class FilteredBlacklistMixin:
+    """
+    Consults the in-process blacklist filter before the blacklist table.
+
+    Only active when JWT_BLACKLIST_FILTER is enabled and the filter has been
+    built; otherwise every check goes to the database as before.
+    """
+
+    def check_blacklist(self):
+        if not settings.JWT_BLACKLIST_FILTER:
+            super().check_blacklist()
+            return
+
+        blacklist_filter.start()
+        if not blacklist_filter.might_contain(self.payload[api_settings.JTI_CLAIM]):
+            return
+        super().check_blacklist()
+        if blacklist_filter.ready:
+            blacklist_filter.record_false_positive()
+
+
+class TimedSigningMixin:
+    """Records how long signing takes in the JWT signing histogram."""
+
+    def __str__(self):
+        with JWT_SIGNING_SECONDS.labels(self.token_type).time():
+            return super().__str__()
+
+
+class ProfileAccessToken(TimedSigningMixin, AccessToken):
+    pass
+
+
+class ProfileRefreshToken(TimedSigningMixin, FilteredBlacklistMixin, RefreshToken):
+    """Refresh token whose access tokens carry the user's profile claims."""
+
+    access_token_class = ProfileAccessToken
+
+    def blacklist(self):
+        # Tokens issued by for_user() already have their outstanding row, so
+        # the user lookup simplejwt does to create one is skipped
+        try:
+            token = OutstandingToken.objects.get(jti=self.payload[api_settings.JTI_CLAIM])
+        except OutstandingToken.DoesNotExist:
+            return super().blacklist()
+        return BlacklistedToken.objects.get_or_create(token=token)
+
+    @classmethod
+    def for_user(cls, user):
+        return add_profile_claims(super().for_user(user), user)
+
+
+class ProfileTokenUser(TokenUser):
+    """
+    Lightweight request.user built from the profile claims of a token.
+
+    is_staff and is_superuser come from the access claims inherited from
+    TokenUser. Like the profile, they are as of the last token refresh.
+    """
+
+    @cached_property
+    def is_active(self):
+        return self.token.get('is_active', False)
+
+    @cached_property
+    def email(self):
+        return self.token.get('email', '')
+
+    @cached_property
+    def first_name(self):
+        return self.token.get('first_name', '')
+
+    @cached_property
+    def last_name(self):
+        return self.token.get('last_name', '')
+
+    @cached_property
+    def is_email_verified(self):
+        return self.token.get('is_email_verified', False)
+
+    @cached_property
+    def created_at(self):
+        return parse_datetime(self.token.get('created_at', ''))
+
+    @cached_property
+    def updated_at(self):
+        return parse_datetime(self.token.get('updated_at', ''))
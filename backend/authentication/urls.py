@@ -1,16 +1,34 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
 
 app_name = 'authentication'
 
+# Async implementations of the hot endpoints when served through asgi.py
+auth_views = async_views if settings.ASYNC_AUTH_VIEWS else views
+
 urlpatterns = [
-    path('register/', views.register, name='register'),
-    path('login/', views.login, name='login'),
-    path('logout/', views.logout, name='logout'),
-    path('verify-email/', views.verify_email, name='verify_email'),
+    path('register/', auth_views.register, name='register'),
+    path('login/', auth_views.login, name='login'),
+    path('logout/', auth_views.logout, name='logout'),
+    path('verify-email/', auth_views.verify_email, name='verify_email'),
     path('resend-verification/', views.resend_verification_email, name='resend_verification'),
-    path('forgot-password/', views.forgot_password, name='forgot_password'),
-    path('reset-password/', views.reset_password, name='reset_password'),
-    path('profile/', views.profile, name='profile'),
-    path('profile/update/', views.update_profile, name='update_profile'),
+    path('forgot-password/', auth_views.forgot_password, name='forgot_password'),
+    path('reset-password/', auth_views.reset_password, name='reset_password'),
+    path('profile/', auth_views.profile, name='profile'),
+    path('profile/update/', auth_views.update_profile, name='update_profile'),
+    path('internal/user-cache/', views.user_cache_stats, name='user_cache_stats'),
+    path(
+        'internal/blacklist-filter/',
+        views.blacklist_filter_stats,
+        name='blacklist_filter_stats'
+    ),
+    path(
+        'internal/password-hashing/',
+        views.password_hashing_stats,
+        name='password_hashing_stats'
+    ),
+    path('internal/throttles/', views.throttle_stats, name='throttle_stats'),
+    path('internal/db-pool/', views.db_pool_stats, name='db_pool_stats'),
+    path('internal/users-export/', views.export_users, name='export_users'),
 ]
@@ -0,0 +1,103 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+
+class UserCache:
+    """
+    Two-level cache of User instances keyed by primary key.
+
+    A process-local LRU with a TTL sits in front of the shared Django cache.
+    Every entry remembers the version stamp it was loaded under; the stamp
+    lives in the shared cache and is replaced whenever the user is saved or
+    deleted, so a warm entry in any worker is discarded as soon as it is
+    read after a change elsewhere.
+    """
+
+    def __init__(self, maxsize=None, ttl=None, shared_ttl=None, key_prefix='auth:user'):
+        self.maxsize = maxsize or settings.USER_CACHE_MAXSIZE
+        self.ttl = ttl if ttl is not None else settings.USER_CACHE_TTL
+        self.shared_ttl = shared_ttl if shared_ttl is not None else settings.USER_CACHE_SHARED_TTL
+        self.key_prefix = key_prefix
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _version_key(self, user_id):
+        return f'{self.key_prefix}:version:{user_id}'
+
+    def _user_key(self, user_id):
+        return f'{self.key_prefix}:{user_id}'
+
+    def _version(self, user_id):
+        # A fresh time-based stamp never matches entries cached under an
+        # evicted one, so losing the version key can only cause misses.
+        return cache.get_or_set(self._version_key(user_id), time.time_ns, timeout=None)
+
+    def get(self, user_id):
+        """Return a copy of the user, raising User.DoesNotExist if missing"""
+        version = self._version(user_id)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._local.get(user_id)
+            if entry is not None and entry[0] == version and entry[1] > now:
+                self._local.move_to_end(user_id)
+                self.hits += 1
+                return copy.copy(entry[2])
+
+        shared = cache.get(self._user_key(user_id))
+        if shared is not None and shared[0] == version:
+            user = shared[1]
+            with self._lock:
+                self.shared_hits += 1
+        else:
+            user = get_user_model().objects.get(pk=user_id)
+            cache.set(self._user_key(user_id), (version, user), self.shared_ttl)
+            with self._lock:
+                self.misses += 1
+
+        with self._lock:
+            self._local[user_id] = (version, now + self.ttl, user)
+            self._local.move_to_end(user_id)
+            while len(self._local) > self.maxsize:
+                self._local.popitem(last=False)
+        return copy.copy(user)
+
+    def invalidate(self, user_id):
+        """Drop the user everywhere by replacing its shared version stamp"""
+        cache.set(self._version_key(user_id), time.time_ns(), timeout=None)
+        cache.delete(self._user_key(user_id))
+        with self._lock:
+            self._local.pop(user_id, None)
+            self.invalidations += 1
+
+    def clear(self):
+        """Empty the local LRU and reset the counters"""
+        with self._lock:
+            self._local.clear()
+            self.hits = self.shared_hits = self.misses = self.invalidations = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                'size': len(self._local),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'hit_ratio': (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+            }
+
+
+user_cache = UserCache()
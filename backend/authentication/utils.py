@@ -1,38 +1,74 @@
 import logging
+from urllib.parse import urlencode
 
-from django.core.mail import send_mail
+from django.core.mail import EmailMultiAlternatives
 from django.conf import settings
-from django.template.loader import render_to_string
-from django.utils.html import strip_tags
+
+from .email_templates import get_email_template
+from .metrics import EMAIL_SEND_SECONDS
 
 logger = logging.getLogger(__name__)
 
 
-def send_verification_email(user_email, verification_token, user_name):
-    """Send email verification email synchronously"""
-    try:
-        subject = 'Verify your email address - Vendorly'
+def build_verification_email(user_email, verification_token, user_name):
+    """Build the email verification message without sending it"""
+    subject = 'Verify your email address - Vendorly'
+
+    # Create the verification URL
+    # Signed tokens (SIGNED_AUTH_TOKENS) are longer than UUIDs and may carry ':'
+    verification_url = (
+        f"{settings.FRONTEND_URL}/auth/verify-email?{urlencode({'token': verification_token})}"
+    )
+
+    # Render the precompiled HTML and plain text variants
+    template = get_email_template(
+        'authentication/verification_email.html', ('user_name', 'verification_url')
+    )
+    html_message, plain_message = template.render({
+        'user_name': user_name,
+        'verification_url': verification_url,
+    })
+
+    return _build_message(subject, html_message, plain_message, user_email)
+
 
-        # Create the verification URL
-        verification_url = f"http://localhost:3000/auth/verify-email?token={verification_token}"
+def build_password_reset_email(user_email, reset_token, user_name):
+    """Build the password reset message without sending it"""
+    subject = 'Reset your password - Vendorly'
 
-        # Render HTML email template
-        html_message = render_to_string('authentication/verification_email.html', {
-            'user_name': user_name,
-            'verification_url': verification_url,
-        })
+    # Create the reset URL
+    reset_url = f"{settings.FRONTEND_URL}/auth/reset-password?{urlencode({'token': reset_token})}"
 
-        # Create plain text version
-        plain_message = strip_tags(html_message)
+    # Render the precompiled HTML and plain text variants
+    template = get_email_template(
+        'authentication/password_reset_email.html', ('user_name', 'reset_url')
+    )
+    html_message, plain_message = template.render({
+        'user_name': user_name,
+        'reset_url': reset_url,
+    })
 
-        send_mail(
-            subject=subject,
-            message=plain_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[user_email],
-            html_message=html_message,
-            fail_silently=False,
-        )
+    return _build_message(subject, html_message, plain_message, user_email)
+
+
+def _build_message(subject, html_message, plain_message, user_email):
+    message = EmailMultiAlternatives(
+        subject=subject,
+        body=plain_message,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[user_email],
+    )
+    message.attach_alternative(html_message, 'text/html')
+    return message
+
+
+def send_verification_email(user_email, verification_token, user_name, connection=None):
+    """Send email verification email synchronously"""
+    try:
+        message = build_verification_email(user_email, verification_token, user_name)
+        message.connection = connection
+        with EMAIL_SEND_SECONDS.labels('verification').time():
+            message.send(fail_silently=False)
 
         logger.info("Verification email sent successfully to %s", user_email)
         return True
@@ -42,31 +78,13 @@ def send_verification_email(user_email, verification_token, user_name):
         return False
 
 
-def send_password_reset_email(user_email, reset_token, user_name):
+def send_password_reset_email(user_email, reset_token, user_name, connection=None):
     """Send password reset email synchronously"""
     try:
-        subject = 'Reset your password - Vendorly'
-
-        # Create the reset URL
-        reset_url = f"http://localhost:3000/auth/reset-password?token={reset_token}"
-
-        # Render HTML email template
-        html_message = render_to_string('authentication/password_reset_email.html', {
-            'user_name': user_name,
-            'reset_url': reset_url,
-        })
-
-        # Create plain text version
-        plain_message = strip_tags(html_message)
-
-        send_mail(
-            subject=subject,
-            message=plain_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[user_email],
-            html_message=html_message,
-            fail_silently=False,
-        )
+        message = build_password_reset_email(user_email, reset_token, user_name)
+        message.connection = connection
+        with EMAIL_SEND_SECONDS.labels('password_reset').time():
+            message.send(fail_silently=False)
 
         logger.info("Password reset email sent successfully to %s", user_email)
         return True
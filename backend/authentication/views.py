@@ -1,10 +1,21 @@
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import get_user_model
-
+from django.db import transaction
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+
+from .authentication import load_user
+from . import link_tokens
+from .conditional import (
+    add_validators,
+    conditional_response,
+    has_preconditions,
+    save_if_unchanged,
+)
 from .models import EmailVerificationToken, PasswordResetToken
 from .serializers import (
     UserRegistrationSerializer,
@@ -14,44 +25,93 @@ from .serializers import (
     PasswordResetConfirmSerializer,
     UserProfileSerializer
 )
-from .utils import send_verification_email, send_password_reset_email
+from .outbox import queue_verification_email, queue_password_reset_email
+from .blacklist_filter import blacklist_filter
+from .db_pool import pool_stats
+from .export import (
+    CONTENT_TYPES,
+    encode_batches,
+    gzipped,
+    iterate_async,
+    user_batches,
+)
+from .hashing import hashing_service
+from .metrics import TEXT_CONTENT_TYPE, HasMetricsToken, metrics_registry
+from .throttling import (
+    FORGOT_PASSWORD_THROTTLES,
+    LOGIN_THROTTLES,
+    REGISTER_THROTTLES,
+    RESEND_VERIFICATION_THROTTLES,
+    limiter,
+)
+from .tokens import ProfileRefreshToken
+from .user_cache import user_cache
 
 User = get_user_model()
 
+# Body and status for each link_tokens.verify_email result; a repeated click
+# on a link that already worked gets a success, not an invalid token
+VERIFICATION_RESPONSES = {
+    EmailVerificationToken.VERIFIED: (
+        {'message': 'Email verified successfully'}, status.HTTP_200_OK
+    ),
+    EmailVerificationToken.ALREADY_VERIFIED: (
+        {'message': 'Email already verified'}, status.HTTP_200_OK
+    ),
+    EmailVerificationToken.EXPIRED: (
+        {'error': 'Verification token has expired'}, status.HTTP_400_BAD_REQUEST
+    ),
+    EmailVerificationToken.INVALID: (
+        {'error': 'Invalid verification token'}, status.HTTP_400_BAD_REQUEST
+    ),
+}
+
+# Body and status for each link_tokens.reset_password result
+RESET_RESPONSES = {
+    PasswordResetToken.RESET: (
+        {'message': 'Password reset successfully'}, status.HTTP_200_OK
+    ),
+    PasswordResetToken.EXPIRED: (
+        {'error': 'Password reset token has expired'}, status.HTTP_400_BAD_REQUEST
+    ),
+    PasswordResetToken.INVALID: (
+        {'error': 'Invalid or expired password reset token'}, status.HTTP_400_BAD_REQUEST
+    ),
+}
+
+# Body of the 412 sent when an If-Match update loses the race to another save
+PROFILE_CHANGED_RESPONSE = {'error': 'Profile was changed by another request'}
+
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes(REGISTER_THROTTLES)
 def register(request):
     """User registration endpoint"""
     serializer = UserRegistrationSerializer(data=request.data)
     if serializer.is_valid():
-        user = serializer.save()
-
-        # Create email verification token
-        verification_token = EmailVerificationToken.objects.create(user=user)
-
-        # Send verification email synchronously
-        # Use first_name if available, otherwise use the auto-generated username
-        display_name = user.first_name or user.email.split('@')[0]
-        email_sent = send_verification_email(
-            user.email,
-            str(verification_token.token),
-            display_name
-        )
-
-        response_message = 'User registered successfully.'
-        if email_sent:
-            response_message += ' Please check your email to verify your account.'
-        else:
-            response_message += (
-                ' However, there was an issue sending the verification email. '
-                'You can request a new one later.'
+        with transaction.atomic():
+            user = serializer.save()
+
+            # Create email verification token
+            verification_token = link_tokens.issue_verification_token(user)
+
+            # Queue the verification email in the same transaction as the token
+            # Use first_name if available, otherwise use the auto-generated username
+            display_name = user.first_name or user.email.split('@')[0]
+            queue_verification_email(
+                user.email,
+                verification_token,
+                display_name
             )
 
         return Response({
-            'message': response_message,
+            'message': (
+                'User registered successfully. '
+                'Please check your email to verify your account.'
+            ),
             'user_id': user.id,
-            'email_sent': email_sent
+            'email_sent': 'queued'
         }, status=status.HTTP_201_CREATED)
 
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -59,14 +119,15 @@ def register(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes(LOGIN_THROTTLES)
 def login(request):
     """User login endpoint"""
     serializer = UserLoginSerializer(data=request.data)
     if serializer.is_valid():
         user = serializer.validated_data['user']
 
-        # Generate JWT tokens
-        refresh = RefreshToken.for_user(user)
+        # Generate JWT tokens carrying the profile claims
+        refresh = ProfileRefreshToken.for_user(user)
         access_token = refresh.access_token
 
         return Response({
@@ -84,38 +145,15 @@ def verify_email(request):
     """Email verification endpoint"""
     serializer = EmailVerificationSerializer(data=request.data)
     if serializer.is_valid():
-        token = serializer.validated_data['token']
-
-        try:
-            verification_token = EmailVerificationToken.objects.get(token=token)
-
-            if verification_token.is_expired():
-                return Response({
-                    'error': 'Verification token has expired'
-                }, status=status.HTTP_400_BAD_REQUEST)
-
-            # Verify the user's email
-            user = verification_token.user
-            user.is_email_verified = True
-            user.save()
-
-            # Delete the verification token
-            verification_token.delete()
-
-            return Response({
-                'message': 'Email verified successfully'
-            }, status=status.HTTP_200_OK)
-
-        except EmailVerificationToken.DoesNotExist:
-            return Response({
-                'error': 'Invalid verification token'
-            }, status=status.HTTP_400_BAD_REQUEST)
+        result = link_tokens.verify_email(serializer.validated_data['token'])
+        return Response(*VERIFICATION_RESPONSES[result])
 
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes(RESEND_VERIFICATION_THROTTLES)
 def resend_verification_email(request):
     """Resend email verification"""
     email = request.data.get('email')
@@ -132,28 +170,20 @@ def resend_verification_email(request):
                 'message': 'Email is already verified'
             }, status=status.HTTP_200_OK)
 
-        # Delete existing verification tokens
-        EmailVerificationToken.objects.filter(user=user).delete()
+        with transaction.atomic():
+            # Replaces a stored token in one upsert; None while the token
+            # sent moments ago is still fresh, which is not mailed again
+            token = link_tokens.reissue_verification_token(user)
 
-        # Create new verification token
-        verification_token = EmailVerificationToken.objects.create(user=user)
-
-        # Send verification email synchronously
-        display_name = user.first_name or user.email.split('@')[0]
-        email_sent = send_verification_email(
-            user.email,
-            str(verification_token.token),
-            display_name
-        )
-
-        if email_sent:
-            return Response({
-                'message': 'Verification email sent successfully'
-            }, status=status.HTTP_200_OK)
+            # Queue the verification email in the same transaction as the token
+            if token is not None:
+                display_name = user.first_name or user.email.split('@')[0]
+                queue_verification_email(user.email, token, display_name)
 
         return Response({
-            'error': 'Failed to send verification email. Please try again later.'
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            'message': 'Verification email queued successfully',
+            'email_sent': 'queued'
+        }, status=status.HTTP_200_OK)
 
     except User.DoesNotExist:
         return Response({
@@ -163,35 +193,27 @@ def resend_verification_email(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes(FORGOT_PASSWORD_THROTTLES)
 def forgot_password(request):
     """Request password reset"""
     serializer = PasswordResetRequestSerializer(data=request.data)
     if serializer.is_valid():
-        email = serializer.validated_data['email']
-        user = User.objects.get(email=email)
-
-        # Delete existing password reset tokens
-        PasswordResetToken.objects.filter(user=user).delete()
-
-        # Create new password reset token
-        reset_token = PasswordResetToken.objects.create(user=user)
+        user = serializer.validated_data['user']
 
-        # Send password reset email synchronously
-        display_name = user.first_name or user.email.split('@')[0]
-        email_sent = send_password_reset_email(
-            user.email,
-            str(reset_token.token),
-            display_name
-        )
+        with transaction.atomic():
+            # Replaces a stored token in one upsert; None while the unused
+            # token sent moments ago is still fresh, which is not mailed again
+            token = link_tokens.reissue_reset_token(user)
 
-        if email_sent:
-            return Response({
-                'message': 'Password reset email sent successfully'
-            }, status=status.HTTP_200_OK)
+            # Queue the password reset email in the same transaction as the token
+            if token is not None:
+                display_name = user.first_name or user.email.split('@')[0]
+                queue_password_reset_email(user.email, token, display_name)
 
         return Response({
-            'error': 'Failed to send password reset email. Please try again later.'
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            'message': 'Password reset email queued successfully',
+            'email_sent': 'queued'
+        }, status=status.HTTP_200_OK)
 
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -202,34 +224,10 @@ def reset_password(request):
     """Reset password with token"""
     serializer = PasswordResetConfirmSerializer(data=request.data)
     if serializer.is_valid():
-        token = serializer.validated_data['token']
-        password = serializer.validated_data['password']
-
-        try:
-            reset_token = PasswordResetToken.objects.get(token=token, is_used=False)
-
-            if reset_token.is_expired():
-                return Response({
-                    'error': 'Password reset token has expired'
-                }, status=status.HTTP_400_BAD_REQUEST)
-
-            # Reset the password
-            user = reset_token.user
-            user.set_password(password)
-            user.save()
-
-            # Mark token as used
-            reset_token.is_used = True
-            reset_token.save()
-
-            return Response({
-                'message': 'Password reset successfully'
-            }, status=status.HTTP_200_OK)
-
-        except PasswordResetToken.DoesNotExist:
-            return Response({
-                'error': 'Invalid or expired password reset token'
-            }, status=status.HTTP_400_BAD_REQUEST)
+        result = link_tokens.reset_password(
+            serializer.validated_data['token'], serializer.validated_data['password']
+        )
+        return Response(*RESET_RESPONSES[result])
 
     error_string = "; ".join(
         f"{field}: {', '.join(errors)}" for field, errors in serializer.errors.items()
@@ -244,18 +242,31 @@ def reset_password(request):
 @permission_classes([IsAuthenticated])
 def profile(request):
     """Get user profile"""
+    # Answered from the validators alone when the client's copy is current
+    not_modified = conditional_response(request, request.user)
+    if not_modified is not None:
+        return not_modified
     serializer = UserProfileSerializer(request.user)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    return add_validators(Response(serializer.data, status=status.HTTP_200_OK), request.user)
 
 
 @api_view(['PUT'])
 @permission_classes([IsAuthenticated])
 def update_profile(request):
     """Update user profile"""
-    serializer = UserProfileSerializer(request.user, data=request.data, partial=True)
+    user = load_user(request.user)
+    precondition_failed = conditional_response(request, user)
+    if precondition_failed is not None:
+        return precondition_failed
+    serializer = UserProfileSerializer(user, data=request.data, partial=True)
     if serializer.is_valid():
-        serializer.save()
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        if not has_preconditions(request):
+            serializer.save()
+        elif not save_if_unchanged(user, serializer.validated_data):
+            return Response(
+                PROFILE_CHANGED_RESPONSE, status=status.HTTP_412_PRECONDITION_FAILED
+            )
+        return add_validators(Response(serializer.data, status=status.HTTP_200_OK), user)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -266,7 +277,7 @@ def logout(request):
     try:
         refresh_token = request.data.get('refresh_token')
         if refresh_token:
-            token = RefreshToken(refresh_token)
+            token = ProfileRefreshToken(refresh_token)
             token.blacklist()
         return Response({
             'message': 'Logged out successfully'
@@ -275,3 +286,74 @@ def logout(request):
         return Response({
             'error': 'Invalid token'
         }, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def user_cache_stats(request):
+    """Hit/miss counters of this worker's user cache"""
+    return Response(user_cache.stats(), status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def blacklist_filter_stats(request):
+    """Memory use and hit rates of this worker's token blacklist filter"""
+    return Response(blacklist_filter.stats(), status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def password_hashing_stats(request):
+    """Queue depth and rejections of this worker's password hashing pool"""
+    return Response(hashing_service.stats(), status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def throttle_stats(request):
+    """Allowed and rejected requests per throttle scope in this worker"""
+    return Response(limiter.stats(), status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def db_pool_stats(request):
+    """Connections in use, waiting requests and checkout latency of this worker"""
+    return Response(pool_stats(), status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([HasMetricsToken | IsAdminUser])
+def metrics(request):
+    """Metrics of every worker in the Prometheus text format"""
+    return HttpResponse(metrics_registry.render(), content_type=TEXT_CONTENT_TYPE)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def export_users(request):
+    """
+    Stream every user as ?type=csv (default) or ndjson, gzipped with ?gzip=1.
+    Users are read in keyset-paginated batches, so memory stays flat.
+    """
+    export_format = request.query_params.get('type', 'csv')
+    if export_format not in CONTENT_TYPES:
+        return Response({
+            'error': f"type must be one of: {', '.join(CONTENT_TYPES)}"
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    chunks = encode_batches(user_batches(settings.USER_EXPORT_CHUNK_SIZE), export_format)
+    filename = f'users.{export_format}'
+    content_type = CONTENT_TYPES[export_format]
+    if request.query_params.get('gzip', '').lower() in ['true', '1', 'yes', 'on']:
+        chunks = gzipped(chunks)
+        filename += '.gz'
+        content_type = 'application/gzip'
+    if isinstance(request._request, ASGIRequest):  # pylint: disable=protected-access
+        # Served through asgi.py
+        chunks = iterate_async(chunks)
+
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
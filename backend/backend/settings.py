@@ -57,6 +57,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost, so every query of a request is covered by its pinning
+    'authentication.db_router.ReplicaPinningMiddleware',
+    'authentication.metrics.MetricsMiddleware',
+    'authentication.query_budget.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -94,7 +98,27 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 # Check if PostgreSQL configuration is provided
 POSTGRES_HOST = os.getenv('POSTGRES_HOST')
 
+# PostgreSQL connection reuse: 'pool' keeps a psycopg 3 connection pool per
+# process, 'persistent' keeps one connection per worker thread for
+# DB_CONN_MAX_AGE seconds and 'off' connects on every request. Health checks
+# test a reused connection before handing it out.
+DB_CONNECTION_MODE = os.getenv('DB_CONNECTION_MODE', 'pool')
+DB_HEALTH_CHECKS = os.getenv('DB_HEALTH_CHECKS', 'True').lower() in ['true', '1', 'yes', 'on']
+
 if POSTGRES_HOST:
+    DATABASE_OPTIONS = {
+        'connect_timeout': 60,
+    }
+    if DB_CONNECTION_MODE == 'pool':
+        DATABASE_OPTIONS['pool'] = {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+            # Seconds a request waits for a free connection before erroring
+            'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+            'max_lifetime': float(os.getenv('DB_POOL_MAX_LIFETIME', '3600')),
+            'max_idle': float(os.getenv('DB_POOL_MAX_IDLE', '600')),
+        }
+
     # PostgreSQL configuration
     DATABASES = {
         'default': {
@@ -104,9 +128,12 @@ if POSTGRES_HOST:
             'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
             'HOST': POSTGRES_HOST,
             'PORT': os.getenv('POSTGRES_PORT', '5432'),
-            'OPTIONS': {
-                'connect_timeout': 60,
-            },
+            'CONN_MAX_AGE': (
+                int(os.getenv('DB_CONN_MAX_AGE', '600'))
+                if DB_CONNECTION_MODE == 'persistent' else 0
+            ),
+            'CONN_HEALTH_CHECKS': DB_HEALTH_CHECKS,
+            'OPTIONS': DATABASE_OPTIONS,
         }
     }
 else:
@@ -119,6 +146,63 @@ else:
     }
 
 
+# Read replicas: comma-separated replica hosts for PostgreSQL, or database
+# files standing in for replicas with SQLite. Reads go to a random replica;
+# a request reads from the primary once it has written, and so do a user's
+# requests for DB_REPLICA_PIN_SECONDS after they wrote.
+DB_REPLICAS = [
+    replica.strip() for replica in os.getenv('DB_REPLICAS', '').split(',') if replica.strip()
+]
+DB_REPLICA_PIN_SECONDS = int(os.getenv('DB_REPLICA_PIN_SECONDS', '5'))
+DB_REPLICA_ALIASES = [f'replica_{number}' for number in range(1, len(DB_REPLICAS) + 1)]
+
+DATABASES.update({
+    alias: {
+        **DATABASES['default'],
+        'HOST' if POSTGRES_HOST else 'NAME': replica,
+        'OPTIONS': dict(DATABASES['default'].get('OPTIONS', {})),
+        # Tests read replicas through the primary's connection
+        'TEST': {'MIRROR': 'default'},
+    }
+    for alias, replica in zip(DB_REPLICA_ALIASES, DB_REPLICAS)
+})
+DATABASE_ROUTERS = ['authentication.db_router.PrimaryReplicaRouter']
+
+
+# Per-endpoint query instrumentation: query count, database time and
+# repeated statements of every request, in X-Query-* response headers with
+# DEBUG and in the log otherwise. Requests over their endpoint's budget (or
+# the default) are logged as warnings.
+QUERY_INSTRUMENTATION = (
+    os.getenv('QUERY_INSTRUMENTATION', 'True').lower() in ['true', '1', 'yes', 'on']
+)
+QUERY_BUDGET_DEFAULT = int(os.getenv('QUERY_BUDGET_DEFAULT', '10'))
+QUERY_BUDGETS = {
+    # Seeding the username counter the first time an email prefix collides;
+    # later collisions take 8 and others 7. Only a retry after a concurrent
+    # signup took the same username goes over.
+    'authentication:register': 11,
+    'authentication:login': 3,
+    'authentication:verify_email': 2,
+    'authentication:resend_verification': 3,
+    'authentication:forgot_password': 3,
+    'authentication:reset_password': 2,
+    'authentication:profile': 1,
+    'authentication:update_profile': 2,
+    'authentication:logout': 5,
+}
+
+
+# In-process metrics served at /internal/metrics/ in the Prometheus text
+# format. With METRICS_DIR set every worker writes its metrics there every
+# METRICS_FLUSH_INTERVAL seconds and the endpoint adds up all workers on the
+# host. Scrapers send METRICS_TOKEN in an X-Metrics-Token header; staff users
+# need no token.
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '5'))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -161,6 +245,9 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Frontend base URL used to build links in outgoing emails
+FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:3000').rstrip('/')
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = os.getenv(
     'CORS_ALLOWED_ORIGINS', 
@@ -172,16 +259,101 @@ CORS_ALLOW_CREDENTIALS = (
     in ['true', '1', 'yes', 'on']
 )
 
+# Cache settings
+# The default local-memory cache is per process; point CACHE_BACKEND and
+# CACHE_LOCATION at a shared cache (e.g. Redis) so invalidations reach every
+# worker and a repeated verification link is recognised on any of them.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+# Build request.user from JWT profile claims instead of loading it per request
+JWT_STATELESS_AUTH = (
+    os.getenv('JWT_STATELESS_AUTH', 'False').lower() in ['true', '1', 'yes', 'on']
+)
+
+# Load request.user through the process-local + shared user cache
+JWT_USER_CACHE = (
+    os.getenv('JWT_USER_CACHE', 'False').lower() in ['true', '1', 'yes', 'on']
+)
+USER_CACHE_MAXSIZE = int(os.getenv('USER_CACHE_MAXSIZE', '10000'))
+USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', '60'))
+USER_CACHE_SHARED_TTL = int(os.getenv('USER_CACHE_SHARED_TTL', '300'))
+
+if JWT_STATELESS_AUTH:
+    JWT_AUTHENTICATION_CLASS = 'authentication.authentication.ProfileClaimsAuthentication'
+elif JWT_USER_CACHE:
+    JWT_AUTHENTICATION_CLASS = 'authentication.authentication.CachedJWTAuthentication'
+else:
+    JWT_AUTHENTICATION_CLASS = 'rest_framework_simplejwt.authentication.JWTAuthentication'
+
+# Skip refresh-token blacklist queries for JTIs a per-process Bloom filter
+# has never seen. Tokens blacklisted by another process are recognised
+# after at most BLACKLIST_FILTER_SYNC_INTERVAL seconds.
+JWT_BLACKLIST_FILTER = (
+    os.getenv('JWT_BLACKLIST_FILTER', 'False').lower() in ['true', '1', 'yes', 'on']
+)
+BLACKLIST_FILTER_CAPACITY = int(os.getenv('BLACKLIST_FILTER_CAPACITY', '1000000'))
+BLACKLIST_FILTER_FP_RATE = float(os.getenv('BLACKLIST_FILTER_FP_RATE', '0.001'))
+BLACKLIST_FILTER_SYNC_INTERVAL = float(os.getenv('BLACKLIST_FILTER_SYNC_INTERVAL', '2'))
+BLACKLIST_FILTER_REBUILD_INTERVAL = float(
+    os.getenv('BLACKLIST_FILTER_REBUILD_INTERVAL', '3600')
+)
+
+# Route register/login/verify-email/forgot-password/reset-password/profile/
+# logout to the native async views.
+# Only worthwhile when the project is served through backend/asgi.py.
+ASYNC_AUTH_VIEWS = (
+    os.getenv('ASYNC_AUTH_VIEWS', 'False').lower() in ['true', '1', 'yes', 'on']
+)
+
+# Hash and verify passwords in a pool of worker processes instead of threads.
+# Hashes queued or running beyond PASSWORD_HASHING_MAX_PENDING per process
+# are refused with a 503.
+PASSWORD_HASHING_POOL = (
+    os.getenv('PASSWORD_HASHING_POOL', 'False').lower() in ['true', '1', 'yes', 'on']
+)
+PASSWORD_HASHING_WORKERS = int(os.getenv('PASSWORD_HASHING_WORKERS', str(os.cpu_count() or 1)))
+PASSWORD_HASHING_MAX_PENDING = int(
+    os.getenv('PASSWORD_HASHING_MAX_PENDING', str(PASSWORD_HASHING_WORKERS * 4))
+)
+
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        JWT_AUTHENTICATION_CLASS,
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # Sliding-window limits of the anonymous endpoints that hash passwords or
+    # send email, per client IP and per submitted email address
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': os.getenv('THROTTLE_LOGIN_IP', '30/min'),
+        'login_email': os.getenv('THROTTLE_LOGIN_EMAIL', '10/min'),
+        'register_ip': os.getenv('THROTTLE_REGISTER_IP', '20/hour'),
+        'register_email': os.getenv('THROTTLE_REGISTER_EMAIL', '5/hour'),
+        'forgot_password_ip': os.getenv('THROTTLE_FORGOT_PASSWORD_IP', '20/hour'),
+        'forgot_password_email': os.getenv('THROTTLE_FORGOT_PASSWORD_EMAIL', '5/hour'),
+        'resend_verification_ip': os.getenv('THROTTLE_RESEND_VERIFICATION_IP', '20/hour'),
+        'resend_verification_email': os.getenv('THROTTLE_RESEND_VERIFICATION_EMAIL', '5/hour'),
+    },
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES')) if os.getenv('NUM_PROXIES') else None,
 }
 
+# Keep throttle counters in the shared cache (CACHE_BACKEND) so limits hold
+# across nodes; otherwise each process counts in a local LRU of this many keys
+THROTTLE_SHARED_CACHE = (
+    os.getenv('THROTTLE_SHARED_CACHE', 'False').lower() in ['true', '1', 'yes', 'on']
+)
+THROTTLE_LOCAL_MAXSIZE = int(os.getenv('THROTTLE_LOCAL_MAXSIZE', '100000'))
+
 # JWT Settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(
@@ -221,7 +393,9 @@ SIMPLE_JWT = {
 
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
     'TOKEN_TYPE_CLAIM': 'token_type',
-    'TOKEN_USER_CLASS': 'rest_framework_simplejwt.models.TokenUser',
+    'TOKEN_USER_CLASS': 'authentication.tokens.ProfileTokenUser',
+    'TOKEN_OBTAIN_SERIALIZER': 'authentication.serializers.ProfileTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'authentication.serializers.ProfileTokenRefreshSerializer',
 
     'JTI_CLAIM': 'jti',
 
@@ -230,6 +404,20 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=1),
 }
 
+# Verification and password reset links carry signed tokens instead of
+# stored UUIDs: the user id and a fingerprint of the fields the link changes
+# (is_email_verified, password), so issuing one writes no token row and
+# following one reads only the user. Links issued in the other mode stop
+# working when this is switched.
+SIGNED_AUTH_TOKENS = (
+    os.getenv('SIGNED_AUTH_TOKENS', 'False').lower() in ['true', '1', 'yes', 'on']
+)
+
+# Resending a verification email or asking for another password reset
+# within this many seconds of the last one keeps the token already sent
+# instead of issuing and mailing a new one
+TOKEN_REISSUE_SECONDS = int(os.getenv('TOKEN_REISSUE_SECONDS', '60'))
+
 # Email settings
 EMAIL_BACKEND = os.getenv(
     'EMAIL_BACKEND', 
@@ -247,6 +435,14 @@ EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'noreply@vendorly.com')
 
+# Pooled delivery used by the email outbox worker
+EMAIL_POOL_SIZE = int(os.getenv('EMAIL_POOL_SIZE', '4'))
+EMAIL_POOL_PER_DOMAIN_LIMIT = int(os.getenv('EMAIL_POOL_PER_DOMAIN_LIMIT', '2'))
+
+# Users per query of the staff user export (/api/auth/internal/users-export/
+# and manage.py export_users); memory use is proportional to it
+USER_EXPORT_CHUNK_SIZE = int(os.getenv('USER_EXPORT_CHUNK_SIZE', '2000'))
+
 # Custom User Model
 AUTH_USER_MODEL = 'authentication.User'
 
@@ -269,6 +465,17 @@ if not DEBUG:
     CSRF_COOKIE_HTTPONLY = True
 
 # Logging configuration
+# django.log is written by a background thread; logging threads only queue
+# records. Records arriving while LOG_QUEUE_SIZE are waiting are dropped and
+# counted in auth_log_records_dropped_total. INFO records can be limited to
+# LOG_INFO_PER_SECOND per message (0 for no limit) and sampled at
+# LOG_INFO_SAMPLE_RATE. LOG_FORMAT is verbose or json.
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'verbose')
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+LOG_BATCH_SIZE = int(os.getenv('LOG_BATCH_SIZE', '256'))
+LOG_INFO_PER_SECOND = int(os.getenv('LOG_INFO_PER_SECOND', '0'))
+LOG_INFO_SAMPLE_RATE = float(os.getenv('LOG_INFO_SAMPLE_RATE', '1.0'))
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -281,13 +488,26 @@ LOGGING = {
             'format': '{levelname} {message}',
             'style': '{',
         },
+        'json': {
+            '()': 'authentication.log_queue.JsonFormatter',
+        },
+    },
+    'filters': {
+        'sampled_info': {
+            '()': 'authentication.log_queue.SampledInfoFilter',
+            'per_second': LOG_INFO_PER_SECOND,
+            'sample_rate': LOG_INFO_SAMPLE_RATE,
+        },
     },
     'handlers': {
         'file': {
             'level': 'INFO',
-            'class': 'logging.FileHandler',
+            '()': 'authentication.log_queue.QueuedFileHandler',
             'filename': os.path.join(BASE_DIR, 'django.log'),
-            'formatter': 'verbose',
+            'maxsize': LOG_QUEUE_SIZE,
+            'batch_size': LOG_BATCH_SIZE,
+            'formatter': LOG_FORMAT,
+            'filters': ['sampled_info'],
         },
         'console': {
             'level': 'DEBUG' if DEBUG else 'INFO',
@@ -310,5 +530,11 @@ LOGGING = {
             'level': os.getenv('APP_LOG_LEVEL', 'INFO'),
             'propagate': False,
         },
+        # One line per request, so kept out of the console
+        'authentication.query_budget': {
+            'handlers': ['file'],
+            'level': os.getenv('QUERY_BUDGET_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
     },
 }
@@ -21,9 +21,12 @@ from rest_framework_simplejwt.views import (
     TokenRefreshView,
 )
 
+from authentication.views import metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('authentication.urls')),
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('internal/metrics/', metrics, name='metrics'),
 ]
@@ -13,7 +13,7 @@ test("Register user", async () => {
   expect(res).toEqual({
     message: 'User registered successfully. Please check your email to verify your account.',
     user_id: 1,
-    email_sent: true
+    email_sent: 'queued'
   })
 })
 
@@ -24,7 +24,7 @@ export const handlers = [
     return HttpResponse.json({
       message: 'User registered successfully. Please check your email to verify your account.',
       user_id: 1,
-      email_sent: true
+      email_sent: 'queued'
     }, { status: 201 });
   }),
 